@@ -0,0 +1,320 @@
+# ASGI serving mode: the same API as main.py, but every request runs on one
+# long-lived uvloop event loop so subprocess streams, HTTP pools and browsers
+# can be shared across requests.
+#
+#   python3 asgi.py            (or: uvicorn asgi:app --loop uvloop)
+
+from quart import Quart, Response, request, jsonify
+from quart.wrappers.response import DataBody
+from core.api import (
+    HOME_MESSAGE, ApiError, archive_query, capture_urls, crawl_request, domains_from_body, hosts_from_body,
+    job_result_body, job_submission, load_body, live_window, max_urls, param_page, param_query,
+    port_scan_request, port_scan_result, rate_limit_report, recon_stages, register_jobs, require_domain,
+    require_job, since_base, snapshot_kind, takeover_subdomains, tech_stack_item, tech_stack_result, trace_report,
+    wants_archive, wants_clusters, wants_ndjson, wants_stream
+)
+from core.recon.subdomain_enum import enumerate_subdomains_async, stream_live_subdomains
+from core.recon.url_collector import collect_urls_async, query_url_archive_async
+from core.recon.param_discovery import query_parameters
+from core.recon.subdomain_takeover import check_takeover
+from core.recon.takeover_engine import detect_takeovers_async
+from core.utils.burp_proxy import HAR_CREATOR, capture_batch, close_browser_pool, crawl
+from core.recon.port_scanner import scan_ports, stream_hosts
+from core.recon.tech_stack import detect_tech_stack, detect_tech_stack_batch_async
+from core.recon.pipeline import ReconPipeline
+from core.recon.delta import subdomain_delta_async, url_delta_async
+from core.recon.batch import collect_urls_batch, enumerate_subdomains_batch
+from core.utils.snapshots import get_snapshot_store
+from core.utils.jobs import job_manager
+from core.utils.workers import get_cpu_pool, shutdown_cpu_pool
+from core.utils.metrics import ASGIMetrics, render_metrics
+from core.utils.jsonio import (
+    MIN_COMPRESS_BYTES, NDJSON_MIMETYPE, OrjsonProvider, acompress_chunks, aencode_har, aencode_ndjson,
+    compress_body, encode_json_stream, negotiate_encoding
+)
+import asyncio
+import os
+
+app = Quart(__name__)
+# Times every request until its last body chunk, so NDJSON streams are measured in full
+app.asgi_app = ASGIMetrics(app.asgi_app, app.url_map)
+app.json = OrjsonProvider(app)
+
+register_jobs(job_manager)
+
+
+async def read_body():
+    return load_body(await request.get_data(), request.content_type)
+
+
+def stream_response(chunks, mimetype=NDJSON_MIMETYPE):
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    response = Response(acompress_chunks(chunks, encoding), mimetype=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def ndjson(events, batch=1):
+    return stream_response(aencode_ndjson(events, batch))
+
+
+async def _iterate(items):
+    for item in items:
+        yield item
+
+
+def list_response(head, key, items):
+    if wants_ndjson(request.args, request.headers):
+        return ndjson(_iterate(items), batch=500)
+    return stream_response(_iterate(encode_json_stream(head, key, items)), mimetype="application/json")
+
+
+@app.errorhandler(ApiError)
+async def api_error(e):
+    return (jsonify(e.body) if isinstance(e.body, dict) else e.body), e.status
+
+
+@app.after_request
+async def compress_response(response):
+    if (not isinstance(response.response, DataBody) or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers):
+        return response
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    data = await response.get_data()
+    if encoding and len(data) >= MIN_COMPRESS_BYTES:
+        response.set_data(compress_body(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+@app.before_serving
+async def startup():
+    # Workers load Wappalyzer and compile regexes now, not on the first big request
+    get_cpu_pool()
+
+
+@app.after_serving
+async def shutdown():
+    await close_browser_pool()
+    await asyncio.to_thread(shutdown_cpu_pool)
+
+
+@app.route("/")
+async def home():
+    return HOME_MESSAGE
+
+
+@app.route("/port_scan", methods=["POST"])
+async def port_scan():
+    targets, domain = port_scan_request(await read_body())
+    try:
+        if targets is not None:
+            return ndjson(stream_hosts(targets))
+
+        return jsonify(port_scan_result(domain, await asyncio.to_thread(scan_ports, domain))), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/tech_stack", methods=["GET"])
+async def tech_stack():
+    target = require_domain(request.args, {"error": "Missing 'domain' parameter"})
+    try:
+        body, status = tech_stack_result(target, await asyncio.to_thread(detect_tech_stack, target))
+        return jsonify(body), status
+
+    except Exception as e:
+        return jsonify({
+            "error": f"Unexpected error: {str(e)}"
+        }), 500
+
+
+@app.route("/tech_stack", methods=["POST"])
+async def tech_stack_batch():
+    hosts = hosts_from_body(await read_body())
+
+    async def results():
+        async for result in detect_tech_stack_batch_async(hosts):
+            yield tech_stack_item(result)
+
+    return ndjson(results())
+
+
+@app.route("/capture", methods=["POST"])
+async def capture():
+    # Uses the browser pool bound to this long-lived loop
+    return ndjson(capture_batch(capture_urls(await read_body())))
+
+
+@app.route("/capture/crawl", methods=["POST"])
+async def capture_crawl():
+    url, options, har = crawl_request(await read_body(), request.args)
+    entries = crawl(url, **options)
+    if har:
+        return stream_response(aencode_har(entries, HAR_CREATOR), mimetype="application/json")
+    return ndjson(entries)
+
+
+@app.route("/subdomains")
+async def get_subdomains():
+    domain = require_domain(request.args, "No domain provided")
+
+    if wants_stream(request.args, request.headers):
+        async def hosts():
+            async for host in stream_live_subdomains(domain):
+                yield {"subdomain": host, "domain": domain}
+
+        return ndjson(hosts())
+
+    if "since" in request.args:
+        base = since_base(domain, "live_hosts", request.args["since"])
+        try:
+            return jsonify(await subdomain_delta_async(domain, live_window=live_window(request.args), base=base))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    try:
+        result = await enumerate_subdomains_async(domain)
+        return jsonify({
+            "data": result,
+            "domain": domain
+        })
+    except Exception as e:
+        return str(e), 500
+
+
+@app.route("/subdomains/batch", methods=["POST"])
+async def subdomains_batch():
+    return ndjson(enumerate_subdomains_batch(domains_from_body(await read_body())))
+
+
+@app.route("/takeover", methods=["POST"])
+async def run_takeover():
+    subdomains, empty = takeover_subdomains(await request.get_data(), request.content_type)
+    if empty is not None:
+        return jsonify(empty), 200
+    try:
+        if request.args.get("engine") == "native":
+            takeover_results = await detect_takeovers_async(subdomains)
+        else:
+            takeover_results = await asyncio.to_thread(check_takeover, subdomains)
+        return list_response({"count": len(takeover_results)}, "results", takeover_results)
+
+    except Exception as e:
+        return str(e), 500
+
+
+@app.route("/collect_urls")
+async def collect_urls_endpoint():
+    domain = require_domain(request.args)
+
+    if "since" in request.args:
+        base = since_base(domain, "urls", request.args["since"])
+        try:
+            return jsonify(await url_delta_async(domain, base=base))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    if wants_archive(request.args):
+        # Every URL ever collected for the domain, filtered and paged with next_cursor
+        query = archive_query(domain, request.args)
+        try:
+            return jsonify(await query_url_archive_async(domain, **query))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    try:
+        if wants_clusters(request.args):
+            return list_response({}, "clusters", await collect_urls_async(domain, clusters=True))
+
+        return list_response({}, "collected_urls", await collect_urls_async(domain))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/collect_urls/batch", methods=["POST"])
+async def collect_urls_batch_endpoint():
+    domains = domains_from_body(await read_body())
+    return ndjson(collect_urls_batch(domains, max_urls(request.args)))
+
+
+@app.route("/param_discovery")
+async def param_discovery():
+    domain = require_domain(request.args, {"status": "error", "message": "No domain provided"})
+    try:
+        query = param_query(request.args)
+        results = await asyncio.to_thread(query_parameters, domain, **query)
+        return list_response(*param_page(domain, query, results))
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+        }), 500
+
+
+@app.route("/recon")
+async def recon():
+    domain = require_domain(request.args)
+    return ndjson(ReconPipeline(domain, recon_stages(request.args)).run())
+
+
+@app.route("/snapshots")
+async def list_snapshots():
+    domain = require_domain(request.args)
+    kind = snapshot_kind(request.args)
+    return jsonify({"domain": domain, "snapshots": get_snapshot_store().list(domain, kind)})
+
+
+@app.route("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
+@app.route("/traces")
+async def traces():
+    return jsonify(trace_report(request.args))
+
+
+@app.route("/rate_limits")
+async def rate_limits():
+    return jsonify(rate_limit_report(request.args))
+
+
+@app.route("/jobs", methods=["POST"])
+async def submit_job():
+    kind, params = job_submission(await read_body())
+    try:
+        job = job_manager.submit(kind, params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"job_id": job.id, "status": job.status}), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+async def job_status(job_id):
+    return jsonify(require_job(job_manager.get(job_id)).to_dict()), 200
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+async def job_result(job_id):
+    body, status = job_result_body(job_manager.get(job_id))
+    return jsonify(body), status
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+async def cancel_job(job_id):
+    return jsonify(require_job(job_manager.cancel(job_id)).to_dict()), 200
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.environ.get("PORT", 8000))
+    uvicorn.run(app, host="0.0.0.0", port=port, loop="uvloop")
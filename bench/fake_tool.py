@@ -0,0 +1,190 @@
+# bench/fake_tool.py
+#
+# Stand-in for the recon binaries. bench/run.py installs one wrapper per tool
+# name that execs this script with the tool name as the first argument.
+#
+#   BENCH_LINES       lines of output to produce (default 10000)
+#   BENCH_DELAY       seconds to wait before the first line (default 0)
+#   BENCH_LIVE_RATIO  share of names httpx reports live (default 0.5)
+#   BENCH_SEED        seed for the synthetic data (default 1)
+
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from typing import Iterator, List
+
+WORDS = ["api", "dev", "staging", "mail", "cdn", "admin", "shop", "auth", "static", "beta"]
+PATHS = [
+    "/api/v{v}/users/{id}/orders",
+    "/api/v{v}/items/{uuid}",
+    "/blog/{date}/post-{id}",
+    "/{locale}/products/{id}",
+    "/search",
+    "/assets/{hash}/app",
+    "/account/settings",
+    "/download/{id}",
+]
+PARAMS = ["id", "page", "q", "sort", "ref", "token", "lang", "utm_source", "redirect", "callback"]
+STATIC = [".js", ".css", ".png", ".svg", ".woff"]
+LOCALES = ["en", "fr", "de", "en-us", "pt-br"]
+CHUNK = 10000
+
+
+def synthetic_subdomains(n: int, domain: str, seed: int = 1) -> Iterator[str]:
+    rng = random.Random(seed)
+    for i in range(n):
+        yield f"{rng.choice(WORDS)}{i}.{domain}"
+
+
+def synthetic_urls(n: int, domain: str, seed: int = 1) -> Iterator[str]:
+    """Wayback-style URLs: templated paths, static assets and ~20% repeats"""
+    rng = random.Random(seed)
+    recent: List[str] = []
+    for i in range(n):
+        if recent and rng.random() < 0.2:
+            yield rng.choice(recent)
+            continue
+        host = domain if rng.random() < 0.7 else f"{rng.choice(WORDS)}.{domain}"
+        path = rng.choice(PATHS).format(
+            v=rng.randint(1, 3), id=rng.randint(1, 100000),
+            uuid=f"{rng.getrandbits(32):08x}-0000-4000-8000-{rng.getrandbits(48):012x}",
+            date=f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            locale=rng.choice(LOCALES), hash=f"{rng.getrandbits(64):016x}",
+        )
+        if rng.random() < 0.15:
+            url = f"https://{host}{path}{rng.choice(STATIC)}"
+        else:
+            params = rng.sample(PARAMS, rng.randint(0, 3))
+            query = "&".join(f"{p}={rng.randint(1, 50)}" for p in params)
+            url = f"https://{host}{path}" + (f"?{query}" if query else "")
+        if len(recent) < 1000:
+            recent.append(url)
+        else:
+            recent[i % 1000] = url
+        yield url
+
+
+# Page fragments real sites serve, so the tech-stack benchmark has something to detect
+PAGE_HEAD = [
+    '<meta name="generator" content="WordPress 6.{v}.{p}">',
+    '<link rel="stylesheet" href="/wp-content/themes/twenty/style.css?ver=6.{v}">',
+    '<script src="/wp-includes/js/jquery/jquery.min.js?ver=3.{v}.{p}"></script>',
+    '<script src="https://cdn.jsdelivr.net/npm/bootstrap@5.{v}.{p}/dist/js/bootstrap.bundle.min.js"></script>',
+    '<script src="https://www.googletagmanager.com/gtag/js?id=G-{id}"></script>',
+    '<script src="/static/js/main.{hash}.chunk.js"></script><div id="root" data-reactroot=""></div>',
+    '<meta name="generator" content="Drupal 10 (https://www.drupal.org)">',
+    '<script src="https://cdnjs.cloudflare.com/ajax/libs/vue/3.{v}.{p}/vue.global.prod.js"></script>',
+    '<link href="https://fonts.googleapis.com/css?family=Roboto" rel="stylesheet">',
+    '<script src="/_next/static/chunks/main-{hash}.js"></script><script id="__NEXT_DATA__" type="application/json">{{}}</script>',
+]
+PAGE_HEADERS = [
+    {"server": "nginx/1.{v}.{p}"},
+    {"server": "Apache/2.4.{p} (Ubuntu)", "x-powered-by": "PHP/8.{v}.{p}"},
+    {"server": "cloudflare", "cf-ray": "{hash}-AMS"},
+    {"x-powered-by": "Express"},
+    {"server": "Microsoft-IIS/10.0", "x-aspnet-version": "4.0.30319", "x-powered-by": "ASP.NET"},
+    {"via": "1.1 varnish", "x-varnish": "{id}"},
+]
+FILLER = '<div class="post"><h2>Post {i}</h2><p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p><a href="/post/{i}">Read more</a></div>'
+
+
+def synthetic_pages(n: int, seed: int = 1, size: int = 60000) -> Iterator[dict]:
+    """Pages as {url, html, headers}: a few stack fragments plus ~`size` bytes of body markup"""
+    rng = random.Random(seed)
+    for i in range(n):
+        values = dict(v=rng.randint(0, 9), p=rng.randint(0, 20), id=rng.randint(10 ** 6, 10 ** 7),
+                      hash=f"{rng.getrandbits(40):010x}")
+        head = "".join(f.format(**values) for f in rng.sample(PAGE_HEAD, rng.randint(1, 4)))
+        body = "".join(FILLER.format(i=j) for j in range(size // len(FILLER)))
+        headers = {k: v.format(**values) for k, v in rng.choice(PAGE_HEADERS).items()}
+        headers["content-type"] = "text/html; charset=UTF-8"
+        yield {
+            "url": f"https://site{i}.bench.example/",
+            "html": f"<!DOCTYPE html><html><head><title>Site {i}</title>{head}</head><body>{body}</body></html>",
+            "headers": headers,
+        }
+
+
+def is_live(host: str, ratio: float) -> bool:
+    return (zlib.crc32(host.encode()) % 1000) < ratio * 1000
+
+
+def write_lines(lines: Iterator[str], out=None):
+    out = out or sys.stdout
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= CHUNK:
+            out.write("\n".join(batch) + "\n")
+            batch = []
+    if batch:
+        out.write("\n".join(batch) + "\n")
+    out.flush()
+
+
+def option(args: List[str], flag: str) -> str:
+    return args[args.index(flag) + 1] if flag in args else ""
+
+
+def read_hosts(path: str = "") -> List[str]:
+    source = open(path) if path else sys.stdin
+    with source:
+        return [line.strip() for line in source if line.strip()]
+
+
+def nmap_xml(targets: List[str], total_ports: int, seed: int) -> Iterator[str]:
+    rng = random.Random(seed)
+    per_host = max(1, total_ports // max(1, len(targets)))
+    yield '<?xml version="1.0"?><nmaprun scanner="nmap">'
+    for n, target in enumerate(targets):
+        yield (f'<host><status state="up"/><address addr="10.0.{n // 256 % 256}.{n % 256}" addrtype="ipv4"/>'
+               f'<hostnames><hostname name="{target}" type="user"/></hostnames><ports>')
+        for port in range(1, per_host + 1):
+            state = "open" if rng.random() < 0.1 else "closed"
+            yield (f'<port protocol="tcp" portid="{port}"><state state="{state}" reason="syn-ack"/>'
+                   f'<service name="http" product="nginx" version="1.18"/></port>')
+        yield "</ports></host>"
+    yield "</nmaprun>"
+
+
+def main(argv: List[str]):
+    tool, args = os.path.basename(argv[0]), argv[1:]
+    lines = int(os.environ.get("BENCH_LINES", 10000))
+    seed = int(os.environ.get("BENCH_SEED", 1))
+    ratio = float(os.environ.get("BENCH_LIVE_RATIO", 0.5))
+    time.sleep(float(os.environ.get("BENCH_DELAY", 0)))
+
+    if tool in ("subfinder", "cero", "shosubgo"):
+        domain = option(args, "-d") or args[-1]
+        write_lines(synthetic_subdomains(lines, domain, seed))
+    elif tool == "httpx":
+        write_lines(f"https://{host} [200]" for host in read_hosts() if is_live(host, ratio))
+    elif tool == "gau":
+        write_lines(synthetic_urls(lines, args[-1], seed))
+    elif tool == "waybackurls":
+        write_lines(synthetic_urls(lines, read_hosts()[0], seed + 1))
+    elif tool == "nmap":
+        write_lines(nmap_xml(read_hosts(), lines, seed))
+    elif tool == "subjack":
+        hosts = read_hosts(option(args, "-w"))
+        records = [{"subdomain": h, "vulnerable": i % 100 == 0, "service": "github" if i % 100 == 0 else ""}
+                   for i, h in enumerate(hosts)]
+        with open(option(args, "-o"), "w") as f:
+            json.dump(records, f)
+    elif tool == "dnsx":
+        hosts = read_hosts(option(args, "-l"))
+        with open(option(args, "-o"), "w") as f:
+            write_lines((json.dumps({
+                "host": h,
+                "cname": [f"{h}.herokudns.com"] if i % 50 == 0 else [],
+                "status_code": "NXDOMAIN" if i % 50 == 0 else "NOERROR",
+            }) for i, h in enumerate(hosts)), f)
+    else:
+        sys.exit(f"fake_tool: unknown tool {tool}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,268 @@
+# bench/run.py
+#
+# Benchmarks for the recon hot paths, driven by fake tool binaries so runs are
+# repeatable and need no network.
+#
+#   python3 -m bench.run                          # every case at 10k lines
+#   python3 -m bench.run --lines 1000000 --case clean_urls --case collect_urls
+#   python3 -m bench.run --output runs.jsonl --baseline runs.jsonl
+#   python3 -m bench.run --lines 200000 --case clean_urls --cpu-workers 0   # no process pool
+#
+# Each case runs in a fresh interpreter so peak RSS is per case. The run's JSON
+# record is printed, or appended to --output as one JSON object per line. Every
+# store the code under test writes to (cache, snapshots, URL archive, temp
+# workspaces) lives in the run's temporary directory and is removed with it.
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FAKE_TOOL = os.path.join(ROOT, "bench", "fake_tool.py")
+TOOLS = ["subfinder", "cero", "shosubgo", "httpx", "gau", "waybackurls", "nmap", "subjack", "dnsx"]
+DOMAIN = "bench.example"
+
+
+def install_stubs(directory: str) -> str:
+    """Write one wrapper per tool name that execs fake_tool.py"""
+    os.makedirs(directory, exist_ok=True)
+    for tool in TOOLS:
+        path = os.path.join(directory, tool)
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_TOOL}" {tool} "$@"\n')
+        os.chmod(path, 0o755)
+    return directory
+
+
+# --- cases -------------------------------------------------------------------
+# A case takes the line count and returns (setup, run): setup builds inputs
+# outside the timed region, run(inputs) does the work and returns items produced.
+
+Case = Callable[[int], Tuple[Callable[[], object], Callable[[object], int]]]
+
+
+def _urls(lines: int) -> List[str]:
+    from bench.fake_tool import synthetic_urls
+    return list(synthetic_urls(lines, DOMAIN))
+
+
+def case_clean_urls(lines):
+    from core.recon.url_collector import clean_urls
+    return lambda: _urls(lines), lambda urls: len(clean_urls(urls))
+
+
+def case_group_similar_urls(lines):
+    from core.recon.url_collector import clean_urls, group_similar_urls
+    return lambda: clean_urls(_urls(lines)), lambda urls: len(group_similar_urls(urls))
+
+
+def case_extract_parameters(lines):
+    from core.recon.param_discovery import extract_parameters
+    return lambda: _urls(lines), lambda urls: len(extract_parameters(urls))
+
+
+def case_check_takeover(lines):
+    from bench.fake_tool import synthetic_subdomains
+    from core.recon.subdomain_takeover import check_takeover
+    return lambda: list(synthetic_subdomains(lines, DOMAIN)), lambda hosts: len(check_takeover(hosts))
+
+
+def case_scan_ports(lines):
+    from core.recon.port_scanner import scan_ports
+    return lambda: DOMAIN, lambda domain: len(scan_ports(domain))
+
+
+def case_enumerate_subdomains(lines):
+    from core.recon.subdomain_enum import enumerate_subdomains
+    return lambda: DOMAIN, lambda domain: len(enumerate_subdomains(domain))
+
+
+def case_collect_urls(lines):
+    from core.recon.url_collector import collect_urls
+    return lambda: DOMAIN, lambda domain: len(collect_urls(domain))
+
+
+def endpoint_case(method: str, path: str, body: Optional[Callable[[int], object]] = None) -> Case:
+    def case(lines):
+        from main import app
+        client = app.test_client()
+
+        def run(payload):
+            response = client.open(path, method=method, data=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} {path} -> {response.status_code}")
+            return len(response.get_data())
+
+        return (lambda: body(lines) if body else None), run
+    return case
+
+
+def _takeover_body(lines):
+    from bench.fake_tool import synthetic_subdomains
+    return json.dumps(list(synthetic_subdomains(lines, DOMAIN)))
+
+
+CASES: Dict[str, Case] = {
+    "clean_urls": case_clean_urls,
+    "group_similar_urls": case_group_similar_urls,
+    "extract_parameters": case_extract_parameters,
+    "check_takeover": case_check_takeover,
+    "scan_ports": case_scan_ports,
+    "enumerate_subdomains": case_enumerate_subdomains,
+    "collect_urls": case_collect_urls,
+    "endpoint_subdomains": endpoint_case("GET", f"/subdomains?domain={DOMAIN}"),
+    "endpoint_collect_urls": endpoint_case("GET", f"/collect_urls?domain={DOMAIN}"),
+    "endpoint_port_scan": endpoint_case("POST", "/port_scan", lambda lines: json.dumps({"domain": DOMAIN})),
+    "endpoint_takeover": endpoint_case("POST", "/takeover", _takeover_body),
+}
+
+
+def run_case(name: str, lines: int, repeat: int) -> Dict:
+    """Runs inside the per-case child process"""
+    setup, run = CASES[name](lines)
+    timings = []
+    produced = 0
+    for _ in range(repeat):
+        inputs = setup()
+        started = time.perf_counter()
+        produced = run(inputs)
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+    return {
+        "case": name,
+        "lines": lines,
+        "repeat": repeat,
+        "produced": produced,
+        "seconds": [round(t, 6) for t in timings],
+        "best": round(best, 6),
+        "median": round(statistics.median(timings), 6),
+        "lines_per_second": round(lines / best) if best else None,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "tools_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+# --- driver ------------------------------------------------------------------
+
+def spawn_case(name: str, args, env: Dict[str, str]) -> Dict:
+    command = [sys.executable, "-m", "bench.run", "--child", name,
+               "--lines", str(args.lines), "--repeat", str(args.repeat)]
+    proc = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    result_lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode != 0 or not result_lines:
+        error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+        return {"case": name, "lines": args.lines, "error": error}
+    return json.loads(result_lines[-1])
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_baseline(path: str) -> Dict[Tuple[str, int], Dict]:
+    """Last recorded result per (case, lines) in an earlier output file"""
+    baseline = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                for result in json.loads(line).get("results", []):
+                    if "best" in result:
+                        baseline[(result["case"], result["lines"])] = result
+    return baseline
+
+
+def report(results: List[Dict], baseline: Dict[Tuple[str, int], Dict]):
+    for result in results:
+        if "error" in result:
+            print(f"[!] {result['case']:<24} failed: {result['error']}")
+            continue
+        line = (f"[+] {result['case']:<24} {result['best']:>9.3f}s  "
+                f"{result['lines_per_second'] or 0:>11,} lines/s  "
+                f"rss {result['peak_rss_kb'] // 1024:>5} MB")
+        previous = baseline.get((result["case"], result["lines"]))
+        if previous:
+            change = (result["best"] - previous["best"]) / previous["best"] * 100 if previous["best"] else 0
+            line += f"  ({change:+.1f}% vs {previous.get('revision') or 'baseline'})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recon functions and endpoints against fake tools")
+    parser.add_argument("--lines", type=int, default=10000, help="lines emitted per fake tool / input size")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds each fake tool waits before output")
+    parser.add_argument("--live-ratio", type=float, default=0.5, help="share of names the fake httpx reports live")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cpu-workers", type=int, help="CPU_WORKERS for post-processing (0 = in-process)")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="run only these cases")
+    parser.add_argument("--output", help="append results here as JSON lines (default: print them)")
+    parser.add_argument("--baseline", help="earlier output file to compare against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child, args.lines, args.repeat)))
+        return
+
+    baseline = load_baseline(args.baseline) if args.baseline else {}
+    revision = git_revision()
+    with tempfile.TemporaryDirectory(prefix="bench_") as workspace:
+        stubs = install_stubs(os.path.join(workspace, "bin"))
+        scratch = os.path.join(workspace, "tmp")
+        os.makedirs(scratch)
+        env = {
+            **os.environ,
+            "PATH": f"{stubs}{os.pathsep}{os.environ.get('PATH', '')}",
+            "PYTHONPATH": ROOT,
+            "BENCH_LINES": str(args.lines),
+            "BENCH_DELAY": str(args.delay),
+            "BENCH_LIVE_RATIO": str(args.live_ratio),
+            "RECON_CACHE_DISABLED": "1",
+            "RECON_CACHE_DB": os.path.join(workspace, "cache.sqlite3"),
+            "RECON_SNAPSHOT_DB": os.path.join(workspace, "snapshots.sqlite3"),
+            "URL_ARCHIVE_DIR": os.path.join(workspace, "url_archive"),
+            # tempfile users (ParamSpider and takeover workspaces) stay inside the run too
+            "TMPDIR": scratch,
+        }
+        if args.cpu_workers is not None:
+            env["CPU_WORKERS"] = str(args.cpu_workers)
+        results = []
+        for name in args.case or list(CASES):
+            result = spawn_case(name, args, env)
+            result["revision"] = revision
+            results.append(result)
+            report([result], baseline)
+
+    record = {
+        "timestamp": time.time(),
+        "revision": revision,
+        "python": sys.version.split()[0],
+        "lines": args.lines,
+        "delay": args.delay,
+        "repeat": args.repeat,
+        "cpu_workers": args.cpu_workers,
+        "results": results,
+    }
+    if args.output is None:
+        print(json.dumps(record))
+        return
+    with open(args.output, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"[✓] Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
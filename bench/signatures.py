@@ -0,0 +1,167 @@
+# bench/signatures.py
+#
+# Tech-stack detection: the compiled single-pass engine against python-Wappalyzer's
+# analyze() + analyze_with_categories() pair, on the same pages.
+#
+#   python3 -m bench.signatures                         # 50 synthetic pages
+#   python3 -m bench.signatures --pages bench/pages     # a corpus of saved pages
+#   python3 -m bench.signatures --pages bench/pages --save https://example.com
+#
+# A corpus is a directory of NAME.html files, each with an optional NAME.json
+# holding {"url": ..., "headers": {...}}. --save fetches URLs into it first.
+# Like bench/run.py, the JSON record is printed, or appended to --output.
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+
+
+def save_pages(directory: str, urls: List[str]):
+    import requests
+    from core.recon.tech_stack import USER_AGENT
+
+    os.makedirs(directory, exist_ok=True)
+    for url in urls:
+        try:
+            response = requests.get(url, timeout=15, headers={"User-Agent": USER_AGENT})
+        except requests.RequestException as e:
+            print(f"[!] {url}: {e}")
+            continue
+        name = re.sub(r"[^A-Za-z0-9.-]+", "_", url.split("://", 1)[-1]).strip("_")
+        with open(os.path.join(directory, f"{name}.html"), "w") as f:
+            f.write(response.text)
+        with open(os.path.join(directory, f"{name}.json"), "w") as f:
+            json.dump({"url": response.url, "headers": dict(response.headers)}, f)
+        print(f"[+] Saved {url} as {name}")
+
+
+def load_pages(directory: str) -> List[Dict]:
+    pages = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".html"):
+            continue
+        base = os.path.join(directory, filename[:-5])
+        with open(base + ".html", errors="replace") as f:
+            page = {"url": f"https://{filename[:-5]}/", "html": f.read(), "headers": {}}
+        if os.path.exists(base + ".json"):
+            with open(base + ".json") as f:
+                page.update(json.load(f))
+        pages.append(page)
+    return pages
+
+
+def normalized(technologies) -> set:
+    """python-Wappalyzer reports implied names with their '\\;confidence:N' suffix"""
+    return {name.split("\\;")[0] for name in technologies}
+
+
+def expected_categories(wappalyzer, technologies) -> Dict[str, List[str]]:
+    """
+    Categories per technology name. analyze_with_categories() gives a suffixed
+    name no categories (and may list it next to the bare one), so look each up by name.
+    """
+    return {name: wappalyzer.get_categories(name) for name in normalized(technologies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled tech-stack engine against python-Wappalyzer")
+    parser.add_argument("--pages", help="directory of saved pages (default: synthetic pages)")
+    parser.add_argument("--save", nargs="*", default=[], help="fetch these URLs into --pages first")
+    parser.add_argument("--count", type=int, default=50, help="synthetic pages to generate")
+    parser.add_argument("--size", type=int, default=60000, help="approximate bytes per synthetic page")
+    parser.add_argument("--output", help="append results here as JSON lines (default: print them)")
+    args = parser.parse_args()
+
+    from Wappalyzer import Wappalyzer, WebPage
+    from core.recon.signatures import SignatureEngine
+
+    if args.save:
+        if not args.pages:
+            parser.error("--save needs --pages")
+        save_pages(args.pages, args.save)
+    if args.pages:
+        pages = load_pages(args.pages)
+    else:
+        from bench.fake_tool import synthetic_pages
+        pages = list(synthetic_pages(args.count, size=args.size))
+    if not pages:
+        print("[!] No pages to benchmark")
+        sys.exit(1)
+    for page in pages:
+        # Both paths see lowercase header names, as httpx returns them
+        page["headers"] = {k.lower(): v for k, v in page["headers"].items()}
+
+    started = time.perf_counter()
+    wappalyzer = Wappalyzer.latest()
+    load_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    engine = SignatureEngine(wappalyzer)
+    compile_seconds = time.perf_counter() - started
+    matchers = sum(len(group) for group in (engine.url, engine.headers, engine.script, engine.meta, engine.html))
+
+    two_call, single_pass, mismatches = [], [], []
+    for page in pages:
+        webpage = WebPage(page["url"], page["html"], page["headers"])
+
+        started = time.perf_counter()
+        technologies = wappalyzer.analyze(webpage)
+        categories = wappalyzer.analyze_with_categories(webpage)
+        two_call.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        detected = engine.analyze(page["url"], page["html"], page["headers"], webpage.scripts, webpage.meta)
+        single_pass.append(time.perf_counter() - started)
+
+        expected = normalized(technologies)
+        got_categories = {name: tech["categories"] for name, tech in detected.items()}
+        if set(detected) != expected or got_categories != expected_categories(wappalyzer, categories):
+            mismatches.append({
+                "url": page["url"],
+                "missing": sorted(expected - set(detected)),
+                "extra": sorted(set(detected) - expected),
+            })
+
+    total_bytes = sum(len(page["html"]) for page in pages)
+    result = {
+        "case": "tech_stack_engine",
+        "pages": len(pages),
+        "bytes": total_bytes,
+        "wappalyzer_load_seconds": round(load_seconds, 3),
+        "engine_compile_seconds": round(compile_seconds, 3),
+        "matchers": matchers,
+        "prefiltered": engine.prefiltered,
+        "two_call_total": round(sum(two_call), 4),
+        "two_call_median": round(statistics.median(two_call), 5),
+        "single_pass_total": round(sum(single_pass), 4),
+        "single_pass_median": round(statistics.median(single_pass), 5),
+        "speedup": round(sum(two_call) / sum(single_pass), 1) if sum(single_pass) else None,
+        "mismatches": mismatches[:20],
+        "mismatch_count": len(mismatches),
+    }
+
+    print(f"[+] {len(pages)} pages, {total_bytes // 1024} KB of HTML; "
+          f"{engine.prefiltered}/{matchers} patterns have a literal prefilter")
+    print(f"[+] two-call   {result['two_call_total']:>8.3f}s  (median {result['two_call_median'] * 1000:.1f} ms/page)")
+    print(f"[+] single-pass{result['single_pass_total']:>8.3f}s  (median {result['single_pass_median'] * 1000:.1f} ms/page)"
+          f"  {result['speedup']}x")
+    if mismatches:
+        print(f"[!] {len(mismatches)} pages detected differently, e.g. {mismatches[0]}")
+    else:
+        print("[✓] Identical technologies and categories on every page")
+
+    record = json.dumps({"timestamp": time.time(), "python": sys.version.split()[0], "results": [result]})
+    if args.output is None:
+        print(record)
+        return
+    with open(args.output, "a") as f:
+        f.write(record + "\n")
+
+
+if __name__ == "__main__":
+    main()
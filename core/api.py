@@ -0,0 +1,304 @@
+# Request parsing, validation and response shapes shared by main.py (Flask)
+# and asgi.py (Quart). Routes in both apps read the request, hand args/body to
+# these helpers, call the sync or async backend and return what comes back.
+# Validation failures raise ApiError, which both apps turn into a response.
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.recon.delta import Base, resolve_since
+from core.recon.param_discovery import discover_all_parameters_async
+from core.recon.pipeline import resolve_stages
+from core.recon.port_scanner import scan_ports_async
+from core.recon.subdomain_enum import enumerate_subdomains_async
+from core.recon.subdomain_takeover import check_takeover_async
+from core.recon.tech_stack import detect_tech_stack
+from core.recon.url_collector import collect_urls_async
+from core.utils.burp_proxy import crawl_options
+from core.utils.jobs import DONE, Job
+from core.utils.jsonio import NDJSON_MIMETYPE, body_list, parse_body, parse_string_list
+from core.utils.metrics import TRACING, get_trace, recent_traces
+from core.utils.rate_limit import ENABLED as RATE_LIMITS_ENABLED, get_scheduler, target_key
+from core.utils.snapshots import KINDS, LIVE_WINDOW, get_snapshot_store
+from core.utils.url_archive import decode_cursor, is_hostname
+
+HOME_MESSAGE = "BugHunt-GPT API is live!"
+
+# Any of these on /collect_urls switches to a paginated query of the URL archive
+ARCHIVE_QUERY_ARGS = ("host", "path", "ext", "param", "cursor", "limit")
+MAX_ARCHIVE_PAGE = 10000
+MAX_PARAM_PAGE = 1000
+DEFAULT_MAX_URLS = 3000
+
+
+class ApiError(Exception):
+    """A request the API rejects; `body` is sent as JSON (or text) with `status`"""
+
+    def __init__(self, body, status: int = 400):
+        super().__init__(body)
+        self.body = body
+        self.status = status
+
+
+def error(message: str, status: int = 400) -> ApiError:
+    return ApiError({"error": message}, status)
+
+
+def register_jobs(job_manager):
+    """Long-running scans that can also be submitted as background jobs via /jobs"""
+    job_manager.register("port_scan", scan_ports_async, tool="nmap")
+    job_manager.register("param_discovery", discover_all_parameters_async, tool="paramspider")
+    job_manager.register("subdomains", enumerate_subdomains_async, tool="subfinder")
+    job_manager.register("collect_urls", collect_urls_async, tool="gau")
+    job_manager.register("tech_stack", detect_tech_stack, tool="wappalyzer")
+    job_manager.register("takeover", check_takeover_async, tool="subjack")
+
+
+# --- request parsing ------------------------------------------------------------
+
+def load_body(raw: bytes, content_type: Optional[str]) -> Any:
+    """Request body as JSON, or a list of values for NDJSON bodies; None if malformed"""
+    try:
+        return parse_body(raw, content_type)
+    except ValueError:
+        return None
+
+
+def require_domain(args, body: Any = None) -> str:
+    domain = args.get("domain")
+    if not domain:
+        raise ApiError(body or {"error": "No domain provided"}, 400)
+    return domain
+
+
+def wants_ndjson(args, headers) -> bool:
+    return args.get("format") == "ndjson" or NDJSON_MIMETYPE in headers.get("Accept", "")
+
+
+def wants_stream(args, headers) -> bool:
+    return args.get("stream") in ("1", "true", "ndjson") or wants_ndjson(args, headers)
+
+
+def string_list(data: Any, key: str, message: str, allow_empty: bool = True) -> List[str]:
+    """`key` from {key: [...]} or an NDJSON body, as a list of non-empty strings"""
+    values = body_list(data, key)
+    if (not isinstance(values, list) or (not values and not allow_empty)
+            or not all(isinstance(v, str) and v for v in values)):
+        raise error(message)
+    return values
+
+
+def domains_from_body(data: Any) -> List[str]:
+    return string_list(data, "domains", "'domains' must be a non-empty list of strings", allow_empty=False)
+
+
+def hosts_from_body(data: Any) -> List[str]:
+    return string_list(data, "hosts", "'hosts' must be a list of strings")
+
+
+def capture_urls(data: Any) -> List[str]:
+    """{"urls": [...]}, {"url": "..."} or NDJSON"""
+    if isinstance(data, dict) and data.get("url") and not body_list(data, "urls"):
+        data = {"urls": [data["url"]]}
+    return string_list(data, "urls", "'urls' must be a list of strings", allow_empty=False)
+
+
+def port_scan_request(data: Any) -> Tuple[Optional[List[str]], Optional[str]]:
+    """(targets, None) for a streamed multi-host scan, (None, domain) for a single one"""
+    domains = body_list(data, "domains")
+    domain = data.get("domain") if isinstance(data, dict) else None
+    if domains or (isinstance(data, dict) and data.get("stream")):
+        targets = domains or [domain]
+        if not isinstance(targets, list) or not all(isinstance(t, str) and t for t in targets):
+            raise error("'domains' must be a list of strings")
+        return list(dict.fromkeys(targets)), None
+    if not domain:
+        raise error("Missing 'domain' in request body")
+    return None, domain
+
+
+def crawl_request(data: Any, args) -> Tuple[str, Dict, bool]:
+    """(seed url, crawl options, HAR output?) from a /capture/crawl body"""
+    if not isinstance(data, dict) or not isinstance(data.get("url"), str) or not data["url"]:
+        raise error("Missing 'url' in request body")
+    try:
+        options = crawl_options(data)
+    except ValueError as e:
+        raise error(str(e))
+    return data["url"], options, (data.get("format") or args.get("format")) == "har"
+
+
+def takeover_subdomains(raw: bytes, content_type: Optional[str]) -> Tuple[List[str], Optional[Dict]]:
+    """(subdomains, None), or ([], response body) when the request names none"""
+    if not raw.strip() or raw.strip() == b'[]':
+        return [], {"subdomains": [], "results": [], "message": "No subdomains provided"}
+    try:
+        # JSON list, {"subdomains": [...]} or NDJSON
+        subdomains = parse_string_list(raw, content_type)
+    except ValueError:
+        raise error("Body must be a JSON list of strings, {\"subdomains\": [...]} or NDJSON")
+    if not subdomains:
+        return [], {"subdomains": [], "results": [], "message": "Empty subdomain list received"}
+    return subdomains, None
+
+
+def wants_archive(args) -> bool:
+    return args.get("archive") in ("1", "true") or any(arg in args for arg in ARCHIVE_QUERY_ARGS)
+
+
+def archive_query(domain: str, args) -> Dict:
+    """
+    Archive filters from the query string. The domain and cursor are checked
+    here, before a first-time collection can start.
+    """
+    if not is_hostname(domain.strip().lower()):
+        raise error("'domain' must be a hostname")
+    cursor = args.get("cursor")
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise error(str(e))
+    return {
+        "host": args.get("host"),
+        "path_prefix": args.get("path"),
+        "ext": args.get("ext"),
+        "param": args.get("param"),
+        "cursor": args.get("cursor"),
+        "limit": max(1, min(args.get("limit", 1000, type=int), MAX_ARCHIVE_PAGE)),
+    }
+
+
+def wants_clusters(args) -> bool:
+    return args.get("clusters") in ("1", "true")
+
+
+def max_urls(args) -> int:
+    return args.get("max_urls", DEFAULT_MAX_URLS, type=int)
+
+
+def live_window(args) -> int:
+    return args.get("live_window", LIVE_WINDOW, type=int)
+
+
+def param_query(args) -> Dict:
+    return {
+        "param": args.get("param"),
+        "path_prefix": args.get("path_prefix"),
+        "min_count": args.get("min_count", 0, type=int),
+        "offset": max(0, args.get("offset", 0, type=int)),
+        "limit": max(1, min(args.get("limit", 100, type=int), MAX_PARAM_PAGE)),
+    }
+
+
+def since_base(domain: str, kind: str, since: str) -> Base:
+    """
+    Resolve ?since= against the snapshot store before any enumeration starts,
+    so only a bad snapshot reference maps to 404/400
+    """
+    try:
+        return resolve_since(get_snapshot_store(), domain, kind, since)
+    except KeyError as e:
+        raise error(str(e).strip("'"), 404)
+    except ValueError:
+        raise error("'since' must be 'latest' or a snapshot id")
+
+
+def recon_stages(args) -> Optional[List[str]]:
+    stages = args.get("stages")
+    stages = [s.strip() for s in stages.split(",") if s.strip()] if stages else None
+    try:
+        resolve_stages(stages)
+    except ValueError as e:
+        raise error(str(e))
+    return stages
+
+
+def snapshot_kind(args) -> Optional[str]:
+    kind = args.get("kind")
+    if kind and kind not in KINDS:
+        raise error(f"'kind' must be one of {', '.join(KINDS)}")
+    return kind
+
+
+def job_submission(data: Any) -> Tuple[str, Dict]:
+    if not isinstance(data, dict):
+        raise error("Request body must be a JSON object")
+    kind = data.pop("type", None)
+    if not kind:
+        raise error("Missing 'type' in request body")
+    return kind, data
+
+
+# --- response shapes ------------------------------------------------------------
+
+def port_scan_result(domain: str, results: List) -> Dict:
+    return {"domain": domain, "open_ports": results, "count": len(results)}
+
+
+def tech_stack_result(domain: str, results: Dict) -> Tuple[Dict, int]:
+    if "error" in results:
+        return {"domain": domain, "error": results["error"]}, 500
+    return {
+        "domain": domain,
+        "final_url": results["url"],
+        "technologies": results["technologies"],
+        "categories": results["categories"],
+        "versions": results.get("versions", {}),
+        "technology_count": len(results["technologies"])
+    }, 200
+
+
+def tech_stack_item(result: Dict) -> Dict:
+    """One NDJSON line of a batch tech-stack run"""
+    return {
+        "domain": result["domain"],
+        "final_url": result.get("url"),
+        "technologies": result.get("technologies", []),
+        "categories": result.get("categories", {}),
+        "versions": result.get("versions", {}),
+        "error": result.get("error")
+    }
+
+
+def param_page(domain: str, query: Dict, results: Dict) -> Tuple[Dict, str, List]:
+    """
+    (head, key, items) for list_response over a parameter index query: a page of
+    URLs when one parameter was asked for, a page of parameter stats otherwise
+    """
+    key = "urls" if query.get("param") is not None else "params"
+    items = results.pop(key)
+    return {"status": "ok", "domain": domain, **results}, key, items
+
+
+def rate_limit_report(args) -> Dict:
+    # Current per-target budgets, most recently used first
+    budgets = get_scheduler().snapshot()
+    domain = args.get("domain")
+    if domain:
+        key = target_key(domain)
+        budgets = [b for b in budgets if b["key"] == key]
+    return {"enabled": RATE_LIMITS_ENABLED, "budgets": budgets}
+
+
+def trace_report(args) -> Dict:
+    # Spans are only recorded with TRACE_SPANS=1
+    trace_id = args.get("trace_id")
+    if trace_id:
+        spans = get_trace(trace_id)
+        if not spans:
+            raise error("Unknown trace id", 404)
+        return {"trace_id": trace_id, "spans": spans}
+    return {"enabled": TRACING, "traces": recent_traces(args.get("limit", 50, type=int))}
+
+
+def require_job(job: Optional[Job]) -> Job:
+    if job is None:
+        raise error("Unknown job id", 404)
+    return job
+
+
+def job_result_body(job: Optional[Job]) -> Tuple[Dict, int]:
+    job = require_job(job)
+    if job.status != DONE:
+        return job.to_dict(), 409 if job.finished_at else 202
+    return {"job_id": job.id, "type": job.kind, "result": job.result}, 200
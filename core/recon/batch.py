@@ -0,0 +1,251 @@
+# core/recon/batch.py
+
+import asyncio
+import os
+import tempfile
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import urlparse
+
+from core.recon.subdomain_enum import probe_live
+from core.recon.url_collector import TopUrls, group_similar_urls_async, normalize_url
+from core.utils.metrics import timed
+from core.utils.snapshots import get_snapshot_store, host_name
+from core.utils.streaming import iter_async
+from core.utils.tool_runner import ToolError, ToolNotFound, stream_tool
+from core.utils.url_archive import get_url_archive, is_hostname
+
+# Domains handed to one subfinder -dL / gau / waybackurls run, and groups in flight
+GROUP_SIZE = int(os.environ.get("BATCH_GROUP_SIZE", 25))
+GROUP_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 4))
+
+# Tools that take the whole group at once; "{domains_file}" is a file with one domain per line
+GROUP_SUBDOMAIN_TOOLS = [
+    (["subfinder", "-dL", "{domains_file}", "-silent"], False),
+    (["cero"], True),  # domains on stdin
+]
+# Tools that only take one domain
+DOMAIN_SUBDOMAIN_TOOLS = [
+    ["shosubgo", "-d", "{domain}"],
+]
+URL_TOOLS = [
+    ["gau", "--threads", "10"],
+    ["waybackurls"],
+]
+
+
+def normalize_domains(domains: Iterable[str]) -> List[str]:
+    """Lowercase, strip and dedupe; sorted by reversed labels so nested roots share a group"""
+    cleaned = {d.strip().lower().rstrip(".") for d in domains if d and d.strip()}
+    return sorted(cleaned, key=lambda d: d.split(".")[::-1])
+
+
+def owners(host: str, roots: Set[str]) -> List[str]:
+    """Every root domain `host` falls under (a.api.example.com -> api.example.com, example.com)"""
+    labels = host.split(".")
+    return [".".join(labels[i:]) for i in range(len(labels)) if ".".join(labels[i:]) in roots]
+
+
+def chunk(items: List[str], size: int) -> Iterator[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def merge_streams(streams: List[AsyncIterator[str]]) -> AsyncIterator[str]:
+    """Interleave several tool streams; a missing or failing tool just ends its own stream"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=10000)
+    done = object()
+
+    async def pump(lines):
+        try:
+            async for line in lines:
+                await queue.put(line)
+        except ToolNotFound:
+            pass
+        except ToolError as e:
+            print(f"[!] Error: {e}")
+        finally:
+            await queue.put(done)
+
+    tasks = [asyncio.create_task(pump(stream)) for stream in streams]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class SharedProbe:
+    """
+    Names already sent to httpx by some group, so a host under two overlapping
+    roots is probed once. Each group's probe results are published when its
+    httpx run finishes; groups that saw a name first elsewhere wait for that.
+    """
+
+    def __init__(self):
+        self.claimed: Dict[str, asyncio.Future] = {}
+
+    def claim(self, name: str, results: asyncio.Future) -> Optional[asyncio.Future]:
+        """Claim `name` for a group; returns the owning group's results if already claimed"""
+        existing = self.claimed.get(name)
+        if existing is None:
+            self.claimed[name] = results
+        return existing
+
+
+@timed("batch.subdomain_group")
+async def _subdomain_group(group: List[str], shared: SharedProbe) -> Dict[str, List[str]]:
+    roots = set(group)
+    names_by_domain: Dict[str, Set[str]] = {domain: set() for domain in group}
+    borrowed: Dict[str, asyncio.Future] = {}
+    results: asyncio.Future = asyncio.get_running_loop().create_future()
+    live: Dict[str, str] = {}
+
+    with tempfile.NamedTemporaryFile("w", prefix="batch_domains_", suffix=".txt") as domains_file:
+        domains_file.write("\n".join(group) + "\n")
+        domains_file.flush()
+
+        streams = []
+        for template, stdin in GROUP_SUBDOMAIN_TOOLS:
+            command = [arg.format(domains_file=domains_file.name) for arg in template]
+            streams.append(stream_tool(command, "\n".join(group) + "\n" if stdin else None, target=group))
+        for domain in group:
+            for template in DOMAIN_SUBDOMAIN_TOOLS:
+                streams.append(stream_tool([arg.format(domain=domain) for arg in template], target=domain))
+
+        async def new_names() -> AsyncIterator[str]:
+            seen = set()
+            async for line in merge_streams(streams):
+                name = line.strip().lower().rstrip(".")
+                if name in seen:
+                    continue
+                seen.add(name)
+                matched = owners(name, roots)
+                if not matched:
+                    continue
+                for domain in matched:
+                    names_by_domain[domain].add(name)
+                existing = shared.claim(name, results)
+                if existing is None:
+                    yield name
+                else:
+                    borrowed[name] = existing
+
+        # One prober for the whole group, fed names as the tools find them
+        try:
+            async for url in probe_live(new_names(), target=group):
+                live[host_name(url)] = url
+        finally:
+            results.set_result(live)
+
+    for name, other in borrowed.items():
+        url = (await other).get(name)
+        if url:
+            live[name] = url
+
+    return {
+        domain: sorted(live[name] for name in names if name in live)
+        for domain, names in names_by_domain.items()
+    }
+
+
+@timed("batch.url_group")
+async def _url_group(group: List[str], max_urls: int) -> Dict[str, List[str]]:
+    roots = set(group)
+    top = {domain: TopUrls(max_urls) for domain in group}
+    archives = {domain: get_url_archive(domain).writer() for domain in group if is_hostname(domain)}
+    domains_input = "\n".join(group) + "\n"
+
+    try:
+        async for line in merge_streams([stream_tool(command, domains_input, target=group) for command in URL_TOOLS]):
+            clean_url = normalize_url(line)
+            if clean_url is None:
+                continue
+            host = (urlparse(clean_url).hostname or "").lower()
+            for domain in owners(host, roots):
+                top[domain].add(clean_url)
+                archive = archives.get(domain)
+                if archive is not None and archive.add(clean_url) and archive.full:
+                    await archive.flush_async()
+        for archive in archives.values():
+            archive.archive.mark_collected()
+    finally:
+        for archive in archives.values():
+            await archive.flush_async()
+
+    return {domain: await group_similar_urls_async(urls.urls()) for domain, urls in top.items()}
+
+
+async def _run_groups(domains: Iterable[str], run_group, concurrency: int) -> AsyncIterator[Dict]:
+    """Run domain groups with bounded concurrency, yielding each group's per-domain results as it finishes"""
+    groups = list(chunk(normalize_domains(domains), GROUP_SIZE))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(group):
+        async with semaphore:
+            try:
+                return group, await run_group(group), None
+            except Exception as e:
+                print(f"[!] Batch group {group[0]}..{group[-1]} failed: {e}")
+                return group, {}, str(e)
+
+    tasks = [asyncio.create_task(run(group)) for group in groups]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            group, results, error = await next_done
+            for domain in group:
+                yield {"domain": domain, "results": results.get(domain, []), "error": error}
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def enumerate_subdomains_batch(domains: Iterable[str],
+                                     concurrency: int = GROUP_CONCURRENCY) -> AsyncIterator[Dict]:
+    """
+    Live subdomains for many root domains. Domains are enumerated in groups
+    (subfinder -dL and cero over stdin once per group, shosubgo per domain), each
+    group feeds one httpx, and names seen under overlapping roots are probed once.
+    Yields {"domain", "subdomains", "count"} per domain as its group finishes.
+    """
+    shared = SharedProbe()
+    store = get_snapshot_store()
+
+    async def run_group(group):
+        return await _subdomain_group(group, shared)
+
+    async for result in _run_groups(domains, run_group, concurrency):
+        hosts = result.pop("results")
+        if hosts:
+            store.mark_live(result["domain"], hosts)
+        yield {"domain": result["domain"], "subdomains": hosts, "count": len(hosts), "error": result["error"]}
+
+
+async def collect_urls_batch(domains: Iterable[str], max_urls: int = 3000,
+                             concurrency: int = GROUP_CONCURRENCY) -> AsyncIterator[Dict]:
+    """
+    URLs for many root domains: one gau and one waybackurls run per group, fed the
+    group's domains on stdin, with URLs assigned back to their root by host.
+    Yields {"domain", "collected_urls", "count"} per domain as its group finishes.
+    """
+    async def run_group(group):
+        return await _url_group(group, max_urls)
+
+    async for result in _run_groups(domains, run_group, concurrency):
+        urls = result.pop("results")
+        yield {"domain": result["domain"], "collected_urls": urls, "count": len(urls), "error": result["error"]}
+
+
+def iter_subdomains_batch(domains: Iterable[str]) -> Iterator[Dict]:
+    return iter_async(enumerate_subdomains_batch(domains))
+
+
+def iter_collect_urls_batch(domains: Iterable[str], max_urls: int = 3000) -> Iterator[Dict]:
+    return iter_async(collect_urls_batch(domains, max_urls))
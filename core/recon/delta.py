@@ -0,0 +1,101 @@
+# core/recon/delta.py
+
+import asyncio
+from typing import Dict, Optional, Set, Tuple, Union
+
+from core.recon.subdomain_enum import _iterate, probe_live, run_tools_concurrently
+from core.recon.url_collector import normalize_url, stream_tools_concurrently
+from core.utils.metrics import timed
+from core.utils.snapshots import LIVE_WINDOW, SnapshotStore, diff, get_snapshot_store, host_name
+
+Since = Union[None, int, str]
+# What resolve_since returns: (snapshot id, its items)
+Base = Tuple[Optional[int], Set[str]]
+
+
+def resolve_since(store: SnapshotStore, domain: str, kind: str, since: Since) -> Base:
+    """
+    Map a `since` value to (snapshot id, items). None compares against nothing,
+    "latest" against the newest snapshot, anything else is a snapshot id.
+    Raises KeyError for an unknown snapshot and ValueError for a malformed one.
+    """
+    if since is None or since == "":
+        return None, set()
+    if since == "latest":
+        latest = store.latest(domain, kind)
+        if latest is None:
+            return None, set()
+        since = latest["id"]
+    snapshot_id = int(since)
+    return snapshot_id, store.items(snapshot_id, domain, kind)
+
+
+def _delta(domain: str, kind: str, base_id: Optional[int], base: Set[str],
+           current: Set[str], store: SnapshotStore) -> Dict:
+    if not current and base:
+        # An empty run is far more likely a tool failure than every asset vanishing
+        print(f"[!] No {kind} found for {domain}, keeping snapshot {base_id}")
+        return {"domain": domain, "snapshot": None, "since": base_id, "count": 0,
+                "added": [], "removed": []}
+
+    snapshot = store.save(domain, kind, current)
+    changes = diff(base, current)
+    print(f"[✓] {kind} delta for {domain}: +{len(changes['added'])} -{len(changes['removed'])}")
+    return {"domain": domain, "snapshot": snapshot["id"], "since": base_id,
+            "count": snapshot["count"], **changes}
+
+
+@timed("delta.subdomains")
+async def subdomain_delta_async(domain: str, since: Since = "latest", live_window: int = LIVE_WINDOW,
+                                store: Optional[SnapshotStore] = None, base: Optional[Base] = None) -> Dict:
+    """
+    Enumerate subdomains and return live hosts added/removed since a snapshot.
+    Names confirmed live within `live_window` seconds are not sent to httpx again.
+    Pass `base` (from resolve_since) to skip resolving `since` here.
+    """
+    store = store or get_snapshot_store()
+    base_id, base = base or resolve_since(store, domain, "live_hosts", since)
+
+    names = await run_tools_concurrently(domain)
+    recent = store.recently_live(domain, live_window)
+    reused = {recent[name] for name in names if name in recent}
+    to_probe = [name for name in names if name not in recent]
+    print(f"[+] Probing {len(to_probe)} of {len(names)} names ({len(reused)} confirmed recently)")
+
+    probed = [host async for host in probe_live(_iterate(to_probe), target=domain)] if to_probe else []
+    store.mark_live(domain, probed)
+    if names:
+        store.save(domain, "subdomains", names)
+
+    # A host answering on http and https counts once, under the URL seen most recently
+    live = {host_name(url): url for url in reused}
+    live.update((host_name(url), url) for url in probed)
+
+    result = _delta(domain, "live_hosts", base_id, base, set(live.values()), store)
+    result.update(names=len(names), probed=len(to_probe), reused=len(reused))
+    return result
+
+
+@timed("delta.urls")
+async def url_delta_async(domain: str, since: Since = "latest",
+                          store: Optional[SnapshotStore] = None, base: Optional[Base] = None) -> Dict:
+    """Collect the full normalized URL set and return URLs added/removed since a snapshot"""
+    store = store or get_snapshot_store()
+    base_id, base = base or resolve_since(store, domain, "urls", since)
+
+    urls = set()
+    async for line in stream_tools_concurrently(domain):
+        clean_url = normalize_url(line)
+        if clean_url is not None:
+            urls.add(clean_url)
+
+    return _delta(domain, "urls", base_id, base, urls, store)
+
+
+def subdomain_delta(domain: str, since: Since = "latest", live_window: int = LIVE_WINDOW,
+                    base: Optional[Base] = None) -> Dict:
+    return asyncio.run(subdomain_delta_async(domain, since, live_window, base=base))
+
+
+def url_delta(domain: str, since: Since = "latest", base: Optional[Base] = None) -> Dict:
+    return asyncio.run(url_delta_async(domain, since, base=base))
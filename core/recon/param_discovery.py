@@ -1,55 +1,290 @@
-import subprocess
+import asyncio
 import os
+import shutil
+import tempfile
+import zlib
+from array import array
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 
+from core.utils.cache import cached, ttl_from_env
+from core.utils.metrics import timed
+from core.utils.streaming import iter_async
+from core.utils.tool_runner import ToolError, run_tool
+from core.utils.workers import map_chunks, map_chunks_async, should_offload
+
+
+class ParamIndex:
+    """
+    Inverted index from parameter name to the URLs that use it. Every URL is
+    stored once in `urls`; postings are compact arrays of integer URL ids.
+    """
+
+    def __init__(self):
+        self.urls: List[str] = []
+        self.url_ids: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+        self.cardinality: Dict[str, int] = {}
+        self._values: Dict[str, set] = {}
+        self.frozen = False
+
+    def freeze(self) -> "ParamIndex":
+        """Make the index read-only, so one instance can be shared by every cache hit"""
+        self.frozen = True
+        return self
+
+    def _check_writable(self):
+        if self.frozen:
+            raise RuntimeError("ParamIndex is frozen")
+
+    def add(self, url: str) -> bool:
+        self._check_writable()
+        url = url.strip()
+        if "?" not in url or url in self.url_ids:
+            return False
+        params = parse_qs(urlparse(url).query)
+        if not params:
+            return False
+
+        url_id = len(self.urls)
+        self.urls.append(url)
+        self.url_ids[url] = url_id
+        for param, values in params.items():
+            posting = self.postings.get(param)
+            if posting is None:
+                posting = self.postings[param] = array("I")
+                self._values[param] = set()
+            posting.append(url_id)
+            # A stable hash, so value sets built in different worker processes merge
+            self._values[param].update(zlib.crc32(v.encode()) for v in values)
+            self.cardinality[param] = len(self._values[param])
+        return True
+
+    def add_batch(self, batch: Tuple[str, Dict[str, bytes], Dict[str, bytes]]):
+        """Fold in an _index_batch result; a URL already indexed keeps its first id"""
+        self._check_writable()
+        text, postings, values = batch
+        if not text:
+            return
+        ids = []
+        for url in text.split("\n"):
+            if url in self.url_ids:
+                ids.append(-1)
+                continue
+            self.url_ids[url] = len(self.urls)
+            ids.append(len(self.urls))
+            self.urls.append(url)
+        for param, raw in postings.items():
+            batch_ids = array("I")
+            batch_ids.frombytes(raw)
+            fresh = [ids[i] for i in batch_ids if ids[i] >= 0]
+            if not fresh:
+                continue
+            if param not in self.postings:
+                self.postings[param] = array("I")
+                self._values[param] = set()
+            self.postings[param].extend(fresh)
+            hashes = array("I")
+            hashes.frombytes(values[param])
+            self._values[param].update(hashes)
+            self.cardinality[param] = len(self._values[param])
+
+    def to_dict(self) -> Dict:
+        """Compact JSON-friendly form: URLs once, postings as id lists, value hashes per param"""
+        return {
+            "urls": self.urls,
+            "postings": {param: posting.tolist() for param, posting in self.postings.items()},
+            "cardinality": self.cardinality,
+            "values": {param: sorted(values) for param, values in self._values.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ParamIndex":
+        index = cls()
+        index.urls = list(data["urls"])
+        index.url_ids = {url: i for i, url in enumerate(index.urls)}
+        index.postings = {param: array("I", ids) for param, ids in data["postings"].items()}
+        index._values = {param: set(hashes) for param, hashes in data.get("values", {}).items()}
+        index.cardinality = {
+            param: len(index._values[param]) if param in index._values else count
+            for param, count in data["cardinality"].items()
+        }
+        return index
+
+    def param_map(self):
+        """Expand back to the legacy (param_names, {param: [urls]}) shape"""
+        return list(self.postings), {
+            param: [self.urls[i] for i in posting]
+            for param, posting in self.postings.items()
+        }
+
+    def param_stats(self, param: str) -> Dict:
+        return {
+            "param": param,
+            "count": len(self.postings.get(param, ())),
+            "distinct_values": self.cardinality.get(param, 0),
+        }
+
+    def _url_ids(self, param: str, path_prefix: Optional[str]) -> Iterator[int]:
+        for url_id in self.postings.get(param, ()):
+            if path_prefix is None or urlparse(self.urls[url_id]).path.startswith(path_prefix):
+                yield url_id
+
+    def query(self, param: Optional[str] = None, path_prefix: Optional[str] = None,
+              min_count: int = 0, offset: int = 0, limit: int = 100) -> Dict:
+        """
+        Without `param`: a page of parameter stats, most frequent first.
+        With `param`: that parameter's stats plus a page of its URLs.
+        `path_prefix` restricts counts and URLs to matching paths.
+        """
+        if param is not None:
+            ids = list(self._url_ids(param, path_prefix))
+            return {
+                **self.param_stats(param),
+                "matched": len(ids),
+                "offset": offset,
+                "limit": limit,
+                "urls": [self.urls[i] for i in ids[offset:offset + limit]],
+            }
+
+        rows = []
+        for name in self.postings:
+            stats = self.param_stats(name)
+            if path_prefix is not None:
+                stats["count"] = sum(1 for _ in self._url_ids(name, path_prefix))
+            if stats["count"] and stats["count"] >= min_count:
+                rows.append(stats)
+        rows.sort(key=lambda row: (-row["count"], row["param"]))
+        return {
+            "total_urls": len(self.urls),
+            "total_params": len(rows),
+            "offset": offset,
+            "limit": limit,
+            "params": rows[offset:offset + limit],
+        }
+
+
+def _index_batch(batch: str):
+    """
+    Worker side of the index build: the batch's indexed URLs newline-joined,
+    postings as id bytes and each parameter's value hashes as bytes
+    """
+    index = ParamIndex()
+    for url in batch.split("\n"):
+        index.add(url)
+    return (
+        "\n".join(index.urls),
+        {param: posting.tobytes() for param, posting in index.postings.items()},
+        {param: array("I", values).tobytes() for param, values in index._values.items()},
+    )
+
+
+@timed("params.extract")
 def extract_parameters(urls):
-    param_names = set()
-    param_map = {}
+    urls = urls if isinstance(urls, list) else list(urls)
+    index = ParamIndex()
+    if not should_offload(len(urls)):
+        for url in urls:
+            index.add(url)
+        return index.param_map()
+
+    # URLs are parsed in batches on the CPU pool; a URL repeated across batches counts once
+    for batch in map_chunks(_index_batch, urls):
+        index.add_batch(batch)
+    return index.param_map()
+
 
-    for url in urls:
-        parsed = urlparse(url)
-        query = parsed.query
-        params = parse_qs(query)
+async def follow_file(path: str, writer: asyncio.Task, poll_interval: float = 0.2) -> AsyncIterator[str]:
+    """Yield complete lines from `path` while the `writer` task is still running"""
+    while not os.path.exists(path):
+        if writer.done():
+            return
+        await asyncio.sleep(poll_interval)
 
-        for param in params:
-            param_names.add(param)
-            if param not in param_map:
-                param_map[param] = []
-            param_map[param].append(url)
+    with open(path, "r", errors="ignore") as f:
+        pending = ""
+        while True:
+            chunk = f.read(65536)
+            if chunk:
+                pending += chunk
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    yield line
+                continue
+            if writer.done():
+                rest = f.read()
+                if rest:
+                    pending += rest
+                    continue
+                break
+            await asyncio.sleep(poll_interval)
+        if pending:
+            yield pending
 
-    return list(param_names), param_map
 
-def run_paramspider(domain):
+@timed("params.paramspider")
+async def stream_paramspider(domain) -> AsyncIterator[str]:
+    """Run ParamSpider and yield result lines as it writes them"""
     print(f"[+] Running ParamSpider on: {domain}")
 
     paramspider_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../ParamSpider"))
-    results_dir = os.path.join(paramspider_dir, "results")
-    output_file = os.path.join(results_dir, f"{domain}.txt")
-
-    # Ensure results folder exists
-    os.makedirs(results_dir, exist_ok=True)
+    # ParamSpider writes results/<domain>.txt under its working directory; a
+    # private one per run means concurrent runs for a domain never share a file
+    workdir = tempfile.mkdtemp(prefix="paramspider-")
+    output_file = os.path.join(workdir, "results", f"{domain}.txt")
 
+    spider = asyncio.create_task(run_tool([
+        "python3", "-m", "paramspider.main",
+        "-d", domain
+    ], cwd=workdir, env={**os.environ, "PYTHONPATH": paramspider_dir}))
     try:
-        subprocess.run([
-            "python3", "-m", "paramspider.main",
-            "-d", domain
-        ], check=True, cwd=paramspider_dir, env={**os.environ, "PYTHONPATH": paramspider_dir})
-    except subprocess.CalledProcessError as e:
+        async for line in follow_file(output_file, spider):
+            yield line
+        await spider
+    except ToolError as e:
         print(f"[!] ParamSpider error: {e}")
+    finally:
+        spider.cancel()
+        await asyncio.gather(spider, return_exceptions=True)
+        shutil.rmtree(workdir, ignore_errors=True)
 
-    return output_file if os.path.exists(output_file) else None
 
-def discover_all_parameters(domain):
-    paramspider_file = run_paramspider(domain)
-    collected_urls = set()
+def run_paramspider(domain) -> Iterator[str]:
+    return iter_async(stream_paramspider(domain))
+
+
+@timed("params.index")
+async def build_param_index(lines: AsyncIterator[str]) -> ParamIndex:
+    """Index ParamSpider output in batches on the CPU pool while the spider runs"""
+    index = ParamIndex()
+    async for batch in map_chunks_async(_index_batch, lines):
+        index.add_batch(batch)
+    return index
 
-    if paramspider_file and os.path.exists(paramspider_file):
-        with open(paramspider_file, "r") as f:
-            for line in f:
-                url = line.strip()
-                if "?" in url:
-                    collected_urls.add(url)
 
-    print(f"[\u2713] Total URLs with parameters collected: {len(collected_urls)}")
+# The memory tier shares each domain's built (frozen) index, so a query reads it
+# directly; SQLite holds the to_dict form and rebuilds it once after a restart or eviction
+@cached("param_index", ttl=ttl_from_env("param_discovery", 12 * 3600), stale_ttl=48 * 3600,
+        cache_if=lambda index: bool(index.urls), encode=ParamIndex.to_dict,
+        decode=lambda data: ParamIndex.from_dict(data).freeze(), share=True)
+async def discover_param_index_async(domain) -> ParamIndex:
+    index = await build_param_index(stream_paramspider(domain))
+    print(f"[✓] Total URLs with parameters collected: {len(index.urls)}")
+    return index.freeze()
+
+
+def discover_param_index(domain) -> ParamIndex:
+    return asyncio.run(discover_param_index_async(domain))
+
+
+@timed("params.query")
+def query_parameters(domain, **filters) -> Dict:
+    return discover_param_index(domain).query(**filters)
+
+
+def discover_all_parameters(domain):
+    return discover_param_index(domain).param_map()
+
 
-    return extract_parameters(list(collected_urls))
+async def discover_all_parameters_async(domain):
+    return (await discover_param_index_async(domain)).param_map()
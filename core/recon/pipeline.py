@@ -0,0 +1,209 @@
+# core/recon/pipeline.py
+
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+import httpx
+
+from core.recon.subdomain_enum import stream_live_subdomains
+from core.recon.takeover_engine import detect_takeovers_async
+from core.recon.tech_stack import (
+    USER_AGENT, MAX_RESPONSE_BYTES, analyze_page_async, fetch_capped, normalize_target, stored_page
+)
+from core.recon.url_collector import (
+    TopUrls, group_similar_urls_async, normalize_url, stream_tools_concurrently
+)
+from core.recon.param_discovery import ParamIndex
+from core.utils.metrics import track
+from core.utils.streaming import iter_async
+
+# stage -> stages it consumes
+STAGE_DEPENDENCIES = {
+    "subdomains": [],
+    "takeover": ["subdomains"],
+    "tech_stack": ["subdomains"],
+    "collect_urls": [],
+    "param_discovery": ["collect_urls"],
+}
+DEFAULT_STAGES = list(STAGE_DEPENDENCIES)
+TAKEOVER_BATCH = 200
+TECH_CONCURRENCY = 50
+
+
+class Artifact:
+    """
+    Append-only stream shared between stages. Every subscriber sees every item
+    from the start, so a downstream stage can begin on partial output.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items: List = []
+        self.closed = False
+        self.changed = asyncio.Condition()
+
+    async def put(self, item):
+        async with self.changed:
+            self.items.append(item)
+            self.changed.notify_all()
+
+    async def close(self):
+        async with self.changed:
+            self.closed = True
+            self.changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator:
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: position < len(self.items) or self.closed)
+                batch = self.items[position:]
+            if not batch:
+                return
+            position += len(batch)
+            for item in batch:
+                yield item
+
+
+def resolve_stages(requested: Optional[Iterable[str]]) -> List[str]:
+    """Add the upstream stages a request depends on, keeping DAG order"""
+    wanted = set()
+    pending = list(requested or DEFAULT_STAGES)
+    while pending:
+        stage = pending.pop()
+        if stage not in STAGE_DEPENDENCIES:
+            raise ValueError(f"Unknown stage: {stage}")
+        if stage not in wanted:
+            wanted.add(stage)
+            pending.extend(STAGE_DEPENDENCIES[stage])
+    return [stage for stage in STAGE_DEPENDENCIES if stage in wanted]
+
+
+class ReconPipeline:
+    """
+    Runs the recon stages for one domain as a dependency graph. Independent
+    stages run concurrently and intermediate artifacts (live hosts, URLs, the
+    parameter index) are shared in process instead of recomputed; pages the
+    prober already fetched come from the shared response store.
+    """
+
+    def __init__(self, domain: str, stages: Optional[Iterable[str]] = None, max_urls: int = 3000):
+        self.domain = domain
+        self.stages = resolve_stages(stages)
+        self.requested = set(stages or DEFAULT_STAGES)
+        self.max_urls = max_urls
+        self.live_hosts = Artifact("live_hosts")
+        self.param_index = ParamIndex()
+        self.urls_done = asyncio.Event()
+        self.events: asyncio.Queue = asyncio.Queue()
+
+    async def emit(self, stage: str, **payload):
+        if stage in self.requested:
+            await self.events.put({"stage": stage, **payload})
+
+    async def run_subdomains(self):
+        try:
+            async for host in stream_live_subdomains(self.domain):
+                await self.live_hosts.put(host)
+                await self.emit("subdomains", item=host)
+        finally:
+            await self.live_hosts.close()
+
+    async def run_takeover(self):
+        async def check(batch):
+            for result in await detect_takeovers_async(batch):
+                await self.emit("takeover", item=result)
+
+        batch = []
+        async for host in self.live_hosts.subscribe():
+            batch.append(host)
+            if len(batch) >= TAKEOVER_BATCH:
+                await check(batch)
+                batch = []
+        if batch:
+            await check(batch)
+
+    async def run_tech_stack(self):
+        semaphore = asyncio.Semaphore(TECH_CONCURRENCY)
+
+        async def detect(client, host):
+            # One host failing gets an error item; the rest of the stage carries on
+            try:
+                page = stored_page(host)
+                if page is None:
+                    async with semaphore:
+                        page = await fetch_capped(client, normalize_target(host), MAX_RESPONSE_BYTES)
+                result = await analyze_page_async(*page)
+            except httpx.HTTPError as e:
+                result = {"error": f"Network error: {str(e)}"}
+            except Exception as e:
+                print(f"[!] Tech detection failed for {host}: {e}")
+                result = {"error": f"Detection failed: {str(e)}"}
+            result["domain"] = host
+            await self.emit("tech_stack", item=result)
+
+        async with httpx.AsyncClient(
+            timeout=15.0, follow_redirects=True, verify=False,
+            headers={'User-Agent': USER_AGENT}
+        ) as client:
+            tasks = []
+            async for host in self.live_hosts.subscribe():
+                tasks.append(asyncio.create_task(detect(client, host)))
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_collect_urls(self):
+        # One gau/waybackurls crawl feeds both the URL list and the parameter index
+        top = TopUrls(self.max_urls)
+        try:
+            async for line in stream_tools_concurrently(self.domain):
+                clean_url = normalize_url(line)
+                if clean_url is None:
+                    continue
+                top.add(clean_url)
+                self.param_index.add(clean_url)
+        finally:
+            self.urls_done.set()
+        for url in await group_similar_urls_async(top.urls()):
+            await self.emit("collect_urls", item=url)
+
+    async def run_param_discovery(self):
+        await self.urls_done.wait()
+        await self.emit("param_discovery", item=self.param_index.query(limit=1000))
+
+    async def _run_stage(self, stage: str):
+        try:
+            with track(f"pipeline.{stage}", domain=self.domain):
+                await getattr(self, f"run_{stage}")()
+            await self.emit(stage, done=True)
+        except Exception as e:
+            print(f"[!] Recon stage {stage} failed: {e}")
+            await self.emit(stage, done=True, error=str(e))
+
+    async def run(self) -> AsyncIterator[Dict]:
+        """Run every stage and yield events ({stage, item} or {stage, done}) as they happen"""
+        print(f"[+] Recon pipeline for {self.domain}: {', '.join(self.stages)}")
+        runner = asyncio.create_task(self._run_all())
+        try:
+            while True:
+                event = await self.events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+
+    async def _run_all(self):
+        try:
+            await asyncio.gather(*[self._run_stage(stage) for stage in self.stages])
+        finally:
+            await self.events.put(None)
+
+
+def iter_recon(domain: str, stages: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+    """Sync generator over ReconPipeline.run for streaming Flask responses"""
+    async def run():
+        async for event in ReconPipeline(domain, stages).run():
+            yield event
+
+    return iter_async(run())
@@ -1,33 +1,144 @@
-# core/scan/port_scanner.py
+# core/recon/port_scanner.py
 
-import subprocess
-from io import StringIO
+import asyncio
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, TypedDict
 
-def scan_ports(domain):
+from core.utils.streaming import iter_async
+from core.utils.metrics import timed
+from core.utils.tool_runner import stream_tool
+
+NMAP_ARGS = ["-T4", "-A", "-v"]
+
+
+class ServiceRecord(TypedDict):
+    name: Optional[str]
+    product: Optional[str]
+    version: Optional[str]
+    extrainfo: Optional[str]
+
+
+class PortRecord(TypedDict):
+    port: int
+    protocol: str
+    state: str
+    reason: Optional[str]
+    service: ServiceRecord
+    scripts: dict
+
+
+class HostRecord(TypedDict):
+    target: Optional[str]
+    address: Optional[str]
+    hostnames: List[str]
+    status: str
+    ports: List[PortRecord]
+
+
+def parse_host(elem: ET.Element) -> HostRecord:
+    """Convert one <host> element from nmap's XML output into a HostRecord"""
+    address = None
+    for addr in elem.findall("address"):
+        if addr.get("addrtype") in ("ipv4", "ipv6"):
+            address = addr.get("addr")
+            break
+
+    hostnames = [h.get("name") for h in elem.findall("hostnames/hostname") if h.get("name")]
+    user_hostnames = [
+        h.get("name") for h in elem.findall("hostnames/hostname")
+        if h.get("type") == "user" and h.get("name")
+    ]
+    status = elem.find("status")
+
+    ports: List[PortRecord] = []
+    for port in elem.findall("ports/port"):
+        state = port.find("state")
+        service = port.find("service")
+        ports.append({
+            "port": int(port.get("portid")),
+            "protocol": port.get("protocol"),
+            "state": state.get("state") if state is not None else "unknown",
+            "reason": state.get("reason") if state is not None else None,
+            "service": {
+                "name": service.get("name") if service is not None else None,
+                "product": service.get("product") if service is not None else None,
+                "version": service.get("version") if service is not None else None,
+                "extrainfo": service.get("extrainfo") if service is not None else None,
+            },
+            "scripts": {s.get("id"): s.get("output") for s in port.findall("script")},
+        })
+
+    return {
+        "target": user_hostnames[0] if user_hostnames else (hostnames[0] if hostnames else address),
+        "address": address,
+        "hostnames": hostnames,
+        "status": status.get("state") if status is not None else "unknown",
+        "ports": ports,
+    }
+
+
+def format_port(port: PortRecord) -> str:
+    """Render a PortRecord like nmap's own '80/tcp open http nginx 1.18' line"""
+    service = port["service"]
+    parts = [f"{port['port']}/{port['protocol']}", port["state"]]
+    parts += [v for v in (service["name"], service["product"], service["version"]) if v]
+    return " ".join(parts)
+
+
+def scan_hosts(targets: Iterable[str], extra_args: Optional[List[str]] = None) -> Iterator[HostRecord]:
+    """
+    Scan many targets with a single nmap run and yield each host as soon as nmap
+    finishes it. The XML report (-oX -) is parsed incrementally from stdout.
+    """
+    targets = list(dict.fromkeys(t.strip() for t in targets if t and t.strip()))
+    if not targets:
+        return
+
+    print(f"[+] Starting Nmap port scan on {len(targets)} target(s)")
+    yield from iter_async(stream_hosts(targets, extra_args))
+
+
+@timed("ports.scan")
+async def stream_hosts(targets: List[str], extra_args: Optional[List[str]] = None) -> AsyncIterator[HostRecord]:
+    """Async core of scan_hosts: targets go in on stdin (-iL -), XML comes back on stdout"""
+    command = ["nmap", *(extra_args or NMAP_ARGS), "-oX", "-", "-iL", "-"]
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    depth = 0
+    async for chunk in stream_tool(command, "\n".join(targets) + "\n", chunked=True, target=targets):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = elem
+                continue
+            depth -= 1
+            record = parse_host(elem) if elem.tag == "host" else None
+            if depth == 1:
+                # A finished child of <nmaprun> (a host, or -v task progress) is dropped
+                # from the tree, so memory stays flat over large -iL target lists
+                root.remove(elem)
+            if record is not None:
+                yield record
+
+
+async def scan_ports_async(domain):
     print(f"[+] Starting Nmap port scan on: {domain}")
     scan_results = []
 
     try:
-        # Run nmap and capture output directly to memory
-        result = subprocess.run([
-            "nmap","-T4", "-A", "-v",  domain
-        ], capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"[!] Nmap scanning failed with return code {result.returncode}")
-            print(f"Error output: {result.stderr}")
-            return []
-            
-        # Process the output directly from memory
-        output = result.stdout
-        for line in StringIO(output):
-            line = line.strip()
-            if line and ("/tcp" in line or "/udp" in line) and ("open" in line):
-                scan_results.append(line)
-                
+        async for host in stream_hosts([domain]):
+            scan_results.extend(
+                format_port(port) for port in host["ports"] if port["state"] == "open"
+            )
     except Exception as e:
         print(f"[!] Nmap scanning failed: {e}")
         return []
 
     print(f"[✓] Found {len(scan_results)} open ports.")
     return scan_results
+
+
+def scan_ports(domain):
+    return asyncio.run(scan_ports_async(domain))
@@ -0,0 +1,142 @@
+# core/recon/prober.py
+
+import asyncio
+import html
+import os
+import re
+import time
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from core.utils.metrics import timed
+from core.utils.rate_limit import get_scheduler
+from core.utils.response_store import ResponseStore, get_response_store
+
+# "httpx" pipes names through the external httpx binary; "native" probes in process
+PROBE_BACKEND = os.environ.get("PROBE_BACKEND", "httpx").lower()
+PROBE_CONCURRENCY = int(os.environ.get("PROBE_CONCURRENCY", 100))
+PROBE_PER_HOST = int(os.environ.get("PROBE_PER_HOST", 2))
+PROBE_TIMEOUT = float(os.environ.get("PROBE_TIMEOUT", 10))
+PROBE_MAX_BYTES = int(os.environ.get("PROBE_MAX_BYTES", 512 * 1024))
+# Same order as httpx: HTTPS first, plain HTTP only if that fails
+SCHEMES = ("https", "http")
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+
+def page_title(body: str) -> Optional[str]:
+    match = TITLE_RE.search(body[:65536])
+    if not match:
+        return None
+    return " ".join(html.unescape(match.group(1)).split())[:200] or None
+
+
+async def fetch_page(client: httpx.AsyncClient, url: str, max_bytes: int = PROBE_MAX_BYTES) -> Dict:
+    """GET a URL (following redirects) and return status, headers, title and a capped body"""
+    started = time.perf_counter()
+    async with client.stream("GET", url) as response:
+        body = bytearray()
+        truncated = False
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk[:max_bytes - len(body)])
+            if len(body) >= max_bytes:
+                truncated = True
+                break
+        text = bytes(body).decode(response.encoding or "utf-8", errors="replace")
+        return {
+            "url": url,
+            "final_url": str(response.url),
+            "status_code": response.status_code,
+            "title": page_title(text),
+            "headers": dict(response.headers),
+            "body": text,
+            "max_bytes": max_bytes,
+            "truncated": truncated,
+            "response_time_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+async def probe_host(client: httpx.AsyncClient, name: str) -> Optional[Dict]:
+    """First scheme that answers with any HTTP response, or None if neither does"""
+    scheduler = get_scheduler()
+    for scheme in SCHEMES:
+        try:
+            async with scheduler.request(name) as ticket:
+                response = await fetch_page(client, f"{scheme}://{name}")
+                ticket.observe(response["status_code"], response["headers"])
+            return response
+        except httpx.HTTPError:
+            continue
+    return None
+
+
+@timed("subdomains.probe_native")
+async def probe_hosts(names: AsyncIterator[str], concurrency: int = PROBE_CONCURRENCY,
+                      per_host: int = PROBE_PER_HOST,
+                      store: Optional[ResponseStore] = None) -> AsyncIterator[str]:
+    """
+    Probe names as they arrive over one pooled HTTP/1.1 client and yield the live
+    URL ('https://host') for each responsive host, like `httpx -silent`. Every
+    response is recorded in the response store.
+    """
+    store = store or get_response_store()
+    global_limit = asyncio.Semaphore(concurrency)
+    host_limits: Dict[str, asyncio.Semaphore] = {}
+    results: asyncio.Queue = asyncio.Queue()
+    done = object()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(
+        timeout=PROBE_TIMEOUT, follow_redirects=True, limits=limits, verify=False,
+        headers={'User-Agent': USER_AGENT}
+    ) as client:
+
+        async def probe(name):
+            host_limit = host_limits.setdefault(name, asyncio.Semaphore(per_host))
+            try:
+                async with host_limit:
+                    response = await probe_host(client, name)
+            except Exception as e:
+                print(f"[!] Probe failed for {name}: {e}")
+                response = None
+            finally:
+                global_limit.release()
+            if response is not None:
+                store.put(name, response)
+                await results.put(response["url"])
+
+        async def feed():
+            tasks = []
+            try:
+                seen = set()
+                async for name in names:
+                    name = name.strip().lower()
+                    if not name or name in seen:
+                        continue
+                    seen.add(name)
+                    # Waiting here keeps at most `concurrency` probes (and pending names) in flight
+                    await global_limit.acquire()
+                    tasks.append(asyncio.create_task(probe(name)))
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await results.put(done)
+
+        feeder = asyncio.create_task(feed())
+        count = 0
+        try:
+            while True:
+                url = await results.get()
+                if url is done:
+                    break
+                count += 1
+                yield url
+            await feeder
+        finally:
+            feeder.cancel()
+            await asyncio.gather(feeder, return_exceptions=True)
+    print(f"[✓] Found {count} live subdomains.")
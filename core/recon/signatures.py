@@ -0,0 +1,207 @@
+# core/recon/signatures.py
+#
+# Single-pass Wappalyzer matcher. The fingerprint database is compiled once into
+# per-field matcher lists; each pattern carries the literals any match must
+# contain, so the full regex only runs on pages where one of them is present.
+# Detection rules follow python-Wappalyzer's analyze(): url patterns only add
+# versions, headers/scripts/meta/html patterns detect, and implied technologies
+# are added afterwards.
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+# Shorter literals are nearly always present and not worth checking
+MIN_LITERAL = 3
+# Non-ASCII characters re.IGNORECASE matches to ASCII letters (the Kelvin sign
+# already lowercases to "k"); folded so the literal check never rejects a page
+# the regex would match
+_FOLD = str.maketrans({"İ": "i", "ı": "i", "ſ": "s"})
+
+
+# --- literal prefilter ----------------------------------------------------------
+
+def _literals(items) -> Optional[List[str]]:
+    """
+    Literals of which at least one occurs in any match of this parsed sequence,
+    or None if none can be derived. Only ASCII literals are used.
+    """
+    candidates: List[List[str]] = []
+    run: List[str] = []
+
+    def end_run():
+        if run:
+            candidates.append(["".join(run)])
+            run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL and av < 128:
+            run.append(chr(av).lower())
+            continue
+        end_run()
+        if op is sre_constants.SUBPATTERN:
+            inner = _literals(av[-1])
+            if inner:
+                candidates.append(inner)
+        elif op is sre_constants.BRANCH:
+            branches = [_literals(branch) for branch in av[1]]
+            if all(branches):
+                candidates.append([lit for branch in branches for lit in branch])
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            inner = _literals(av[2])
+            if inner:
+                candidates.append(inner)
+    end_run()
+
+    candidates = [c for c in candidates if min(len(lit) for lit in c) >= MIN_LITERAL]
+    if not candidates:
+        return None
+    # The most selective requirement: longest shortest-alternative, then fewest alternatives
+    best = max(candidates, key=lambda c: (min(len(lit) for lit in c), -len(c)))
+    return sorted(set(best))
+
+
+def required_literals(pattern: str) -> Optional[Tuple[str, ...]]:
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    except Exception:
+        return None
+    literals = _literals(list(parsed))
+    return tuple(literals) if literals else None
+
+
+def fold(text: str) -> str:
+    return text.lower() if text.isascii() else text.translate(_FOLD).lower()
+
+
+# --- versions -----------------------------------------------------------------
+
+def _ternary(index: int):
+    return re.compile("\\\\" + str(index) + "\\?([^:]+):(.*)$", re.I)
+
+
+_TERNARIES = [_ternary(i) for i in range(1, 10)]
+
+
+def extract_versions(regex, template: str, value: str) -> List[str]:
+    """Expand a '\\1' / '\\1?a:b' version template for every match, as python-Wappalyzer does"""
+    versions = []
+    for matches in regex.findall(value):
+        version = template
+        if isinstance(matches, str):
+            matches = [matches]
+        for index, match in enumerate(matches):
+            ternary = (_TERNARIES[index] if index < 9 else _ternary(index + 1)).search(version)
+            if ternary and ternary.group(1) is not None and ternary.group(2) is not None:
+                version = version.replace(ternary.group(0), ternary.group(1) if match != "" else ternary.group(2))
+            version = version.replace("\\" + str(index + 1), match)
+        if version != "" and version not in versions:
+            versions.append(version)
+    return versions
+
+
+# --- engine -------------------------------------------------------------------
+
+class Matcher:
+    __slots__ = ("tech", "regex", "literals", "version", "key")
+
+    def __init__(self, tech: str, pattern: Dict, key: str = ""):
+        self.tech = tech
+        self.regex = pattern["regex"]
+        self.literals = required_literals(pattern["string"])
+        self.version = pattern.get("version")
+        self.key = key
+
+    def candidate(self, folded: str) -> bool:
+        return self.literals is None or any(lit in folded for lit in self.literals)
+
+
+class SignatureEngine:
+    """Compiled form of a Wappalyzer instance's technologies; stateless per page"""
+
+    def __init__(self, wappalyzer):
+        self.categories = wappalyzer.categories
+        self.url: List[Matcher] = []
+        self.headers: List[Matcher] = []
+        self.script: List[Matcher] = []
+        self.meta: List[Matcher] = []
+        self.html: List[Matcher] = []
+        self.implies: Dict[str, List[str]] = {}
+        self.cats: Dict[str, List] = {}
+
+        for name, tech in wappalyzer.technologies.items():
+            self.url.extend(Matcher(name, p) for p in tech["url"])
+            self.headers.extend(Matcher(name, p, key) for key, p in tech["headers"].items())
+            self.script.extend(Matcher(name, p) for p in tech["script"])
+            self.meta.extend(Matcher(name, p, key) for key, p in tech["meta"].items())
+            self.html.extend(Matcher(name, p) for p in tech["html"])
+            # python-Wappalyzer keeps "PHP\;confidence:75" as a technology name; drop the suffix
+            self.implies[name] = [implied.split("\\;")[0] for implied in tech["implies"]]
+            self.cats[name] = tech.get("cats", [])
+
+        self.prefiltered = sum(
+            m.literals is not None
+            for group in (self.url, self.headers, self.script, self.meta, self.html) for m in group
+        )
+
+    def _match(self, matchers: Iterable[Matcher], value: str, folded: str, versions: Dict[str, List[str]],
+               detected: Optional[set] = None):
+        for m in matchers:
+            if not m.candidate(folded) or not m.regex.search(value):
+                continue
+            found = versions.setdefault(m.tech, [])
+            if detected is not None:
+                detected.add(m.tech)
+            if m.version:
+                for version in extract_versions(m.regex, m.version, value):
+                    if version not in found:
+                        found.append(version)
+
+    def analyze(self, url: str, html: str, headers: Dict[str, str],
+                scripts: Iterable[str] = (), meta: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+        """
+        {technology: {"versions": [...], "categories": [...]}} for one page.
+        Header names are matched case-insensitively.
+        """
+        versions: Dict[str, List[str]] = {}
+        detected: set = set()
+        headers = {k.lower(): v for k, v in headers.items()}
+        meta = meta or {}
+
+        # A URL match alone doesn't detect a technology, but its version counts if something else does
+        self._match(self.url, url, fold(url), versions)
+        for m in self.headers:
+            value = headers.get(m.key)
+            if value is not None:
+                self._match((m,), value, fold(value), versions, detected)
+        for script in scripts:
+            self._match(self.script, script, fold(script), versions, detected)
+        for m in self.meta:
+            value = meta.get(m.key)
+            if value is not None:
+                self._match((m,), value, fold(value), versions, detected)
+        self._match(self.html, html, fold(html), versions, detected)
+
+        found = set(detected)
+        pending = list(detected)
+        while pending:
+            for implied in self.implies.get(pending.pop(), ()):
+                if implied not in found:
+                    found.add(implied)
+                    pending.append(implied)
+
+        return {
+            name: {
+                "versions": sorted(versions.get(name, []) if name in detected else [], key=len),
+                "categories": self.get_categories(name),
+            }
+            for name in sorted(found)
+        }
+
+    def get_categories(self, name: str) -> List[str]:
+        return [self.categories.get(str(cat), {}).get("name", "") for cat in self.cats.get(name, [])]
@@ -1,95 +1,143 @@
 import asyncio
-import shutil
-from typing import List, Set
-
+import re
+from typing import AsyncIterator, Iterator, List, Optional, Set
+
+from core.recon.prober import PROBE_BACKEND, probe_hosts
+from core.utils.cache import cached, ttl_from_env
+from core.utils.metrics import timed
+from core.utils.rate_limit import Targets, get_scheduler
+from core.utils.snapshots import get_snapshot_store
+from core.utils.streaming import iter_async
+from core.utils.tool_runner import ToolError, ToolNotFound, stream_tool
+
+SUBDOMAIN_TOOLS = [
+    ["subfinder", "-d", "{domain}", "-silent"],
+    ["cero", "{domain}"],
+    ["shosubgo", "-d", "{domain}"],
+]
+HTTPX_COMMAND = ["httpx", "-silent", "-status-code", "-follow-redirects"]
+# "https://a.example.com [200]", possibly with colour codes around the status
+HTTPX_STATUS_RE = re.compile(r"\[(?:\x1b\[[\d;]*m)*(\d{3})(?:\x1b\[[\d;]*m)*\]")
+
+
+@timed("subdomains.enumerate")
+async def stream_subdomains(domain: str) -> AsyncIterator[str]:
+    """Run subdomain tools in parallel and yield each new name once, as it arrives"""
+    print(f"[+] Enumerating subdomains for: {domain}")
 
-async def run_tool(command: List[str]) -> List[str]:
-    """Run a subdomain enumeration tool asynchronously and return results"""
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump(command: List[str]):
+        try:
+            async for line in stream_tool(command, target=domain):
+                await queue.put(line)
+        except ToolNotFound:
+            pass
+        except Exception as e:
+            print(f"[!] Error: {e}")
+        finally:
+            await queue.put(done)
+
+    commands = [[arg.format(domain=domain) for arg in tool] for tool in SUBDOMAIN_TOOLS]
+    tasks = [asyncio.create_task(pump(cmd)) for cmd in commands]
+
+    seen = set()
+    remaining = len(tasks)
     try:
-        if shutil.which(command[0]) is None:
-            return [f"[!] Tool not found: {command[0]}"]
-        
-        proc = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-        
-        if proc.returncode != 0:
-            return [f"[!] Failed: {' '.join(command)} - {stderr.decode().strip()}"]
-        
-        return [
-            line.strip() for line in stdout.decode().split("\n")
-            if line.strip()
-        ]
-
-    except Exception as e:
-        return [f"[!] Error: {e}"]
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+                continue
+            sub = item.lower()
+            if sub not in seen:
+                seen.add(sub)
+                yield sub
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 async def run_tools_concurrently(domain: str) -> Set[str]:
-    """Run subdomain tools in parallel and collect results in memory"""
-    tools = [
-        ["subfinder", "-d", domain, "-silent"],
-        ["cero", domain],
-        ["shosubgo", "-d", domain],
-    ]
-
-    print(f"[+] Enumerating subdomains for: {domain}")
-
-    all_results = await asyncio.gather(*[run_tool(cmd) for cmd in tools])
-    
-    # Flatten and deduplicate
-    subs = set()
-    for result in all_results:
-        for sub in result:
-            if not sub.startswith("[!]"):  # Filter error lines
-                subs.add(sub)
-    
-    return subs
-
-
-async def filter_live_subdomains(subdomains: Set[str]) -> List[str]:
-    """Filter live subdomains using httpx, all in memory"""
+    """Run subdomain tools in parallel and collect the deduplicated results"""
+    return {sub async for sub in stream_subdomains(domain)}
+
+
+@timed("subdomains.probe")
+async def probe_live(subdomains: AsyncIterator[str], backend: Optional[str] = None,
+                     target: Targets = None) -> AsyncIterator[str]:
+    """
+    Feed names to a single long-running httpx and yield live hosts as they are
+    confirmed. backend="native" (or PROBE_BACKEND=native) probes in process
+    instead and keeps each response for tech_stack and capture. `target` is the
+    domain(s) the names belong to, whose rate budget httpx runs under.
+    """
+    if (backend or PROBE_BACKEND) == "native":
+        async for host in probe_hosts(subdomains):
+            yield host
+        return
+
+    count = 0
+    scheduler = get_scheduler()
+    try:
+        async for line in stream_tool(HTTPX_COMMAND, subdomains, target=target):
+            if line.startswith("http"):
+                count += 1
+                url = line.split()[0]
+                status = HTTPX_STATUS_RE.search(line)
+                if status:
+                    # httpx can't slow down mid-run, but its 429s shrink the budget for the next one
+                    scheduler.record(url, int(status.group(1)))
+                yield url
+    except ToolNotFound:
+        return
+    except ToolError as e:
+        # Hosts already yielded stand; the caller just gets no more
+        print(f"[!] httpx stopped early after {count} live hosts: {e}")
+        return
+    print(f"[✓] Found {count} live subdomains.")
+
+
+async def _iterate(items) -> AsyncIterator[str]:
+    for item in items:
+        yield item
+
+
+async def filter_live_subdomains(subdomains: Set[str], backend: Optional[str] = None) -> List[str]:
+    """Filter live subdomains using httpx (or the native prober), all in memory"""
     try:
         if not subdomains:
             return []
-
-        # Pass subdomains to httpx via stdin
-        proc = await asyncio.create_subprocess_exec(
-            "httpx", "-silent", "-status-code", "-follow-redirects",
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-
-        input_data = "\n".join(subdomains).encode()
-        stdout, stderr = await proc.communicate(input=input_data)
-
-        if proc.returncode != 0:
-            return [f"[!] httpx error: {stderr.decode().strip()}"]
-
-        # Parse live subdomains
-        live_subs = [
-            line.strip().split()[0]
-            for line in stdout.decode().split("\n")
-            if line.startswith("http")
-        ]
-
-        print(f"[✓] Found {len(live_subs)} live subdomains.")
-        return live_subs
-
+        return [host async for host in probe_live(_iterate(subdomains), backend, target=subdomains)]
     except Exception as e:
         return [f"[!] Error filtering live subdomains: {e}"]
 
 
+def stream_live_subdomains(domain: str) -> AsyncIterator[str]:
+    """Enumerate and probe concurrently, yielding live hosts as soon as httpx confirms them"""
+    return probe_live(stream_subdomains(domain), target=domain)
+
+
+@cached("subdomains", ttl=ttl_from_env("subdomains", 6 * 3600), stale_ttl=24 * 3600,
+        cache_if=lambda result: not any(r.startswith("[!]") for r in result))
 async def enumerate_subdomains_async(domain: str) -> List[str]:
     """Async implementation of subdomain enumeration"""
-    found_subs = await run_tools_concurrently(domain)
-    return await filter_live_subdomains(found_subs)
+    try:
+        hosts = [host async for host in stream_live_subdomains(domain)]
+    except Exception as e:
+        return [f"[!] Error filtering live subdomains: {e}"]
+    # Lets delta runs skip re-probing hosts this run just confirmed
+    get_snapshot_store().mark_live(domain, hosts)
+    return hosts
 
 
 # Sync wrapper for Flask or synchronous use
 def enumerate_subdomains(domain: str) -> List[str]:
     return asyncio.run(enumerate_subdomains_async(domain))
+
+
+def iter_live_subdomains(domain: str) -> Iterator[str]:
+    """Sync generator over stream_live_subdomains for streaming Flask responses"""
+    return iter_async(stream_live_subdomains(domain))
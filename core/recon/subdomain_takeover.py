@@ -1,79 +1,173 @@
 # core/recon/subdomain_takeover.py
 
-import subprocess
+import asyncio
+import json
 import os
-import re
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
 
-def check_takeover(subdomains):
-    print("[+] Writing input subdomains to 'live_subs.txt'")
-    with open("live_subs.txt", "w") as f:
-        for sub in subdomains:
-            cleaned = sub.replace("https://", "").replace("http://", "").strip()
-            f.write(cleaned + "\n")
+import httpx
 
-    print("[+] Running subjack...")
-    try:
-        subprocess.run([
-            "subjack", "-w", "live_subs.txt",
-            "-t", "100", "-timeout", "30", "-ssl",
-            "-c", "/usr/share/subjack/fingerprints.json",
-            "-o", "subjack_results.txt", "-v"
-        ])
-    except Exception as e:
-        print(f"[!] subjack failed: {e}")
-
-    print("[+] Running BadDNS (dnsx)...")
-    try:
-        subprocess.run(
-            ["dnsx", "-l", "live_subs.txt", "-o", "dnsx_output.txt"],
-            capture_output=True, text=True
-        )
-    except Exception as e:
-        print(f"[!] BadDNS failed: {e}")
-
-    subjack_data = {}
-    try:
-        with open("subjack_results.txt", "r") as f:
-            for line in f:
-                # Example line: blog.example.com -> username.github.io [404] There isn't a GitHub Pages site here
-                match = re.match(r"(.+?)\s*->\s*(.+?)\s*\[(\d{3})\]\s*(.+)", line.strip())
-                if match:
-                    subdomain, cname, status_code, body = match.groups()
-                    subjack_data[subdomain.strip()] = {
-                        "cname": cname.strip(),
-                        "status_code": int(status_code),
-                        "response_body": body.strip(),
-                        "tool_detected": True
-                    }
-    except FileNotFoundError:
-        print("[!] subjack_results.txt not found.")
+from core.utils.tool_runner import ToolError, run_tool
+from core.utils.metrics import timed, track
+
+SUBJACK_FINGERPRINTS = "/usr/share/subjack/fingerprints.json"
+TAKEOVER_RCODES = {"NXDOMAIN", "SERVFAIL", "REFUSED"}
+
+
+def normalize_host(value: str) -> str:
+    """Strip scheme, path, port and trailing dot so every tool's output keys the same way"""
+    host = value.strip().lower()
+    if "://" in host:
+        host = host.split("://", 1)[1]
+    host = host.split("/", 1)[0].split(":", 1)[0]
+    return host.rstrip(".")
 
-    baddns_data = set()
+
+def iter_json_records(path: str) -> Iterator[dict]:
+    """Yield records from a JSON array file or a JSON-lines file"""
     try:
-        with open("dnsx_output.txt", "r") as f:
+        with open(path, "r") as f:
+            first = f.read(1)
+            while first and first.isspace():
+                first = f.read(1)
+            if not first:
+                return
+            if first == "[":
+                f.seek(0)
+                yield from (r for r in json.load(f) if isinstance(r, dict))
+                return
+            f.seek(0)
             for line in f:
                 line = line.strip()
-                for sub in subdomains:
-                    sub_clean = sub.replace("https://", "").replace("http://", "").strip()
-                    if sub_clean in line and ("Possible Takeover" in line or "Vulnerable" in line):
-                        baddns_data.add(sub_clean)
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
     except FileNotFoundError:
-        print("[!] dnsx_output.txt not found.")
+        print(f"[!] {os.path.basename(path)} not found.")
+    except ValueError as e:
+        print(f"[!] Could not parse {os.path.basename(path)}: {e}")
 
-    final_results = []
 
+def index_subjack(path: str) -> Dict[str, dict]:
+    index = {}
+    for record in iter_json_records(path):
+        host = normalize_host(record.get("subdomain", ""))
+        if host:
+            index[host] = record
+    return index
+
+
+def index_dnsx(path: str) -> Dict[str, dict]:
+    index = {}
+    for record in iter_json_records(path):
+        host = normalize_host(record.get("host", ""))
+        if host:
+            index[host] = record
+    return index
+
+
+async def run_takeover_tools(commands: List[List[str]], workspace: str, targets: Optional[List[str]] = None):
+    """Run subjack and dnsx side by side; a failing tool leaves its output file missing"""
+    async def run(command):
+        print(f"[+] Running {command[0]}...")
+        try:
+            await run_tool(command, cwd=workspace, target=targets)
+        except ToolError as e:
+            print(f"[!] {command[0]} failed: {e}")
+
+    await asyncio.gather(*[run(command) for command in commands])
+
+
+async def fetch_flagged(hosts: List[str], concurrency: int = 50) -> Dict[str, Tuple[Optional[int], str]]:
+    """Status and body for the hosts subjack flagged; its JSON output carries neither"""
+    from core.recon.takeover_engine import fetch_body
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(client, host):
+        async with semaphore:
+            return await fetch_body(client, host)
+
+    async with httpx.AsyncClient(timeout=10.0, follow_redirects=True, verify=False) as client:
+        responses = await asyncio.gather(*[fetch(client, host) for host in hosts])
+    return dict(zip(hosts, responses))
+
+
+@timed("takeover.check")
+async def check_takeover_async(subdomains, engine="subjack"):
+    if engine == "native":
+        # In-process resolver + fingerprint matcher, no subjack/dnsx processes
+        from core.recon.takeover_engine import detect_takeovers_async
+        return await detect_takeovers_async(subdomains)
+
+    hosts = []
+    seen = set()
     for sub in subdomains:
-        sub_clean = sub.replace("https://", "").replace("http://", "").strip()
+        host = normalize_host(sub)
+        if host and host not in seen:
+            seen.add(host)
+            hosts.append(host)
+
+    # Each call gets its own workspace so concurrent /takeover requests never share files
+    with tempfile.TemporaryDirectory(prefix="takeover_") as workspace:
+        input_file = os.path.join(workspace, "live_subs.txt")
+        subjack_file = os.path.join(workspace, "subjack_results.json")
+        dnsx_file = os.path.join(workspace, "dnsx_output.json")
 
-        result = {
-            "subdomain": sub_clean,
-            "cname": subjack_data.get(sub_clean, {}).get("cname", None),
-            "status_code": subjack_data.get(sub_clean, {}).get("status_code", None),
-            "response_body": subjack_data.get(sub_clean, {}).get("response_body", None),
-            "tool_detected": sub_clean in subjack_data or sub_clean in baddns_data
-        }
+        print(f"[+] Writing {len(hosts)} input subdomains to {input_file}")
+        with open(input_file, "w") as f:
+            f.write("\n".join(hosts) + "\n")
 
-        final_results.append(result)
+        # subjack and dnsx are independent, so run them side by side
+        await run_takeover_tools([
+            [
+                "subjack", "-w", input_file,
+                "-t", "100", "-timeout", "30", "-ssl",
+                "-c", SUBJACK_FINGERPRINTS,
+                "-o", subjack_file
+            ],
+            [
+                "dnsx", "-l", input_file, "-json", "-silent",
+                "-cname", "-rcode", "noerror,nxdomain,servfail,refused",
+                "-o", dnsx_file
+            ],
+        ], workspace, hosts)
+
+        subjack_data = index_subjack(subjack_file)
+        dnsx_data = index_dnsx(dnsx_file)
+
+    flagged = [host for host in hosts if subjack_data.get(host, {}).get("vulnerable")]
+    responses = await fetch_flagged(flagged) if flagged else {}
+
+    final_results = []
+    with track("takeover.merge"):
+        for host in hosts:
+            subjack = subjack_data.get(host, {})
+            dns = dnsx_data.get(host, {})
+            cnames = dns.get("cname") or []
+            rcode = str(dns.get("status_code", "")).upper()
+            dangling = bool(cnames) and rcode in TAKEOVER_RCODES
+            status, body = responses.get(host, (None, ""))
+
+            final_results.append({
+                "subdomain": host,
+                "cname": cnames[-1] if cnames else None,
+                "service": subjack.get("service") or None,
+                "status_code": status,
+                "response_body": body[:500] or None,
+                "dns_status": rcode or None,
+                "tool_detected": bool(subjack.get("vulnerable")) or dangling
+            })
 
     print(f"[✓] Formatted output for {len(final_results)} subdomains.")
     return final_results
+
+
+def check_takeover(subdomains, engine="subjack"):
+    return asyncio.run(check_takeover_async(subdomains, engine))
@@ -0,0 +1,375 @@
+# core/recon/takeover_engine.py
+
+import asyncio
+import json
+import os
+import random
+import struct
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+
+from core.recon.subdomain_takeover import SUBJACK_FINGERPRINTS, normalize_host
+from core.utils.metrics import timed
+from core.utils.rate_limit import get_scheduler
+
+DNS_TYPE_A = 1
+DNS_TYPE_CNAME = 5
+DNS_FLAG_TC = 0x0200
+RCODES = {0: "NOERROR", 1: "FORMERR", 2: "SERVFAIL", 3: "NXDOMAIN", 4: "NOTIMP", 5: "REFUSED"}
+BODY_LIMIT = 64 * 1024
+
+
+def default_nameserver() -> str:
+    try:
+        with open("/etc/resolv.conf") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver":
+                    return parts[1]
+    except OSError:
+        pass
+    return "8.8.8.8"
+
+
+# --- Minimal async DNS client -------------------------------------------------
+
+def encode_query(qid: int, name: str, qtype: int) -> bytes:
+    header = struct.pack(">HHHHHH", qid, 0x0100, 1, 0, 0, 0)
+    qname = b"".join(
+        bytes([len(label)]) + label.encode("idna")
+        for label in name.rstrip(".").split(".") if label
+    ) + b"\x00"
+    return header + qname + struct.pack(">HH", qtype, 1)
+
+
+def read_name(message: bytes, offset: int) -> Tuple[str, int]:
+    """Decode a possibly compressed name; returns (name, offset after the name)"""
+    labels = []
+    end = None
+    for _ in range(128):
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            pointer = struct.unpack(">H", message[offset:offset + 2])[0] & 0x3FFF
+            if end is None:
+                end = offset + 2
+            offset = pointer
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(message[offset:offset + length].decode("ascii", "ignore"))
+        offset += length
+    return ".".join(labels).lower(), end if end is not None else offset
+
+
+def parse_response(message: bytes) -> Tuple[str, List[Tuple[str, int, str]]]:
+    """Return (rcode name, [(owner, type, data)]) for the answer section"""
+    _, flags, qdcount, ancount, _, _ = struct.unpack(">HHHHHH", message[:12])
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = read_name(message, offset)
+        offset += 4
+
+    answers = []
+    for _ in range(ancount):
+        owner, offset = read_name(message, offset)
+        rtype, _, _, rdlength = struct.unpack(">HHIH", message[offset:offset + 10])
+        offset += 10
+        if rtype == DNS_TYPE_CNAME:
+            data, _ = read_name(message, offset)
+        elif rtype == DNS_TYPE_A and rdlength == 4:
+            data = ".".join(str(b) for b in message[offset:offset + 4])
+        else:
+            data = ""
+        answers.append((owner, rtype, data))
+        offset += rdlength
+    return RCODES.get(flags & 0x000F, str(flags & 0x000F)), answers
+
+
+class _DNSProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.pending: Dict[int, asyncio.Future] = {}
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        future = self.pending.pop(struct.unpack(">H", data[:2])[0], None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+
+class AsyncResolver:
+    """Shares one UDP socket across many in-flight queries, matched by query id"""
+
+    def __init__(self, nameserver: Optional[str] = None, port: int = 53,
+                 timeout: float = 3.0, retries: int = 2, concurrency: int = 500):
+        self.nameserver = nameserver or default_nameserver()
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.transport = None
+        self.protocol = None
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        self.transport, self.protocol = await loop.create_datagram_endpoint(
+            _DNSProtocol, remote_addr=(self.nameserver, self.port)
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        self.transport.close()
+
+    async def query(self, name: str, qtype: int = DNS_TYPE_A):
+        async with self.semaphore:
+            for _ in range(self.retries + 1):
+                qid = random.randint(0, 0xFFFF)
+                while qid in self.protocol.pending:
+                    qid = random.randint(0, 0xFFFF)
+                future = asyncio.get_running_loop().create_future()
+                self.protocol.pending[qid] = future
+                self.transport.sendto(encode_query(qid, name, qtype))
+                try:
+                    message = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self.protocol.pending.pop(qid, None)
+                    continue
+                try:
+                    if struct.unpack(">H", message[2:4])[0] & DNS_FLAG_TC:
+                        # Cut to fit a datagram (long CNAME chains); ask again over TCP
+                        return await self.query_tcp(name, qtype)
+                    return parse_response(message)
+                except (struct.error, IndexError):
+                    return "FORMERR", []
+        return "TIMEOUT", []
+
+    async def query_tcp(self, name: str, qtype: int = DNS_TYPE_A):
+        """One query over TCP (length-prefixed); TRUNCATED if the server can't be reached that way"""
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.nameserver, self.port), self.timeout
+            )
+            query = encode_query(random.randint(0, 0xFFFF), name, qtype)
+            writer.write(struct.pack(">H", len(query)) + query)
+            await writer.drain()
+            length = struct.unpack(">H", await asyncio.wait_for(reader.readexactly(2), self.timeout))[0]
+            return parse_response(await asyncio.wait_for(reader.readexactly(length), self.timeout))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return "TRUNCATED", []
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def resolve_cname_chain(self, host: str) -> Tuple[List[str], str]:
+        """Follow the CNAME records returned for an A lookup; returns (chain, rcode)"""
+        rcode, answers = await self.query(host, DNS_TYPE_A)
+        cnames = {owner: data for owner, rtype, data in answers if rtype == DNS_TYPE_CNAME}
+        chain = []
+        current = host
+        while current in cnames and len(chain) < 16:
+            current = cnames[current]
+            chain.append(current)
+        return chain, rcode
+
+
+# --- Fingerprint matching -----------------------------------------------------
+
+class AhoCorasick:
+    """Multi-pattern substring matcher; search() returns the ids of every pattern found"""
+
+    def __init__(self, patterns: Dict[str, Set[int]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Set[int]] = [set()]
+
+        for pattern, ids in patterns.items():
+            state = 0
+            for char in pattern:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(set())
+                state = nxt
+            self.out[state] |= ids
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.out[nxt] |= self.out[self.fail[nxt]]
+
+    def search(self, text: str) -> Set[int]:
+        found = set()
+        state = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class FingerprintMatcher:
+    """Suffix index over provider CNAMEs plus one automaton over all body fingerprints"""
+
+    def __init__(self, fingerprints: List[dict]):
+        self.fingerprints = fingerprints
+        self.suffixes: Dict[str, Set[int]] = {}
+        patterns: Dict[str, Set[int]] = {}
+
+        for i, fp in enumerate(fingerprints):
+            for cname in fp.get("cname") or []:
+                suffix = cname.strip().lower().strip(".")
+                if suffix:
+                    self.suffixes.setdefault(suffix, set()).add(i)
+            bodies = fp.get("fingerprint") or []
+            if isinstance(bodies, str):
+                bodies = [bodies]
+            for body in bodies:
+                if body:
+                    patterns.setdefault(body, set()).add(i)
+
+        self.body_matcher = AhoCorasick(patterns)
+
+    @classmethod
+    def from_file(cls, path: str = SUBJACK_FINGERPRINTS) -> "FingerprintMatcher":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def match_cname(self, chain: Iterable[str]) -> Set[int]:
+        matches = set()
+        for cname in chain:
+            labels = cname.split(".")
+            for i in range(len(labels)):
+                matches |= self.suffixes.get(".".join(labels[i:]), set())
+        return matches
+
+    def match_body(self, body: str, candidates: Set[int]) -> Set[int]:
+        return self.body_matcher.search(body) & candidates
+
+
+# --- Engine -------------------------------------------------------------------
+
+@timed("takeover.fetch_body")
+async def fetch_body(client: httpx.AsyncClient, host: str,
+                     connect_to: Optional[Dict[str, str]] = None) -> Tuple[Optional[int], str]:
+    """
+    Status and the first BODY_LIMIT characters of https://host, falling back to
+    http://host. `connect_to` maps a host to the "address:port" to connect to
+    instead (like curl --connect-to); the Host header and SNI still name the host.
+    """
+    scheduler = get_scheduler()
+    address = (connect_to or {}).get(host)
+    for scheme in ("https", "http"):
+        if address:
+            request = client.build_request("GET", f"{scheme}://{address}", headers={"Host": host},
+                                           extensions={"sni_hostname": host})
+        else:
+            request = client.build_request("GET", f"{scheme}://{host}")
+        try:
+            async with scheduler.request(host) as ticket:
+                resp = await client.send(request, stream=True)
+                ticket.observe(resp.status_code, resp.headers)
+                try:
+                    chunks = []
+                    size = 0
+                    async for chunk in resp.aiter_text():
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= BODY_LIMIT:
+                            break
+                finally:
+                    await resp.aclose()
+                return resp.status_code, "".join(chunks)[:BODY_LIMIT]
+        except httpx.HTTPError:
+            continue
+    return None, ""
+
+
+@timed("takeover.native")
+async def detect_takeovers_async(subdomains: Iterable[str],
+                                 nameserver: Optional[str] = None, dns_port: int = 53,
+                                 fingerprints_path: str = SUBJACK_FINGERPRINTS,
+                                 concurrency: int = 500, http_concurrency: int = 50,
+                                 http_timeout: float = 10.0,
+                                 connect_to: Optional[Dict[str, str]] = None) -> List[dict]:
+    """
+    Resolve each subdomain's CNAME chain against `nameserver`:`dns_port` and
+    flag it when the chain points at a provider that is dangling (NXDOMAIN) or
+    serves an unclaimed-resource page. `connect_to` redirects the HTTP checks
+    for some hosts (see fetch_body).
+    """
+    hosts = list(dict.fromkeys(h for h in (normalize_host(s) for s in subdomains) if h))
+    matcher = FingerprintMatcher.from_file(fingerprints_path)
+    print(f"[+] Resolving CNAME chains for {len(hosts)} subdomains")
+
+    async with AsyncResolver(nameserver, dns_port, concurrency=concurrency) as resolver:
+        resolved = await asyncio.gather(*[resolver.resolve_cname_chain(h) for h in hosts])
+
+    http_semaphore = asyncio.Semaphore(http_concurrency)
+
+    async def check(client, host, chain, rcode):
+        result = {
+            "subdomain": host,
+            "cname": chain[-1] if chain else None,
+            "service": None,
+            "status_code": None,
+            "response_body": None,
+            "dns_status": rcode,
+            "tool_detected": False
+        }
+        candidates = matcher.match_cname(chain)
+        if not candidates:
+            return result
+
+        services = [matcher.fingerprints[i] for i in sorted(candidates)]
+        result["service"] = services[0].get("service")
+
+        dangling = [i for i in candidates if matcher.fingerprints[i].get("nxdomain")]
+        if dangling and rcode == "NXDOMAIN":
+            result["service"] = matcher.fingerprints[dangling[0]].get("service")
+            result["tool_detected"] = True
+            return result
+
+        # Only hosts pointing at a known provider get an HTTP request
+        async with http_semaphore:
+            status, body = await fetch_body(client, host, connect_to)
+        result["status_code"] = status
+        hits = matcher.match_body(body, candidates)
+        if hits:
+            fp = matcher.fingerprints[min(hits)]
+            result["service"] = fp.get("service")
+            result["response_body"] = body[:500]
+            result["tool_detected"] = True
+        return result
+
+    async with httpx.AsyncClient(timeout=http_timeout, follow_redirects=True, verify=False) as client:
+        results = await asyncio.gather(*[
+            check(client, host, chain, rcode)
+            for host, (chain, rcode) in zip(hosts, resolved)
+        ])
+
+    flagged = sum(1 for r in results if r["tool_detected"])
+    print(f"[✓] Native takeover scan finished: {flagged} of {len(results)} flagged.")
+    return results
+
+
+def detect_takeovers(subdomains: Iterable[str], **kwargs) -> List[dict]:
+    return asyncio.run(detect_takeovers_async(subdomains, **kwargs))
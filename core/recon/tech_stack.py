@@ -1,59 +1,215 @@
+import asyncio
+import os
 import requests
+import httpx
 from Wappalyzer import Wappalyzer, WebPage
 from urllib.parse import urlparse
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple
 import logging
 
+from core.recon.signatures import SignatureEngine
+from core.utils.cache import cached, ttl_from_env
+from core.utils.metrics import timed
+from core.utils.rate_limit import get_scheduler
+from core.utils.response_store import get_response_store
+from core.utils.streaming import iter_async
+from core.utils.workers import OFFLOAD_MIN_BYTES, run_cpu, run_cpu_async, should_offload
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Wappalyzer with latest tech database
-try:
-    wappalyzer = Wappalyzer.latest()
-except Exception as e:
-    logger.warning(f"Couldn't fetch latest Wappalyzer data: {e}. Using default.")
-    wappalyzer = Wappalyzer()
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+
+# Batch mode limits
+BATCH_CONCURRENCY = int(os.environ.get("TECH_STACK_CONCURRENCY", 100))
+PER_HOST_LIMIT = int(os.environ.get("TECH_STACK_PER_HOST", 2))
+MAX_RESPONSE_BYTES = int(os.environ.get("TECH_STACK_MAX_BYTES", 2 * 1024 * 1024))
+
+# "compiled" runs the single-pass signature engine; "wappalyzer" the library's own analyze calls
+ENGINE = os.environ.get("TECH_STACK_ENGINE", "compiled").lower()
+
+_wappalyzer = None
+_engine = None
+
+
+def get_wappalyzer() -> Wappalyzer:
+    """Wappalyzer with the latest tech database, loaded once per process"""
+    global _wappalyzer
+    if _wappalyzer is None:
+        try:
+            _wappalyzer = Wappalyzer.latest()
+        except Exception as e:
+            logger.warning(f"Couldn't fetch latest Wappalyzer data: {e}. Using default.")
+            _wappalyzer = Wappalyzer()
+    return _wappalyzer
+
+
+def get_engine() -> SignatureEngine:
+    global _engine
+    if _engine is None:
+        _engine = SignatureEngine(get_wappalyzer())
+    return _engine
+
+
+def warm_worker():
+    """CPU workers load the database and compile its matchers before the first page arrives"""
+    if ENGINE == "compiled":
+        get_engine()
+    else:
+        get_wappalyzer()
+
+
+def normalize_target(target: str) -> str:
+    if not target.startswith(('http://', 'https://')):
+        target = 'https://' + target
+    return target
+
+
+def analyze_html(url: str, html: str, headers: Dict[str, str]) -> Dict:
+    """Run Wappalyzer on an already fetched page (executes in a CPU worker)"""
+    webpage = WebPage(url=url, html=html, headers=headers)
+    if ENGINE != "compiled":
+        wappalyzer = get_wappalyzer()
+        technologies = wappalyzer.analyze(webpage)
+        categorized = wappalyzer.analyze_with_categories(webpage)
+        return {
+            "url": url,
+            "technologies": list(technologies),
+            "categories": categorized
+        }
+
+    detected = get_engine().analyze(url, html, headers, webpage.scripts, webpage.meta)
+    return {
+        "url": url,
+        "technologies": list(detected),
+        "categories": {name: {"categories": tech["categories"]} for name, tech in detected.items()},
+        "versions": {name: tech["versions"] for name, tech in detected.items() if tech["versions"]}
+    }
+
+
+@timed("tech_stack.analyze")
+def analyze_page(url: str, html: str, headers: Dict[str, str]) -> Dict:
+    if should_offload(len(html), OFFLOAD_MIN_BYTES):
+        return run_cpu(analyze_html, url, html, headers)
+    return analyze_html(url, html, headers)
+
+
+@timed("tech_stack.analyze")
+async def analyze_page_async(url: str, html: str, headers: Dict[str, str]) -> Dict:
+    if should_offload(len(html), OFFLOAD_MIN_BYTES):
+        return await run_cpu_async(analyze_html, url, html, headers)
+    return analyze_html(url, html, headers)
 
+
+def stored_page(target: str, max_bytes: int = MAX_RESPONSE_BYTES) -> Optional[Tuple[str, str, Dict[str, str]]]:
+    """
+    (final_url, html, headers) the native prober already fetched for this target,
+    if it read at least as much of the body as a fetch capped at max_bytes would
+    """
+    stored = get_response_store().lookup(target, max_bytes)
+    if stored is None:
+        return None
+    return stored["final_url"], stored["body"], stored["headers"]
+
+
+@cached("tech_stack", ttl=ttl_from_env("tech_stack", 3600), stale_ttl=6 * 3600,
+        cache_if=lambda result: "error" not in result)
+@timed("tech_stack.detect")
 def detect_tech_stack(target):
     """
     Detect technology stack of a target domain/URL
     Returns: { "url": str, "technologies": list, "categories": dict }
     """
     try:
+        page = stored_page(target)
+        if page is not None:
+            return analyze_page(*page)
+
         # Normalize URL format
-        if not target.startswith(('http://', 'https://')):
-            target = 'https://' + target
-        
+        target = normalize_target(target)
+
         # Handle potential redirects
-        response = requests.get(
-            target, 
-            timeout=15,
-            allow_redirects=True,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-            }
-        )
+        with get_scheduler().request_sync(target) as ticket:
+            response = requests.get(
+                target,
+                timeout=15,
+                allow_redirects=True,
+                headers={
+                    'User-Agent': USER_AGENT
+                }
+            )
+            ticket.observe(response.status_code, response.headers)
         final_url = response.url
-        
-        # Create WebPage object for analysis
-        webpage = WebPage(
-            url=final_url,
-            html=response.text,
-            headers=dict(response.headers)
-        )
-        
-        # Analyze technologies
-        technologies = wappalyzer.analyze(webpage)
-        categorized = wappalyzer.analyze_with_categories(webpage)
-        
-        return {
-            "url": final_url,
-            "technologies": list(technologies),
-            "categories": categorized
-        }
-        
+
+        return analyze_page(final_url, response.text, dict(response.headers))
+
     except requests.exceptions.RequestException as e:
         logger.error(f"Network error during tech detection: {e}")
         return {"error": f"Network error: {str(e)}"}
     except Exception as e:
         logger.error(f"Tech detection failed: {e}")
         return {"error": f"Detection failed: {str(e)}"}
+
+
+@timed("tech_stack.fetch")
+async def fetch_capped(client: httpx.AsyncClient, url: str, max_bytes: int = MAX_RESPONSE_BYTES):
+    """GET a page through the shared client, reading at most max_bytes of body"""
+    async with get_scheduler().request(url) as ticket, client.stream("GET", url) as response:
+        ticket.observe(response.status_code, response.headers)
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk[:max_bytes - len(body)])
+            if len(body) >= max_bytes:
+                break
+        encoding = response.encoding or "utf-8"
+        return str(response.url), bytes(body).decode(encoding, errors="replace"), dict(response.headers)
+
+
+async def detect_tech_stack_batch_async(targets: Iterable[str],
+                                        concurrency: int = BATCH_CONCURRENCY,
+                                        per_host_limit: int = PER_HOST_LIMIT,
+                                        max_bytes: int = MAX_RESPONSE_BYTES) -> AsyncIterator[Dict]:
+    """
+    Fingerprint many hosts through one pooled async client and yield a result per
+    host as soon as it is ready. Wappalyzer runs in the CPU worker processes.
+    """
+    global_limit = asyncio.Semaphore(concurrency)
+    host_limits: Dict[str, asyncio.Semaphore] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def detect(client, target):
+        url = normalize_target(target)
+        host = urlparse(url).netloc
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(per_host_limit))
+        try:
+            page = stored_page(target, max_bytes)
+            if page is None:
+                async with global_limit, host_limit:
+                    page = await fetch_capped(client, url, max_bytes)
+            result = await analyze_page_async(*page)
+        except httpx.HTTPError as e:
+            logger.error(f"Network error during tech detection for {target}: {e}")
+            result = {"error": f"Network error: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Tech detection failed for {target}: {e}")
+            result = {"error": f"Detection failed: {str(e)}"}
+        result["domain"] = target
+        return result
+
+    async with httpx.AsyncClient(
+        timeout=15.0, follow_redirects=True, limits=limits, verify=False,
+        headers={'User-Agent': USER_AGENT}
+    ) as client:
+        tasks = [asyncio.create_task(detect(client, t)) for t in dict.fromkeys(targets)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def iter_tech_stack_batch(targets: Iterable[str]) -> Iterator[Dict]:
+    """Sync generator over detect_tech_stack_batch_async for streaming Flask responses"""
+    return iter_async(detect_tech_stack_batch_async(list(targets)))
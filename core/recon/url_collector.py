@@ -1,8 +1,20 @@
 import asyncio
+import hashlib
+import heapq
+import math
 import re
+from array import array
+from functools import partial
 from urllib.parse import urlparse, parse_qs
 from collections import defaultdict
-from typing import List, Set, Dict
+from typing import AsyncIterator, Iterable, List, Optional, Set, Dict
+
+from core.utils.cache import cached, ttl_from_env
+from core.utils.metrics import timed
+from core.utils.tool_runner import ToolError, stream_tool
+from core.utils.url_archive import get_url_archive, is_hostname
+from core.utils.url_templates import path_template
+from core.utils.workers import map_chunks, map_chunks_async, should_offload
 
 # Constants
 EXTENSION_BLACKLIST = {".jpg", ".png", ".css", ".js", ".svg", ".woff", ".ttf", ".ico"}
@@ -11,111 +23,334 @@ STATIC_EXTENSIONS_RE = re.compile(
     re.IGNORECASE
 )
 
-async def run_tool(command: List[str], input_text: str = None) -> List[str]:
+async def stream_url_tool(command: List[str], input_text: str = None,
+                          target: Optional[str] = None) -> AsyncIterator[str]:
+    """Yield a URL tool's stdout line by line; tool failures end the stream early"""
     try:
-        proc = await asyncio.create_subprocess_exec(
-            *command,
-            stdin=asyncio.subprocess.PIPE if input_text else None,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await proc.communicate(
-            input=input_text.encode() if input_text else None
-        )
-        
-        if proc.returncode != 0:
-            print(f"[!] Error running {' '.join(command)}: {stderr.decode().strip()}")
-            return []
-            
-        return stdout.decode().strip().split("\n")
-    except Exception as e:
-        print(f"[!] Unexpected error: {e}")
-        return []
+        async for line in stream_tool(command, input_text, target=target):
+            yield line
+    except ToolError as e:
+        print(f"[!] Error running {' '.join(command)}: {e}")
 
 def is_valid_url(url: str) -> bool:
     url = url.strip()
     return (url.startswith(("http://", "https://")) and 
             not STATIC_EXTENSIONS_RE.match(url))
 
-def clean_urls(urls: List[str]) -> List[str]:
+def normalize_url(url: str) -> Optional[str]:
+    """Strip the fragment and return the URL if it should be kept, else None"""
+    if not url:
+        return None
+    clean_url = url.split("#")[0].strip()
+    if clean_url and is_valid_url(clean_url):
+        return clean_url
+    return None
+
+def url_fingerprint(url: str) -> int:
+    """64-bit digest used in place of the full string for dedup bookkeeping"""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "little")
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit fingerprints (double hashing)"""
+
+    def __init__(self, capacity: int = 2_000_000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, fingerprint: int) -> bool:
+        """Add a fingerprint; returns True if it was (probably) already present"""
+        h1 = fingerprint & 0xFFFFFFFF
+        h2 = (fingerprint >> 32) | 1
+        present = True
+        for i in range(self.hashes):
+            bit = (h1 + i * h2) % self.size
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & mask:
+                present = False
+                self.bits[byte] |= mask
+        return present
+
+class TopUrls:
+    """
+    Keep the best `limit` unique URLs (parameterised first, then shortest, then
+    earliest) in a bounded heap.
+
+    Only fingerprints of URLs currently in the heap are remembered. That is still
+    exact dedup: the admission threshold only ever gets stricter, so a repeat of
+    a URL that was rejected or evicted would be rejected again anyway.
+    """
+
+    def __init__(self, limit: int, dedup: str = "fingerprint"):
+        self.limit = limit
+        self.heap: List[tuple] = []
+        self.members: Set[int] = set()
+        self.bloom = BloomFilter() if dedup == "bloom" else None
+        self.seq = 0
+
+    def add(self, url: str, fingerprint: Optional[int] = None):
+        fingerprint = fingerprint if fingerprint is not None else url_fingerprint(url)
+        if self.bloom is not None and self.bloom.add(fingerprint):
+            return
+        if fingerprint in self.members or self.limit <= 0:
+            return
+
+        self.seq += 1
+        # Heap root is the worst kept URL
+        item = (-('?' not in url), -len(url), -self.seq, fingerprint, url)
+        if len(self.heap) < self.limit:
+            heapq.heappush(self.heap, item)
+            self.members.add(fingerprint)
+        elif item > self.heap[0]:
+            evicted = heapq.heapreplace(self.heap, item)
+            self.members.discard(evicted[3])
+            self.members.add(fingerprint)
+
+    def urls(self) -> List[str]:
+        return [item[4] for item in sorted(self.heap, reverse=True)]
+
+def _clean(urls: Iterable[str]):
     seen = set()
     cleaned = []
+    fingerprints = array("Q")
     for url in urls:
-        if not url:
+        clean_url = normalize_url(url)
+        if clean_url is None:
             continue
-        clean_url = url.split("#")[0].strip()
-        if clean_url and is_valid_url(clean_url) and clean_url not in seen:
-            seen.add(clean_url)
+        fingerprint = url_fingerprint(clean_url)
+        if fingerprint not in seen:
+            seen.add(fingerprint)
             cleaned.append(clean_url)
+            fingerprints.append(fingerprint)
+    return cleaned, fingerprints
+
+def _clean_batch(batch: str):
+    """Worker side of clean_urls: kept URLs newline-joined plus their fingerprints as bytes"""
+    cleaned, fingerprints = _clean(batch.split("\n"))
+    return "\n".join(cleaned), fingerprints.tobytes()
+
+@timed("urls.clean")
+def clean_urls(urls: Iterable[str]) -> List[str]:
+    urls = urls if isinstance(urls, list) else list(urls)
+    if not should_offload(len(urls)):
+        return _clean(urls)[0]
+
+    # Batches are cleaned and deduped in parallel; only cross-batch repeats are left to drop here
+    seen = set()
+    cleaned = []
+    for text, raw in map_chunks(_clean_batch, urls):
+        fingerprints = array("Q")
+        fingerprints.frombytes(raw)
+        for url, fingerprint in zip(text.split("\n"), fingerprints):
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                cleaned.append(url)
     return cleaned
 
-async def run_gau(domain: str) -> List[str]:
+def stream_gau(domain: str) -> AsyncIterator[str]:
     print(f"[+] Running gau on {domain}")
-    return await run_tool(["gau", "--threads", "10", domain])
+    return stream_url_tool(["gau", "--threads", "10", domain], target=domain)
 
-async def run_waybackurls(domain: str) -> List[str]:
+def stream_waybackurls(domain: str) -> AsyncIterator[str]:
     print(f"[+] Running waybackurls on {domain}")
-    return await run_tool(["waybackurls"], input_text=domain)
-
-async def run_tools_concurrently(domain: str) -> List[str]:
-    gau_task = asyncio.create_task(run_gau(domain))
-    wayback_task = asyncio.create_task(run_waybackurls(domain))
-    
-    results = []
-    for task in asyncio.as_completed([gau_task, wayback_task]):
-        results.extend(await task)
-    return results
+    return stream_url_tool(["waybackurls"], input_text=domain, target=domain)
 
-def group_similar_urls(urls: List[str]) -> List[str]:
-    grouped = defaultdict(lambda: defaultdict(set))
-    no_params = set()
+@timed("urls.collect")
+async def stream_tools_concurrently(domain: str) -> AsyncIterator[str]:
+    """
+    Merge gau and waybackurls output line by line as it arrives. Every URL worth
+    keeping is also written to the domain's URL archive, uncapped (if `domain`
+    is a hostname an archive can be kept under).
+    """
+    archive = get_url_archive(domain).writer() if is_hostname(domain.strip().lower()) else None
+    queue: asyncio.Queue = asyncio.Queue(maxsize=10000)
+    done = object()
 
-    for url in urls:
+    async def pump(lines):
         try:
-            parsed = urlparse(url)
-            base = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-            params = parse_qs(parsed.query, keep_blank_values=True)
+            async for line in lines:
+                await queue.put(line)
+        finally:
+            await queue.put(done)
 
-            if not params:
-                no_params.add(base)
+    tasks = [
+        asyncio.create_task(pump(stream_gau(domain))),
+        asyncio.create_task(pump(stream_waybackurls(domain))),
+    ]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
                 continue
+            clean_url = normalize_url(item)
+            if archive is not None and clean_url is not None and archive.add(clean_url) and archive.full:
+                await archive.flush_async()
+            yield item
+        if archive is not None:
+            archive.archive.mark_collected()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if archive is not None:
+            await archive.flush_async()
+
+MAX_EXAMPLES = 3
+MAX_VALUES = 10
 
-            for key, values in params.items():
-                grouped[base][key].update(values)
+def _cluster(urls: Iterable[str], max_examples: int = MAX_EXAMPLES,
+             max_values: int = MAX_VALUES) -> Dict[tuple, Dict]:
+    """Clusters keyed by (template, parameter names); values kept as insertion-ordered dicts"""
+    clusters: Dict[tuple, Dict] = {}
+
+    for url in urls:
+        try:
+            parsed = urlparse(url)
+            params = parse_qs(parsed.query, keep_blank_values=True)
         except Exception as e:
             print(f"[!] Error parsing URL {url}: {e}")
             continue
 
+        template = f"{parsed.scheme}://{parsed.netloc.lower()}{path_template(parsed.path)}"
+        key = (template, frozenset(params))
+        cluster = clusters.get(key)
+        if cluster is None:
+            cluster = clusters[key] = {
+                "template": template,
+                "params": sorted(params),
+                "count": 0,
+                "examples": [],
+                "values": {name: {} for name in params},
+            }
+
+        cluster["count"] += 1
+        if len(cluster["examples"]) < max_examples:
+            cluster["examples"].append(url)
+        for name, values in params.items():
+            sample = cluster["values"][name]
+            for value in values:
+                if len(sample) >= max_values:
+                    break
+                sample[value] = None
+
+    return clusters
+
+def _cluster_batch(batch: str, max_examples: int = MAX_EXAMPLES, max_values: int = MAX_VALUES) -> Dict[tuple, Dict]:
+    return _cluster(batch.split("\n"), max_examples, max_values)
+
+def _merge_clusters(clusters: Dict[tuple, Dict], other: Dict[tuple, Dict],
+                    max_examples: int, max_values: int):
+    """Fold a later batch's clusters into `clusters`; same result as clustering both in one pass"""
+    for key, cluster in other.items():
+        existing = clusters.get(key)
+        if existing is None:
+            clusters[key] = cluster
+            continue
+        existing["count"] += cluster["count"]
+        room = max_examples - len(existing["examples"])
+        if room > 0:
+            existing["examples"].extend(cluster["examples"][:room])
+        for name, values in cluster["values"].items():
+            sample = existing["values"][name]
+            for value in values:
+                if len(sample) >= max_values:
+                    break
+                sample[value] = None
+
+@timed("urls.cluster")
+def cluster_urls(urls: Iterable[str], max_examples: int = MAX_EXAMPLES,
+                 max_values: int = MAX_VALUES) -> List[Dict]:
+    """
+    Cluster URLs by scheme, host, path template and the set of parameter names.
+    Each cluster keeps a count, a few example URLs and a bounded sample of values
+    seen for each parameter. Large lists are clustered in batches on the CPU pool.
+    """
+    urls = urls if isinstance(urls, list) else list(urls)
+    if should_offload(len(urls)):
+        clusters: Dict[tuple, Dict] = {}
+        for batch_clusters in map_chunks(partial(_cluster_batch, max_examples=max_examples,
+                                                 max_values=max_values), urls):
+            _merge_clusters(clusters, batch_clusters, max_examples, max_values)
+    else:
+        clusters = _cluster(urls, max_examples, max_values)
+
+    results = list(clusters.values())
+    for cluster in results:
+        cluster["values"] = {name: sorted(values) for name, values in cluster["values"].items()}
+    return results
+
+def group_similar_urls(urls: List[str]) -> List[str]:
+    """One URL per template cluster: the first example's path plus the merged parameter values"""
     grouped_urls = []
-    for base, param_map in grouped.items():
+    no_params = []
+
+    for cluster in cluster_urls(urls):
+        parsed = urlparse(cluster["examples"][0])
+        base = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+        if not cluster["params"]:
+            no_params.append(base)
+            continue
+
         query_parts = []
-        for key, values in param_map.items():
+        for key, values in cluster["values"].items():
             if len(values) == 1:
-                query_parts.append(f"{key}={next(iter(values))}")
+                query_parts.append(f"{key}={values[0]}")
             else:
-                query_parts.append(f"{key}={{{','.join(sorted(values))}}}")
+                query_parts.append(f"{key}={{{','.join(values)}}}")
         grouped_urls.append(f"{base}?{'&'.join(query_parts)}")
 
     grouped_urls.extend(no_params)
     return grouped_urls
 
-async def collect_urls_async(domain: str, max_urls: int = 3000) -> List[str]:
-    combined = await run_tools_concurrently(domain)
-    cleaned = clean_urls(combined)
-    sorted_urls = sorted(cleaned, key=lambda u: ('?' not in u, len(u)))
-    limited_urls = sorted_urls[:max_urls]
+async def cluster_urls_async(urls: List[str]) -> List[Dict]:
+    """cluster_urls for async callers: lists big enough for the CPU pool are waited on off the loop"""
+    if should_offload(len(urls)):
+        return await asyncio.to_thread(cluster_urls, urls)
+    return cluster_urls(urls)
+
+async def group_similar_urls_async(urls: List[str]) -> List[str]:
+    if should_offload(len(urls)):
+        return await asyncio.to_thread(group_similar_urls, urls)
+    return group_similar_urls(urls)
+
+@cached("collect_urls", ttl=ttl_from_env("collect_urls", 12 * 3600), stale_ttl=48 * 3600,
+        cache_if=bool)
+async def collect_urls_async(domain: str, max_urls: int = 3000, dedup: str = "fingerprint",
+                             clusters: bool = False) -> List:
+    top = TopUrls(max_urls, dedup=dedup)
+    # Lines are cleaned and fingerprinted in batches on the CPU pool while gau/waybackurls run
+    async for text, raw in map_chunks_async(_clean_batch, stream_tools_concurrently(domain)):
+        fingerprints = array("Q")
+        fingerprints.frombytes(raw)
+        for url, fingerprint in zip(text.split("\n"), fingerprints):
+            top.add(url, fingerprint)
+    limited_urls = top.urls()
     print(f"[✓] Final URL count (after dedup/filter): {len(limited_urls)}")
-    return group_similar_urls(limited_urls)
+    if clusters:
+        return await cluster_urls_async(limited_urls)
+    return await group_similar_urls_async(limited_urls)
 
-# Sync wrapper for Flask compatibility
-def collect_urls(domain: str, max_urls: int = 3000) -> List[str]:
-    try:
-        # Try to use existing event loop if in async context
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        # Create new event loop if none exists
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    return loop.run_until_complete(collect_urls_async(domain, max_urls))
+async def archive_urls_async(domain: str) -> Dict:
+    """Run gau/waybackurls only to fill the domain's URL archive; returns its stats"""
+    async for _ in stream_tools_concurrently(domain):
+        pass
+    return get_url_archive(domain).stats()
+
+async def query_url_archive_async(domain: str, **filters) -> Dict:
+    """
+    A cursor-paginated page of the domain's archived URLs (see UrlArchive.query for
+    the filters). A domain that was never collected is collected first.
+    """
+    archive = get_url_archive(domain)
+    if archive.needs_collection():
+        await archive_urls_async(domain)
+    return await asyncio.to_thread(archive.query, **filters)
+
+def query_url_archive(domain: str, **filters) -> Dict:
+    return asyncio.run(query_url_archive_async(domain, **filters))
+
+# Sync wrapper for Flask compatibility; async callers should await collect_urls_async
+def collect_urls(domain: str, max_urls: int = 3000, clusters: bool = False) -> List:
+    return asyncio.run(collect_urls_async(domain, max_urls, clusters=clusters))
@@ -1,20 +1,251 @@
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
+import asyncio
+import atexit
+import base64
+import hashlib
 import httpx
-from urllib.parse import urlparse
-from typing import Dict, List, Optional, Union
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlparse, urlsplit, urlunsplit
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Union
 import logging
 
+from core.utils.streaming import iter_async_on
+from core.utils.metrics import STAGE_SECONDS, timed
+from core.utils.rate_limit import get_scheduler, target_key
+from core.utils.response_store import get_response_store
+from core.utils.url_templates import path_template
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def capture_data(url: str) -> Dict[str, Union[Dict, List, str]]:
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", 4))
+BROWSER_MAX_PAGES = int(os.environ.get("BROWSER_MAX_PAGES", 100))
+# Seconds a browser gets to open or close a context before it is relaunched
+BROWSER_CHECK_TIMEOUT = float(os.environ.get("BROWSER_CHECK_TIMEOUT", 10))
+CHROMIUM_ARGS = [
+    '--disable-gpu',
+    '--no-sandbox',
+    '--disable-dev-shm-usage'
+]
+
+
+class BrowserSlot:
+    """One warm Chromium; each checkout gets a fresh context on it"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.browser = None
+        self.context = None
+        self.pages_served = 0
+
+    @property
+    def connected(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    Long-lived pool of Chromium instances. Each checkout gets a new context on a
+    warm browser, so no cookies or storage carry over between targets; opening
+    it is also the health check, since a wedged browser won't answer in time.
+    A browser is restarted after `max_pages` pages or when that check fails.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_pages: int = BROWSER_MAX_PAGES):
+        self.size = size
+        self.max_pages = max_pages
+        self.playwright = None
+        self.slots: Optional[asyncio.Queue] = None
+        self.all_slots: List[BrowserSlot] = []
+        self.client: Optional[httpx.AsyncClient] = None
+        self.loop = None
+
+    async def start(self, warm: bool = True):
+        self.loop = asyncio.get_running_loop()
+        self.playwright = await async_playwright().start()
+        self.client = httpx.AsyncClient(timeout=10.0, headers={'User-Agent': USER_AGENT})
+        self.slots = asyncio.Queue()
+        for i in range(self.size):
+            slot = BrowserSlot(i)
+            self.all_slots.append(slot)
+            self.slots.put_nowait(slot)
+        if warm:
+            await asyncio.gather(*[self._launch(slot) for slot in self.all_slots], return_exceptions=True)
+        logger.info(f"Browser pool ready with {self.size} slots")
+        return self
+
+    async def _launch(self, slot: BrowserSlot):
+        await self._shutdown(slot)
+        slot.browser = await self.playwright.chromium.launch(
+            timeout=10000,
+            headless=True,
+            args=CHROMIUM_ARGS
+        )
+        slot.pages_served = 0
+
+    async def _open_context(self, slot: BrowserSlot):
+        slot.context = await asyncio.wait_for(slot.browser.new_context(
+            user_agent=USER_AGENT,
+            viewport={'width': 1280, 'height': 720}
+        ), BROWSER_CHECK_TIMEOUT)
+
+    async def _close_context(self, slot: BrowserSlot):
+        context, slot.context = slot.context, None
+        if context is not None:
+            await context.close()
+
+    async def _shutdown(self, slot: BrowserSlot):
+        try:
+            await self._close_context(slot)
+            if slot.browser is not None:
+                await slot.browser.close()
+        except Exception as e:
+            logger.warning(f"Failed to close browser slot {slot.index}: {str(e)}")
+        slot.browser = None
+        slot.context = None
+
+    async def _prepare(self, slot: BrowserSlot):
+        if not slot.connected or slot.pages_served >= self.max_pages:
+            await self._launch(slot)
+        try:
+            await self._open_context(slot)
+        except Exception as e:
+            logger.warning(f"Browser slot {slot.index} unresponsive, relaunching: {str(e) or type(e).__name__}")
+            await self._launch(slot)
+            await self._open_context(slot)
+
+    @asynccontextmanager
+    async def checkout(self):
+        """
+        Hold a whole slot (one browser, one fresh context) until released; blocks
+        while every slot is busy. The context is discarded on release.
+        """
+        waited = time.perf_counter()
+        slot = await self.slots.get()
+        STAGE_SECONDS.labels("capture.browser_wait").observe(time.perf_counter() - waited)
+        try:
+            await self._prepare(slot)
+            try:
+                yield slot
+            finally:
+                try:
+                    await asyncio.wait_for(self._close_context(slot), BROWSER_CHECK_TIMEOUT)
+                except Exception as e:
+                    logger.warning(f"Recycling browser slot {slot.index}: {str(e)}")
+                    await self._shutdown(slot)
+        finally:
+            self.slots.put_nowait(slot)
+
+    @asynccontextmanager
+    async def page(self):
+        """Check out a page in a fresh context; blocks while every slot is busy"""
+        async with self.checkout() as slot:
+            page = await slot.context.new_page()
+            try:
+                yield page
+            finally:
+                slot.pages_served += 1
+                try:
+                    await page.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close page in slot {slot.index}: {str(e)}")
+
+    async def close(self):
+        for slot in self.all_slots:
+            await self._shutdown(slot)
+        if self.client is not None:
+            await self.client.aclose()
+        if self.playwright is not None:
+            await self.playwright.stop()
+
+
+_pool: Optional[BrowserPool] = None
+_pool_starting: Optional[asyncio.Task] = None
+_browser_loop: Optional[asyncio.AbstractEventLoop] = None
+_browser_loop_lock = threading.Lock()
+
+
+async def get_browser_pool() -> BrowserPool:
+    """Return the pool bound to the running event loop, starting it on first use"""
+    global _pool, _pool_starting
+    loop = asyncio.get_running_loop()
+    if _pool is not None and _pool.loop is loop:
+        return _pool
+    # Requests arriving while the pool starts wait for the same start
+    if _pool_starting is None or _pool_starting.get_loop() is not loop:
+        _pool_starting = loop.create_task(BrowserPool().start())
+    starting = _pool_starting
+    try:
+        pool = await asyncio.shield(starting)
+    finally:
+        if _pool_starting is starting and starting.done():
+            _pool_starting = None
+    _pool = pool
+    return pool
+
+
+async def close_browser_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_browser_loop() -> asyncio.AbstractEventLoop:
+    """
+    Long-lived loop on a daemon thread that owns the browser pool for sync
+    callers (Flask), so every request shares one set of warm browsers
+    """
+    global _browser_loop
+    with _browser_loop_lock:
+        if _browser_loop is None:
+            _browser_loop = asyncio.new_event_loop()
+            threading.Thread(target=_browser_loop.run_forever, name="browser-pool", daemon=True).start()
+            atexit.register(_close_browser_loop)
+        return _browser_loop
+
+
+def _close_browser_loop():
+    try:
+        asyncio.run_coroutine_threadsafe(close_browser_pool(), _browser_loop).result(timeout=10)
+    except Exception as e:
+        logger.warning(f"Failed to close browser pool: {str(e)}")
+
+
+async def _fetch_server_response(pool: BrowserPool, url: str, result: Dict):
+    try:
+        async with get_scheduler().request(url) as ticket:
+            resp = await pool.client.get(url, follow_redirects=True)
+            ticket.observe(resp.status_code, resp.headers)
+        result["server_response"] = {
+            "status_code": resp.status_code,
+            "headers": dict(resp.headers),
+            "content": resp.text[:5000] + "..." if len(resp.text) > 5000 else resp.text,
+            "final_url": str(resp.url),
+            "response_time_ms": resp.elapsed.microseconds / 1000
+        }
+    except Exception as e:
+        logger.error(f"Server request failed: {str(e)}")
+        result["server_response"] = {"error": str(e)}
+        result["error"] = f"Server request failed: {str(e)}"
+
+
+@timed("capture.page")
+async def capture_data(url: str, pool: Optional[BrowserPool] = None) -> Dict[str, Union[Dict, List, str]]:
     """
     Capture server response and browser requests for a given URL.
-    
+
     Args:
         url: The target URL to capture data from
-        
+        pool: Browser pool to use; defaults to the shared pool for this event loop
+
     Returns:
         Dictionary containing:
         - server_response: Raw HTTP response from server
@@ -23,53 +254,33 @@ async def capture_data(url: str) -> Dict[str, Union[Dict, List, str]]:
     """
     if not url.startswith(('http://', 'https://')):
         url = f'https://{url}'
-    
+
     target_host = urlparse(url).netloc
     result = {
         "server_response": None,
         "browser_requests": [],
         "error": None
     }
+    if pool is None:
+        pool = await get_browser_pool()
 
-    # 1. Capture raw server response with timeout
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            resp = await client.get(
-                url,
-                follow_redirects=True,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-            )
-            result["server_response"] = {
-                "status_code": resp.status_code,
-                "headers": dict(resp.headers),
-                "content": resp.text[:5000] + "..." if len(resp.text) > 5000 else resp.text,
-                "final_url": str(resp.url),
-                "response_time_ms": resp.elapsed.microseconds / 1000
-            }
-        except Exception as e:
-            logger.error(f"Server request failed: {str(e)}")
-            result["server_response"] = {"error": str(e)}
-            result["error"] = f"Server request failed: {str(e)}"
+    # 1. Capture raw server response with timeout, unless the prober already has it
+    stored = get_response_store().lookup(url)
+    if stored is not None:
+        body = stored["body"]
+        result["server_response"] = {
+            "status_code": stored["status_code"],
+            "headers": stored["headers"],
+            "content": body[:5000] + "..." if len(body) > 5000 else body,
+            "final_url": stored["final_url"],
+            "response_time_ms": stored["response_time_ms"]
+        }
+    else:
+        await _fetch_server_response(pool, url, result)
 
-    # 2. Capture browser requests with proper cleanup
+    # 2. Capture browser requests on a pooled page
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                timeout=10000,
-                headless=True,
-                args=[
-                    '--disable-gpu',
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage'
-                ]
-            )
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                viewport={'width': 1280, 'height': 720}
-            )
-            page = await context.new_page()
+        async with pool.page() as page:
 
             def log_request(request):
                 try:
@@ -88,18 +299,19 @@ async def capture_data(url: str) -> Dict[str, Union[Dict, List, str]]:
             page.on("request", log_request)
 
             try:
-                await page.goto(
-                    url,
-                    wait_until="networkidle",
-                    timeout=15000,
-                    referer=None
-                )
+                # One budget token per navigation; the page's own subresources aren't counted
+                async with get_scheduler().request(url) as ticket:
+                    response = await page.goto(
+                        url,
+                        wait_until="networkidle",
+                        timeout=15000,
+                        referer=None
+                    )
+                    if response is not None:
+                        ticket.observe(response.status, await response.all_headers())
             except Exception as e:
                 logger.error(f"Browser navigation failed: {str(e)}")
                 result["error"] = f"Browser navigation failed: {str(e)}"
-            finally:
-                await context.close()
-                await browser.close()
 
     except Exception as e:
         logger.error(f"Playwright failed: {str(e)}")
@@ -112,3 +324,320 @@ async def capture_data(url: str) -> Dict[str, Union[Dict, List, str]]:
                 request["headers"][header] = "[REDACTED]"
 
     return result
+
+
+async def capture_batch(urls: Iterable[str], pool: Optional[BrowserPool] = None) -> AsyncIterator[Dict]:
+    """Capture many URLs in parallel over the pool, yielding each result as it finishes"""
+    if pool is None:
+        pool = await get_browser_pool()
+
+    async def capture(url):
+        result = await capture_data(url, pool)
+        result["url"] = url
+        return result
+
+    tasks = [asyncio.create_task(capture(url)) for url in dict.fromkeys(urls)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def iter_capture_batch(urls: Iterable[str]) -> Iterator[Dict]:
+    """Sync generator for Flask over the process-wide pool on the browser loop"""
+    return iter_async_on(capture_batch(list(urls)), get_browser_loop())
+
+
+# --- crawl capture ------------------------------------------------------------
+
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", 100))
+CRAWL_MAX_DEPTH = int(os.environ.get("CRAWL_MAX_DEPTH", 3))
+CRAWL_CONCURRENCY = int(os.environ.get("CRAWL_CONCURRENCY", 4))
+CRAWL_MAX_BODY = int(os.environ.get("CRAWL_MAX_BODY", 64 * 1024))
+# /item/1, /item/2, ... rarely issue new requests; visit a few pages per path template
+CRAWL_PER_TEMPLATE = int(os.environ.get("CRAWL_PER_TEMPLATE", 3))
+CRAWL_PAGE_TIMEOUT = 15000
+# After "load", how long to wait for the network to go quiet before reading links
+CRAWL_SETTLE_TIMEOUT = int(os.environ.get("CRAWL_SETTLE_TIMEOUT", 3000))
+# Upper bounds for options passed in a request
+CRAWL_LIMITS = {"max_pages": 1000, "max_depth": 10, "concurrency": 16, "max_body": 1024 * 1024}
+# Response bodies are kept for these; static assets are logged without them
+BODY_RESOURCE_TYPES = {"document", "xhr", "fetch"}
+# Bodies declared bigger than this aren't pulled out of the browser at all
+MAX_BODY_FETCH = 4 * 1024 * 1024
+SKIP_LINK_RE = re.compile(
+    r"\.(?:jpe?g|png|gif|svg|ico|webp|css|js|woff2?|ttf|pdf|zip|gz|tar|mp3|mp4|avi|mov|exe|dmg)$", re.IGNORECASE
+)
+TEXT_MIME_RE = re.compile(
+    r"^(?:text/|application/(?:json|xml|javascript|graphql|x-www-form-urlencoded)|[^;]*\+(?:json|xml))",
+    re.IGNORECASE
+)
+REDACTED_HEADERS = {"cookie", "authorization", "set-cookie"}
+HAR_CREATOR = {"name": "bughunt-capture", "version": "1.0"}
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.lower()}"
+
+
+def url_template(url: str) -> str:
+    """Origin, templated path and sorted parameter names: /user/42?id=1 -> /user/{int}?id"""
+    parts = urlsplit(url)
+    template = _origin(url) + path_template(parts.path)
+    names = sorted({name for name, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    return f"{template}?{'&'.join(names)}" if names else template
+
+
+def _har_headers(headers: Dict[str, str]) -> List[Dict[str, str]]:
+    return [
+        {"name": name, "value": "[REDACTED]" if name.lower() in REDACTED_HEADERS else value}
+        for name, value in headers.items()
+    ]
+
+
+def _har_text(data: bytes, mime_type: str, max_body: int) -> Dict:
+    """HAR text fields for a body cut at max_body: text for textual types, base64 otherwise"""
+    content = {"_truncated": len(data) > max_body}
+    data = data[:max_body]
+    if TEXT_MIME_RE.match(mime_type or ""):
+        content["text"] = data.decode("utf-8", errors="replace")
+    else:
+        content["text"] = base64.b64encode(data).decode()
+        content["encoding"] = "base64"
+    return content
+
+
+async def har_entry(request, max_body: int = CRAWL_MAX_BODY) -> Dict:
+    """HAR 1.2 entry for a finished (or failed) Playwright request, bodies capped at max_body"""
+    response = await request.response()
+    timing = request.timing
+    started = timing.get("startTime") or time.time() * 1000
+    request_headers = await request.all_headers()
+    post = request.post_data_buffer
+    query = urlsplit(request.url).query
+
+    entry_request = {
+        "method": request.method,
+        "url": request.url,
+        "httpVersion": "",
+        "headers": _har_headers(request_headers),
+        "queryString": [{"name": n, "value": v} for n, v in parse_qsl(query, keep_blank_values=True)],
+        "cookies": [],
+        "headersSize": -1,
+        "bodySize": len(post) if post else 0,
+    }
+    if post:
+        mime_type = request_headers.get("content-type", "")
+        entry_request["postData"] = {"mimeType": mime_type, **_har_text(post, mime_type, max_body)}
+
+    content = {"size": -1, "mimeType": ""}
+    entry_response = {
+        "status": 0, "statusText": "", "httpVersion": "", "headers": [], "cookies": [],
+        "content": content, "redirectURL": "", "headersSize": -1, "bodySize": -1,
+    }
+    if response is not None:
+        headers = await response.all_headers()
+        content["mimeType"] = headers.get("content-type", "")
+        entry_response.update({
+            "status": response.status,
+            "statusText": response.status_text,
+            "headers": _har_headers(headers),
+            "redirectURL": headers.get("location", ""),
+        })
+        declared = int(headers.get("content-length") or 0)
+        if (request.resource_type in BODY_RESOURCE_TYPES and not 300 <= response.status < 400
+                and declared <= MAX_BODY_FETCH):
+            try:
+                body = await response.body()
+                content["size"] = len(body)
+                content.update(_har_text(body, content["mimeType"], max_body))
+            except Exception as e:
+                logger.warning(f"No body for {request.url}: {str(e)}")
+        elif declared:
+            content["size"] = declared
+
+    def span(start: str, end: str) -> float:
+        return max(0.0, timing[end] - timing[start]) if timing.get(start, -1) >= 0 and timing.get(end, -1) >= 0 else 0.0
+
+    entry = {
+        "startedDateTime": datetime.fromtimestamp(started / 1000, timezone.utc).isoformat(),
+        "time": max(0.0, timing.get("responseEnd", -1)),
+        "request": entry_request,
+        "response": entry_response,
+        "cache": {},
+        "timings": {"send": 0, "wait": span("requestStart", "responseStart"),
+                    "receive": span("responseStart", "responseEnd")},
+        "_resourceType": request.resource_type,
+    }
+    if response is None and request.failure:
+        entry["_error"] = request.failure
+    return entry
+
+
+def crawl_options(data: Dict) -> Dict:
+    """Crawl settings from a request body, capped at CRAWL_LIMITS; ValueError if malformed"""
+    options = {}
+    for name, limit in CRAWL_LIMITS.items():
+        value = data.get(name)
+        if value is None:
+            continue
+        minimum = 0 if name == "max_depth" else 1
+        if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+            raise ValueError(f"'{name}' must be an integer >= {minimum}")
+        options[name] = min(value, limit)
+    return options
+
+
+@timed("capture.crawl")
+async def crawl(seed: str, pool: Optional[BrowserPool] = None, max_pages: int = CRAWL_MAX_PAGES,
+                max_depth: int = CRAWL_MAX_DEPTH, concurrency: int = CRAWL_CONCURRENCY,
+                max_body: int = CRAWL_MAX_BODY) -> AsyncIterator[Dict]:
+    """
+    Capture a site breadth-first from `seed`: same-origin links are followed up to
+    `max_depth` and `max_pages`, with `concurrency` pages open at a time in one
+    browser context, so cache and cookies carry over between pages. Yields a HAR
+    entry for each distinct request to the seed's site (by method, URL template
+    and body hash) as soon as it finishes.
+    """
+    if not seed.startswith(('http://', 'https://')):
+        seed = f'https://{seed}'
+    parts = urlsplit(seed)
+    seed = urlunsplit(parts._replace(path=parts.path or "/", fragment=""))  # as the browser reports it
+    site = target_key(seed)
+    origins = {_origin(seed)}
+    if pool is None:
+        pool = await get_browser_pool()
+
+    entries: asyncio.Queue = asyncio.Queue(maxsize=1000)
+    frontier: asyncio.Queue = asyncio.Queue()
+    done = object()
+    queued = {seed}
+    per_template: Dict[str, int] = {}
+    seen = set()
+    recorders = set()
+    stats = {"pages": 0, "requests": 0, "duplicates": 0}
+    frontier.put_nowait((seed, 0))
+
+    def enqueue(link: str, depth: int):
+        link = link.split("#")[0]
+        if len(queued) >= max_pages or link in queued or _origin(link) not in origins:
+            return
+        if SKIP_LINK_RE.search(urlsplit(link).path):
+            return
+        template = url_template(link)
+        if per_template.get(template, 0) >= CRAWL_PER_TEMPLATE:
+            return
+        per_template[template] = per_template.get(template, 0) + 1
+        queued.add(link)
+        frontier.put_nowait((link, depth))
+
+    async def record(request, template: str, page_url: Optional[str]):
+        try:
+            entry = await har_entry(request, max_body)
+        except Exception as e:
+            logger.warning(f"Failed to record {request.url}: {str(e)}")
+            return
+        entry["_template"] = template
+        entry["_page"] = page_url
+        await entries.put(entry)
+
+    def on_request(request):
+        try:
+            if target_key(request.url) != site:
+                return
+            template = url_template(request.url)
+            body_hash = hashlib.blake2b(request.post_data_buffer or b"", digest_size=8).hexdigest()
+            key = (request.method, template, body_hash)
+            try:
+                page_url = request.frame.url
+            except Exception:
+                page_url = None  # service worker requests have no frame
+        except Exception as e:
+            logger.warning(f"Failed to log request: {str(e)}")
+            return
+        stats["requests"] += 1
+        if key in seen:
+            stats["duplicates"] += 1
+            return
+        seen.add(key)
+        task = asyncio.create_task(record(request, template, page_url))
+        recorders.add(task)
+        task.add_done_callback(recorders.discard)
+
+    async def visit(slot: BrowserSlot, url: str, depth: int):
+        page = await slot.context.new_page()
+        try:
+            try:
+                async with get_scheduler().request(url) as ticket:
+                    response = await page.goto(url, wait_until="load", timeout=CRAWL_PAGE_TIMEOUT)
+                    if response is not None:
+                        ticket.observe(response.status, await response.all_headers())
+                # Give client-side rendering a moment to add links; pages that poll never go idle
+                await page.wait_for_load_state("networkidle", timeout=CRAWL_SETTLE_TIMEOUT)
+            except PlaywrightTimeoutError as e:
+                # Whatever the page has rendered so far still has links worth following
+                logger.info(f"Crawl of {url} timed out waiting for the page, using it as is: {str(e)}")
+            if depth == 0 and page.url.startswith(("http://", "https://")):
+                # Follow the seed's own redirect (http -> https, bare -> www)
+                origins.add(_origin(page.url))
+            if depth >= max_depth or _origin(page.url) not in origins:
+                return
+            links = await page.eval_on_selector_all("a[href], area[href]", "els => els.map(e => e.href)")
+            for link in links:
+                enqueue(link, depth + 1)
+        finally:
+            slot.pages_served += 1
+            await page.close()
+
+    async def worker(slot: BrowserSlot):
+        while True:
+            url, depth = await frontier.get()
+            try:
+                await visit(slot, url, depth)
+                stats["pages"] += 1
+            except Exception as e:
+                logger.warning(f"Crawl of {url} failed: {str(e)}")
+            finally:
+                frontier.task_done()
+
+    async def run():
+        try:
+            async with pool.checkout() as slot:
+                slot.context.on("requestfinished", on_request)
+                slot.context.on("requestfailed", on_request)
+                workers = [asyncio.create_task(worker(slot)) for _ in range(concurrency)]
+                try:
+                    await frontier.join()
+                finally:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                    slot.context.remove_listener("requestfinished", on_request)
+                    slot.context.remove_listener("requestfailed", on_request)
+                    await asyncio.gather(*list(recorders), return_exceptions=True)
+        finally:
+            await entries.put(done)
+
+    runner = asyncio.create_task(run())
+    try:
+        while True:
+            entry = await entries.get()
+            if entry is done:
+                break
+            yield entry
+        await runner
+    finally:
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+        for task in list(recorders):
+            task.cancel()
+        logger.info(f"Crawl of {seed} finished: {stats}")
+
+
+def iter_crawl(seed: str, **options) -> Iterator[Dict]:
+    """Sync generator for Flask; the crawl holds one slot of the process-wide pool"""
+    return iter_async_on(crawl(seed, **options), get_browser_loop())
@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+
+from core.utils.metrics import CACHE_LOOKUPS
+
+CACHE_DB = os.environ.get(
+    "RECON_CACHE_DB", os.path.join(tempfile.gettempdir(), "bughunt_cache.sqlite3")
+)
+MEMORY_ENTRIES = int(os.environ.get("RECON_CACHE_MEMORY_ENTRIES", 256))
+CACHE_DISABLED = os.environ.get("RECON_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+_MISSING = object()
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of a persistent SQLite table. Both tiers hold the JSON
+    payload and every hit decodes its own copy, so a caller that mutates a result
+    can't change what the next caller sees. Entries stored with share=True also
+    keep the decoded object in memory and hand that same object to every hit.
+    """
+
+    def __init__(self, db_path: str = CACHE_DB, max_entries: int = MEMORY_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        # key -> (stored_at, payload, shared object or _MISSING)
+        self.memory: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key: str, decode: Optional[Callable[[Any], Any]] = None,
+            share: bool = False) -> Optional[Tuple[float, Any]]:
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+        if entry is not None:
+            stored_at, payload, shared = entry
+            if share and shared is not _MISSING:
+                return stored_at, shared
+        else:
+            try:
+                row = self._db().execute(
+                    "SELECT stored_at, value FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[!] Cache read failed: {e}")
+                return None
+            if row is None:
+                return None
+            stored_at, payload = row
+
+        value = json.loads(payload)
+        value = decode(value) if decode else value
+        self._remember(key, (stored_at, payload, value if share else _MISSING))
+        return stored_at, value
+
+    def set(self, key: str, value: Any, encode: Optional[Callable[[Any], Any]] = None,
+            share: bool = False) -> Any:
+        """
+        Store `value` and return it as a hit would hand it back (without a codec,
+        the JSON round-trip: tuples as lists, and so on). Values that aren't
+        JSON-serialisable are not cached and are returned unchanged.
+        """
+        try:
+            payload = json.dumps(encode(value) if encode else value)
+        except (TypeError, ValueError) as e:
+            print(f"[!] Not caching {key.split(':', 1)[0]} result: {e}")
+            return value
+        if encode is None:
+            value = json.loads(payload)
+        stored_at = time.time()
+        self._remember(key, (stored_at, payload, value if share else _MISSING))
+        try:
+            with self._db() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO cache (key, stored_at, value) VALUES (?, ?, ?)",
+                    (key, stored_at, payload),
+                )
+        except sqlite3.Error as e:
+            print(f"[!] Cache write failed: {e}")
+        return value
+
+    def _remember(self, key: str, entry: Tuple[float, str, Any]):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+
+_cache: Optional[TieredCache] = None
+_cache_lock = threading.Lock()
+_refreshing = set()
+_refresh_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_cache() -> TieredCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TieredCache()
+        return _cache
+
+
+def get_refresh_loop() -> asyncio.AbstractEventLoop:
+    """Long-lived loop on a daemon thread for background refreshes of async functions"""
+    global _refresh_loop
+    with _cache_lock:
+        if _refresh_loop is None:
+            _refresh_loop = asyncio.new_event_loop()
+            threading.Thread(target=_refresh_loop.run_forever, name="cache-refresh", daemon=True).start()
+        return _refresh_loop
+
+
+def make_key(name: str, func: Callable, args: tuple, kwargs: dict) -> str:
+    """Key on the bound arguments so f(x) and f(x, default=...) share an entry"""
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+    except TypeError:
+        arguments = {"args": list(args), **kwargs}
+    payload = json.dumps([name, arguments], sort_keys=True, default=str)
+    return f"{name}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def cached(name: str, ttl: int, stale_ttl: int = 0,
+           cache_if: Callable[[Any], bool] = lambda result: True,
+           encode: Optional[Callable[[Any], Any]] = None, decode: Optional[Callable[[Any], Any]] = None,
+           share: bool = False):
+    """
+    Cache a function's result keyed by name and arguments. Works on plain and
+    coroutine functions. `encode`/`decode` convert a result that isn't plain
+    JSON (e.g. an index) to and from the stored form. Each hit gets its own
+    decoded copy; with share=True every hit gets the same object, for results
+    that are expensive to decode and can't be modified (see ParamIndex.freeze).
+
+    Fresh for `ttl` seconds. For a further `stale_ttl` seconds the stale value is
+    returned immediately while it is recomputed in the background (a thread for
+    plain functions, the shared refresh loop for coroutines). `cache_if` lets
+    callers skip caching error results.
+    """
+    def lookup(key):
+        """Returns (value, needs_refresh); value is _MISSING on a miss"""
+        entry = get_cache().get(key, decode, share)
+        if entry is None:
+            CACHE_LOOKUPS.labels(name, "miss").inc()
+            return _MISSING, False
+        stored_at, value = entry
+        age = time.time() - stored_at
+        if age < ttl:
+            CACHE_LOOKUPS.labels(name, "hit").inc()
+            return value, False
+        if age < ttl + stale_ttl:
+            CACHE_LOOKUPS.labels(name, "stale").inc()
+            with _cache_lock:
+                start = key not in _refreshing
+                _refreshing.add(key)
+            if start:
+                print(f"[+] Serving stale {name} result, refreshing in background")
+            return value, start
+        CACHE_LOOKUPS.labels(name, "expired").inc()
+        return _MISSING, False
+
+    def store(key, result):
+        """Cache the result; returns what later hits will see"""
+        if cache_if(result):
+            return get_cache().set(key, result, encode, share)
+        return result
+
+    def done(key):
+        with _cache_lock:
+            _refreshing.discard(key)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            async def refresh_async(key, args, kwargs):
+                try:
+                    return store(key, await func(*args, **kwargs))
+                finally:
+                    done(key)
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if CACHE_DISABLED:
+                    return await func(*args, **kwargs)
+
+                key = make_key(name, func, args, kwargs)
+                value, needs_refresh = lookup(key)
+                if needs_refresh:
+                    asyncio.run_coroutine_threadsafe(refresh_async(key, args, kwargs), get_refresh_loop())
+                if value is not _MISSING:
+                    return value
+
+                return store(key, await func(*args, **kwargs))
+
+            async_wrapper.uncached = func
+            return async_wrapper
+
+        def refresh(key, args, kwargs):
+            try:
+                return store(key, func(*args, **kwargs))
+            finally:
+                done(key)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if CACHE_DISABLED:
+                return func(*args, **kwargs)
+
+            key = make_key(name, func, args, kwargs)
+            value, needs_refresh = lookup(key)
+            if needs_refresh:
+                threading.Thread(target=refresh, args=(key, args, kwargs), daemon=True).start()
+            if value is not _MISSING:
+                return value
+
+            return store(key, func(*args, **kwargs))
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def ttl_from_env(endpoint: str, default: int) -> int:
+    return int(os.environ.get(f"CACHE_TTL_{endpoint.upper()}", default))
@@ -0,0 +1,219 @@
+import asyncio
+import contextvars
+import inspect
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from core.utils import metrics
+
+# Worker pool size and how long finished jobs are kept around
+MAX_WORKERS = int(os.environ.get("JOB_WORKERS", 8))
+JOB_TTL = int(os.environ.get("JOB_TTL", 3600))
+
+# Per-tool concurrency limits; a job waits for its tool slot inside the pool
+TOOL_LIMITS = {
+    "nmap": int(os.environ.get("JOB_LIMIT_NMAP", 2)),
+    "paramspider": int(os.environ.get("JOB_LIMIT_PARAMSPIDER", 2)),
+    "subfinder": int(os.environ.get("JOB_LIMIT_SUBFINDER", 4)),
+    "gau": int(os.environ.get("JOB_LIMIT_GAU", 4)),
+    "subjack": int(os.environ.get("JOB_LIMIT_SUBJACK", 2)),
+    "wappalyzer": int(os.environ.get("JOB_LIMIT_WAPPALYZER", 4)),
+}
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# The job whose handler is running in this context; tasks and to_thread calls inherit it
+current_job: contextvars.ContextVar[Optional["Job"]] = contextvars.ContextVar("current_job", default=None)
+
+
+def report_progress(message: str):
+    """Record progress on the job running in this context, if any (e.g. from the tool runner)"""
+    job = current_job.get()
+    if job is not None and job.status == RUNNING:
+        job.progress = message
+
+
+class Job:
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = PENDING
+        self.progress = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        # The handler's task and the loop it runs on, while it runs
+        self.task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.lock = threading.Lock()
+
+    def set_progress(self, message: str):
+        """Called by job functions to report progress; raises if the job was cancelled"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.progress = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "type": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Bounded worker pool that runs registered recon functions as background jobs"""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, tool_limits: Optional[Dict[str, int]] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.semaphores = {
+            tool: threading.BoundedSemaphore(limit)
+            for tool, limit in (tool_limits or TOOL_LIMITS).items()
+        }
+        self.handlers: Dict[str, Dict[str, Any]] = {}
+        self.jobs: Dict[str, Job] = {}
+        self.lock = threading.Lock()
+
+    def register(self, kind: str, func: Callable[..., Any], tool: Optional[str] = None):
+        """
+        Register a job type. `func` receives the job's params as keyword arguments.
+        Coroutine functions are cancelled mid-run, which kills any tool they are
+        running; a plain function runs in a thread and is only abandoned.
+        """
+        self.handlers[kind] = {"func": func, "tool": tool}
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job type: {kind}")
+        job = Job(kind, params)
+        with self.lock:
+            self._evict_expired()
+            self.jobs[job.id] = job
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+            return job
+        with job.lock:
+            if job.task is not None:
+                try:
+                    job.loop.call_soon_threadsafe(job.task.cancel)
+                except RuntimeError:
+                    # The loop has just closed: the job is finishing anyway
+                    pass
+        return job
+
+    def _run(self, job: Job):
+        handler = self.handlers[job.kind]
+        semaphore = self.semaphores.get(handler["tool"])
+        try:
+            if semaphore is not None:
+                job.progress = f"waiting for {handler['tool']} slot"
+                while not semaphore.acquire(timeout=1):
+                    job.set_progress(job.progress)
+            try:
+                job.set_progress("running")
+                job.status = RUNNING
+                job.started_at = time.time()
+                metrics.JOB_QUEUE_WAIT.labels(job.kind).observe(job.started_at - job.created_at)
+                metrics.JOBS_RUNNING.labels(job.kind).inc()
+                try:
+                    with metrics.track(f"job.{job.kind}", job_id=job.id):
+                        result = self._execute(job, handler["func"])
+                finally:
+                    metrics.JOBS_RUNNING.labels(job.kind).dec()
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            job.result = result
+            self._finish(job, DONE)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            print(f"[!] Job {job.id} ({job.kind}) failed: {e}")
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _execute(self, job: Job, func: Callable[..., Any]) -> Any:
+        """Run the handler as a task on a private loop so cancel() can interrupt it"""
+        async def call():
+            if inspect.iscoroutinefunction(func):
+                return await func(**job.params)
+            return await asyncio.to_thread(func, **job.params)
+
+        loop = asyncio.new_event_loop()
+        token = current_job.set(job)
+        try:
+            task = loop.create_task(call())
+            with job.lock:
+                job.task, job.loop = task, loop
+            if job.cancel_event.is_set():
+                task.cancel()
+            try:
+                return loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                raise JobCancelled()
+        finally:
+            with job.lock:
+                job.task = job.loop = None
+            current_job.reset(token)
+            pending = asyncio.all_tasks(loop)
+            for pending_task in pending:
+                pending_task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.progress = status
+        job.finished_at = time.time()
+
+    def _evict_expired(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and now - job.finished_at > JOB_TTL
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+job_manager = JobManager()
@@ -0,0 +1,234 @@
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+import orjson
+from flask.json.provider import JSONProvider
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always offered
+    zstandard = None
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 1400
+
+
+def _default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def loads(data) -> Any:
+    return orjson.loads(data)
+
+
+def ndjson_line(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+
+
+class OrjsonProvider(JSONProvider):
+    """Routes jsonify / request.get_json through orjson (Flask and Quart)"""
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs) -> Any:
+        return loads(s)
+
+
+# --- request bodies ---------------------------------------------------------
+
+def parse_body(raw: bytes, content_type: str = "") -> Any:
+    """
+    Decode a request body: a JSON document, or a list for NDJSON bodies (one
+    JSON value per line). Raises ValueError on malformed input.
+    """
+    if "ndjson" in (content_type or ""):
+        return list(iter_ndjson(raw.splitlines()))
+    try:
+        return loads(raw)
+    except ValueError:
+        if b"\n" not in raw.strip():
+            raise
+        # Several JSON values, one per line, sent without the NDJSON content type
+        return list(iter_ndjson(raw.splitlines()))
+
+
+def iter_ndjson(lines: Iterable[bytes]) -> Iterator[Any]:
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield loads(line)
+
+
+def parse_string_list(raw: bytes, content_type: str = "", key: str = "subdomains") -> List[str]:
+    """A list of strings from a JSON array, {key: [...]}, or NDJSON body; ValueError otherwise"""
+    data = parse_body(raw, content_type)
+    if isinstance(data, dict):
+        data = data.get(key)
+    if not isinstance(data, list) or not all(isinstance(item, str) for item in data):
+        raise ValueError(f"Body must be a JSON list of strings, {{\"{key}\": [...]}} or NDJSON strings")
+    return data
+
+
+def body_list(data: Any, key: str) -> Optional[list]:
+    """Items from either a bare list body (NDJSON) or {key: [...]}"""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        return data.get(key)
+    return None
+
+
+# --- response bodies --------------------------------------------------------
+
+def encode_ndjson(items: Iterable[Any], batch: int = 1) -> Iterator[bytes]:
+    """One NDJSON line per item, yielded in groups of `batch` lines"""
+    lines = []
+    for item in items:
+        lines.append(ndjson_line(item))
+        if len(lines) >= batch:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+
+async def aencode_ndjson(items: AsyncIterator[Any], batch: int = 1) -> AsyncIterator[bytes]:
+    lines = []
+    async for item in items:
+        lines.append(ndjson_line(item))
+        if len(lines) >= batch:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+
+def encode_json_stream(head: Dict[str, Any], key: str, items: Iterable[Any], batch: int = 1000) -> Iterator[bytes]:
+    """
+    Stream `{**head, key: [items...]}` as one JSON document without building it
+    in memory first. Same bytes a client would get from jsonify, minus the wait.
+    """
+    prefix = dumps(head)[:-1]
+    yield prefix + (b"," if len(prefix) > 1 else b"") + dumps(key) + b":["
+    first = True
+    chunk = []
+    for item in items:
+        chunk.append(dumps(item))
+        if len(chunk) >= batch:
+            yield (b"" if first else b",") + b",".join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else b",") + b",".join(chunk)
+    yield b"]}"
+
+
+async def aencode_json_stream(head: Dict[str, Any], key: str, items: AsyncIterator[Any],
+                              batch: int = 1000) -> AsyncIterator[bytes]:
+    """Async form of encode_json_stream for Quart streaming responses"""
+    prefix = dumps(head)[:-1]
+    yield prefix + (b"," if len(prefix) > 1 else b"") + dumps(key) + b":["
+    first = True
+    chunk = []
+    async for item in items:
+        chunk.append(dumps(item))
+        if len(chunk) >= batch:
+            yield (b"" if first else b",") + b",".join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else b",") + b",".join(chunk)
+    yield b"]}"
+
+
+def encode_har(entries: Iterable[Dict], creator: Dict[str, str]) -> Iterator[bytes]:
+    """Stream HAR 1.2 entries as `{"log": {..., "entries": [...]}}`, one entry per chunk"""
+    yield b'{"log":'
+    yield from encode_json_stream({"version": "1.2", "creator": creator}, "entries", entries, batch=1)
+    yield b"}"
+
+
+async def aencode_har(entries: AsyncIterator[Dict], creator: Dict[str, str]) -> AsyncIterator[bytes]:
+    yield b'{"log":'
+    async for chunk in aencode_json_stream({"version": "1.2", "creator": creator}, "entries", entries, batch=1):
+        yield chunk
+    yield b"}"
+
+
+# --- compression ------------------------------------------------------------
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick zstd (if installed) or gzip from an Accept-Encoding header"""
+    offered = set()
+    for part in (accept_encoding or "").split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            offered.add(name.lower())
+    if zstandard is not None and "zstd" in offered:
+        return "zstd"
+    if "gzip" in offered or "*" in offered:
+        return "gzip"
+    return None
+
+
+class Compressor:
+    """Incremental gzip/zstd encoder; flush() ends a block so a streamed client can decode what it has"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self.obj = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            self.obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        out = self.obj.compress(data)
+        if flush:
+            mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK if self.encoding == "zstd" else zlib.Z_SYNC_FLUSH
+            out += self.obj.flush(mode)
+        return out
+
+    def finish(self) -> bytes:
+        return self.obj.flush()
+
+
+def compress_chunks(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    if encoding is None:
+        yield from chunks
+        return
+    compressor = Compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_chunks(chunks: AsyncIterator[bytes], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    compressor = Compressor(encoding) if encoding else None
+    async for chunk in chunks:
+        data = compressor.compress(chunk) if compressor else chunk
+        if data:
+            yield data
+    if compressor:
+        yield compressor.finish()
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    compressor = Compressor(encoding)
+    return compressor.compress(body, flush=False) + compressor.finish()
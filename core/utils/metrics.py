@@ -0,0 +1,279 @@
+import contextvars
+import inspect
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterator, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Recon work ranges from milliseconds (parsing) to an hour (nmap -A)
+BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+REQUEST_SECONDS = Histogram(
+    "bughunt_request_seconds", "HTTP request latency, including streamed bodies",
+    ["route", "method", "status"], buckets=BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("bughunt_requests_in_flight", "HTTP requests being served", ["route"])
+
+STAGE_SECONDS = Histogram(
+    "bughunt_stage_seconds", "Time spent in a recon stage or pipeline stage",
+    ["stage"], buckets=BUCKETS,
+)
+STAGES_IN_FLIGHT = Gauge("bughunt_stages_in_flight", "Recon stages currently running", ["stage"])
+STAGE_ERRORS = Counter("bughunt_stage_errors_total", "Recon stages that raised", ["stage"])
+
+TOOL_INVOCATIONS = Counter("bughunt_tool_invocations_total", "External tool processes started", ["tool"])
+TOOL_EXITS = Counter("bughunt_tool_exits_total", "External tool exit codes", ["tool", "code"])
+TOOL_TIMEOUTS = Counter("bughunt_tool_timeouts_total", "External tools killed on timeout", ["tool"])
+TOOL_STDOUT_LINES = Counter("bughunt_tool_stdout_lines_total", "Lines read from tool stdout", ["tool"])
+TOOL_STDOUT_BYTES = Counter("bughunt_tool_stdout_bytes_total", "Bytes read from tool stdout", ["tool"])
+TOOL_SECONDS = Histogram("bughunt_tool_seconds", "External tool wall-clock time", ["tool"], buckets=BUCKETS)
+TOOL_SLOT_WAIT = Histogram(
+    "bughunt_tool_slot_wait_seconds", "Time spent waiting for a per-tool process slot",
+    ["tool"], buckets=BUCKETS,
+)
+TOOLS_RUNNING = Gauge("bughunt_tools_running", "External tool processes alive", ["tool"])
+
+JOB_QUEUE_WAIT = Histogram(
+    "bughunt_job_queue_seconds", "Time a background job waited for a worker and tool slot",
+    ["type"], buckets=BUCKETS,
+)
+JOBS_RUNNING = Gauge("bughunt_jobs_running", "Background jobs running", ["type"])
+
+CACHE_LOOKUPS = Counter("bughunt_cache_lookups_total", "Result cache lookups", ["name", "result"])
+
+RATE_LIMIT_WAIT = Histogram(
+    "bughunt_rate_limit_wait_seconds", "Time requests waited for a per-target budget", buckets=BUCKETS,
+)
+RATE_LIMIT_OUTCOMES = Counter(
+    "bughunt_rate_limit_outcomes_total", "Responses fed back to the per-target budgets", ["outcome"],
+)
+RATE_LIMIT_BACKOFFS = Counter("bughunt_rate_limit_backoffs_total", "Per-target budget halvings")
+
+
+# --- trace spans ---------------------------------------------------------------
+# Off unless TRACE_SPANS is set. A span started while another is current becomes
+# its child; asyncio tasks and to_thread calls inherit the current span, so a
+# request's span ends up linked to every stage and tool process it started.
+
+TRACING = os.environ.get("TRACE_SPANS", "").lower() in ("1", "true", "yes")
+TRACE_BUFFER = int(os.environ.get("TRACE_BUFFER", 10000))
+
+_current_span: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("current_span", default=None)
+_finished_spans: deque = deque(maxlen=TRACE_BUFFER)
+
+
+@contextmanager
+def span(name: str, activate: bool = True, **attributes) -> Iterator[Optional[Dict]]:
+    """
+    Record a span around a block; yields the span dict (None when tracing is off)
+    for extra attributes. Leaf spans pass activate=False so they never become the
+    parent of unrelated work sharing the context.
+    """
+    if not TRACING:
+        yield None
+        return
+
+    parent = _current_span.get()
+    record = {
+        "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "name": name,
+        "start": time.time(),
+        "duration": None,
+        "attributes": attributes,
+    }
+    token = _current_span.set(record) if activate else None
+    try:
+        yield record
+    except BaseException as e:
+        record["attributes"]["error"] = type(e).__name__
+        raise
+    finally:
+        record["duration"] = round(time.time() - record["start"], 6)
+        _finished_spans.append(record)
+        if token is not None:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Async generators can be closed from a different context
+                pass
+
+
+def current_trace_id() -> Optional[str]:
+    record = _current_span.get()
+    return record["trace_id"] if record else None
+
+
+def get_trace(trace_id: str) -> List[Dict]:
+    return sorted((s for s in _finished_spans if s["trace_id"] == trace_id), key=lambda s: s["start"])
+
+
+def recent_traces(limit: int = 50) -> List[Dict]:
+    """Root spans of the most recent traces"""
+    roots = [s for s in _finished_spans if s["parent_id"] is None]
+    return roots[-limit:][::-1]
+
+
+# --- stage timing ---------------------------------------------------------------
+
+@contextmanager
+def track(stage: str, **attributes):
+    """Time a block as `stage`: histogram, in-flight gauge, error counter and a span"""
+    STAGES_IN_FLIGHT.labels(stage).inc()
+    started = time.perf_counter()
+    try:
+        with span(stage, **attributes):
+            yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+        STAGES_IN_FLIGHT.labels(stage).dec()
+
+
+def timed(stage: str):
+    """
+    Decorator form of track() for plain functions, coroutines and async
+    generators. Async generators are timed until exhausted or closed, and the
+    wrapped generator is closed with them so tool processes are not left behind.
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @wraps(func)
+            async def agen_wrapper(*args, **kwargs):
+                agen = func(*args, **kwargs)
+                try:
+                    with track(stage):
+                        async for item in agen:
+                            yield item
+                finally:
+                    await agen.aclose()
+            return agen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# --- HTTP -----------------------------------------------------------------------
+
+def route_label(url_map, path: str, method: str) -> str:
+    """URL rule a path matches ('/jobs/<job_id>'), so label cardinality stays bounded"""
+    try:
+        rule, _ = url_map.bind("localhost").match(path, method=method, return_rule=True)
+        return rule.rule
+    except Exception:
+        return "unmatched"
+
+
+class WSGIMetrics:
+    """
+    WSGI middleware timing each request until its body iterator is closed, so
+    stream_with_context NDJSON responses are measured in full. The view and the
+    body both run inside one copied context, which keeps the request span current
+    for everything the request starts.
+    """
+
+    def __init__(self, app, url_map):
+        self.app = app
+        self.url_map = url_map
+
+    def __call__(self, environ, start_response):
+        method = environ["REQUEST_METHOD"]
+        route = route_label(self.url_map, environ.get("PATH_INFO", "/"), method)
+        status = {"code": 500}
+        context = contextvars.copy_context()
+        request_span = span(f"{method} {route}", path=environ.get("PATH_INFO", "/"))
+        record = context.run(request_span.__enter__)
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.labels(route).inc()
+
+        def start_response_wrapper(status_line, headers, exc_info=None):
+            status["code"] = int(status_line.split(" ", 1)[0])
+            if record is not None:
+                headers.append(("X-Trace-Id", record["trace_id"]))
+            return start_response(status_line, headers, exc_info)
+
+        def finish():
+            context.run(request_span.__exit__, None, None, None)
+            REQUESTS_IN_FLIGHT.labels(route).dec()
+            REQUEST_SECONDS.labels(route, method, str(status["code"])).observe(time.perf_counter() - started)
+
+        try:
+            body = context.run(self.app, environ, start_response_wrapper)
+        except BaseException:
+            finish()
+            raise
+        return self._iterate(body, context, finish)
+
+    @staticmethod
+    def _iterate(body, context, finish):
+        try:
+            iterator = iter(body)
+            while True:
+                try:
+                    chunk = context.run(next, iterator)
+                except StopIteration:
+                    break
+                yield chunk
+        finally:
+            if hasattr(body, "close"):
+                context.run(body.close)
+            finish()
+
+
+class ASGIMetrics:
+    """ASGI middleware timing each request until its last body chunk is sent"""
+
+    def __init__(self, app, url_map):
+        self.app = app
+        self.url_map = url_map
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = route_label(self.url_map, scope["path"], scope["method"])
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                trace_id = current_trace_id()
+                if trace_id:
+                    message.setdefault("headers", []).append((b"x-trace-id", trace_id.encode()))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.labels(route).inc()
+        try:
+            with span(f"{scope['method']} {route}", path=scope["path"]):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.labels(route).dec()
+            REQUEST_SECONDS.labels(route, scope["method"], str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+
+
+def render_metrics():
+    """(body, content type) for the /metrics endpoint"""
+    return generate_latest(), CONTENT_TYPE_LATEST
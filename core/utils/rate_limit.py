@@ -0,0 +1,432 @@
+# core/utils/rate_limit.py
+#
+# Shared outbound budget per target. Every in-process request and every tool run
+# that touches a program draws from the budget of its registrable domain
+# (a.b.example.co.uk -> example.co.uk). Budgets adapt with AIMD: slow start until
+# the first 429/503/timeout, then +1 req/s per second of clean traffic and a
+# halving (rate and concurrency) on each congestion signal, at most once per
+# cooldown. Tools can't be throttled mid-run, so they get an equal share of the
+# budget as command-line flags when they start (during slow start, a share of
+# at most one doubling of the current rate).
+
+import asyncio
+import ipaddress
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from core.utils import metrics
+
+ENABLED = os.environ.get("POLITE_ENABLED", "1").lower() not in ("0", "false", "no")
+START_RATE = float(os.environ.get("POLITE_RATE", 20))
+MIN_RATE = float(os.environ.get("POLITE_MIN_RATE", 1))
+MAX_RATE = float(os.environ.get("POLITE_MAX_RATE", 200))
+START_CONCURRENCY = float(os.environ.get("POLITE_CONCURRENCY", 10))
+MAX_CONCURRENCY = float(os.environ.get("POLITE_MAX_CONCURRENCY", 100))
+BURST_SECONDS = float(os.environ.get("POLITE_BURST_SECONDS", 1))
+BACKOFF = float(os.environ.get("POLITE_BACKOFF", 0.5))
+COOLDOWN = float(os.environ.get("POLITE_COOLDOWN", 2))
+# Plain errors (502/504, dropped connections) only count as congestion above this rate
+ERROR_THRESHOLD = float(os.environ.get("POLITE_ERROR_RATE", 0.5))
+ERROR_MIN_SAMPLES = 20
+ERROR_SMOOTHING = 0.1
+# Longest Retry-After honoured; a target asking for more gets this pause
+MAX_PAUSE = float(os.environ.get("POLITE_MAX_PAUSE", 300))
+# nmap's --max-rate counts probe packets, not requests
+NMAP_PACKETS_PER_REQUEST = int(os.environ.get("POLITE_NMAP_PACKETS", 10))
+IDLE_SECONDS = 3600
+MAX_BUDGETS = 10000
+
+THROTTLE_STATUSES = {429, 503}
+ERROR_STATUSES = {502, 504}
+OUTCOMES = ("ok", "throttled", "timeout", "error", "unreachable")
+# example.co.uk, example.com.au: the registrable domain keeps three labels
+SECOND_LEVEL_LABELS = {"co", "com", "net", "org", "gov", "edu", "ac", "ne", "or"}
+
+FlagBuilder = Callable[[int, int], Dict[str, int]]
+
+# How each tool's own rate options map onto a budget share (requests/s, workers).
+# "target" tools talk to the program's hosts; the others query third-party
+# sources, which get one shared budget per source instead of per target.
+TOOL_BUDGETS: Dict[str, Tuple[str, Optional[FlagBuilder]]] = {
+    "httpx": ("target", lambda rate, workers: {"-rl": rate, "-t": workers}),
+    "cero": ("target", lambda rate, workers: {"-c": workers}),
+    "subjack": ("target", lambda rate, workers: {"-t": workers}),
+    "nmap": ("target", lambda rate, workers: {"--max-rate": rate * NMAP_PACKETS_PER_REQUEST}),
+    "subfinder": ("source:subfinder", lambda rate, workers: {"-rl": rate}),
+    "gau": ("source:archives", lambda rate, workers: {"--threads": workers}),
+    "waybackurls": ("source:archives", None),
+    "shosubgo": ("source:shodan", None),
+}
+
+Targets = Union[None, str, Iterable[str]]
+
+
+def target_key(target: str) -> str:
+    """Budget key for a URL, host or IP: the registrable domain, or the address itself"""
+    host = target.strip().lower()
+    if "://" in host:
+        host = urlparse(host).hostname or ""
+    else:
+        host = host.split("/")[0].rsplit("@", 1)[-1]
+        if host.startswith("["):
+            host = host[1:].split("]")[0]
+        elif host.count(":") == 1:
+            host = host.split(":")[0]
+    host = host.strip("[]").rstrip(".")
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    labels = host.split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds: either delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_status(status: Optional[int]) -> str:
+    if status in THROTTLE_STATUSES:
+        return "throttled"
+    if status in ERROR_STATUSES:
+        return "error"
+    return "ok"
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """Outcome for a failed request; None when it says nothing about the target (cancellation)"""
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit, KeyboardInterrupt)):
+        return None
+    name = type(error).__name__
+    # Refused connections and DNS failures are dead hosts, not an overloaded one
+    if name in ("ConnectError", "ConnectionError", "ConnectionRefusedError", "gaierror"):
+        return "unreachable"
+    # Blackholed names time out on connect too; those only count through the error rate
+    if name == "ConnectTimeout":
+        return "error"
+    # httpx.TimeoutException, requests.Timeout and Playwright's TimeoutError all say "Timeout"
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)) or "Timeout" in name:
+        return "timeout"
+    return "error"
+
+
+class Budget:
+    """Token bucket plus AIMD concurrency window for one target or source"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.rate = START_RATE
+        self.concurrency = START_CONCURRENCY
+        # Slow start (double per round) until the first congestion signal sets this
+        self.threshold = MAX_RATE
+        self.tokens = max(1.0, START_RATE * BURST_SECONDS)
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.tools = 0
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+        self.error_rate = 0.0
+        self.samples = 0
+        self.counts = {outcome: 0 for outcome in OUTCOMES}
+        self.last_used = self.refilled
+
+    def share(self) -> Tuple[float, float]:
+        """Rate and concurrency left for in-process requests while tools hold shares"""
+        parts = self.tools + 1
+        return self.rate / parts, max(1.0, self.concurrency / parts)
+
+    def tool_rate(self) -> float:
+        """
+        Rate a tool starting now is sized for. In slow start that is one doubling
+        step ahead of the current rate (never past the threshold), since the tool
+        can't follow the ramp once it runs; a new target's first tool gets 2x START_RATE.
+        """
+        if self.rate < self.threshold:
+            return min(self.rate * 2, self.threshold, MAX_RATE)
+        return self.rate
+
+    def try_acquire(self) -> float:
+        """0 if a request may start now (its token and slot are taken), else seconds to wait"""
+        now = time.monotonic()
+        self.last_used = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        rate, concurrency = self.share()
+        if self.in_flight >= int(concurrency):
+            return 0.05
+        self.tokens = min(max(1.0, rate * BURST_SECONDS), self.tokens + (now - self.refilled) * rate)
+        self.refilled = now
+        if self.tokens < 1:
+            return (1 - self.tokens) / rate
+        self.tokens -= 1
+        self.in_flight += 1
+        return 0.0
+
+    def record(self, outcome: str, retry_after: Optional[float] = None):
+        now = time.monotonic()
+        self.last_used = now
+        self.counts[outcome] += 1
+        metrics.RATE_LIMIT_OUTCOMES.labels(outcome).inc()
+        if outcome == "unreachable":
+            return
+        failed = outcome != "ok"
+        self.samples += 1
+        self.error_rate += (failed - self.error_rate) * ERROR_SMOOTHING
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + min(retry_after, MAX_PAUSE))
+        if outcome in ("throttled", "timeout") or (
+                failed and self.samples >= ERROR_MIN_SAMPLES and self.error_rate > ERROR_THRESHOLD):
+            self.decrease(now)
+        elif not failed:
+            self.increase()
+
+    def increase(self):
+        if self.rate < self.threshold:
+            # Slow start: rate and window double every `rate` clean responses
+            self.concurrency = min(MAX_CONCURRENCY, self.concurrency * (1 + 1 / self.rate))
+            self.rate = min(MAX_RATE, self.rate + 1)
+        else:
+            self.rate = min(MAX_RATE, self.rate + 1 / self.rate)
+            self.concurrency = min(MAX_CONCURRENCY, self.concurrency + 1 / self.rate)
+
+    def decrease(self, now: float):
+        # A burst of failures from one overload only halves the budget once
+        if now - self.decreased_at < COOLDOWN:
+            return
+        self.decreased_at = now
+        self.rate = max(MIN_RATE, self.rate * BACKOFF)
+        self.concurrency = max(1.0, self.concurrency * BACKOFF)
+        self.threshold = self.rate
+        self.tokens = min(self.tokens, 0.0)
+        metrics.RATE_LIMIT_BACKOFFS.inc()
+
+    def to_dict(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "key": self.key,
+            "rate": round(self.rate, 2),
+            "concurrency": round(self.concurrency, 2),
+            "slow_start": self.rate < self.threshold,
+            "in_flight": self.in_flight,
+            "tools": self.tools,
+            "paused_for": round(max(0.0, self.paused_until - now), 1),
+            "error_rate": round(self.error_rate, 3),
+            "counts": dict(self.counts),
+        }
+
+
+class Ticket:
+    """Handed to the caller of Scheduler.request; report the response with observe()"""
+    __slots__ = ("status", "retry_after")
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+
+    def observe(self, status: Optional[int], headers=None):
+        self.status = status
+        if headers is not None and status in THROTTLE_STATUSES:
+            self.retry_after = retry_after_seconds(headers.get("retry-after") or headers.get("Retry-After"))
+
+
+class ToolLease:
+    """Shares held by one tool process; its flags are fixed for the life of the process"""
+
+    def __init__(self, scheduler: "Scheduler", budgets: List[Budget], command: List[str]):
+        self.scheduler = scheduler
+        self.budgets = budgets
+        self.command = command
+
+    def release(self, outcome: Optional[str] = None):
+        self.scheduler.release_tool(self, outcome)
+        self.budgets = []
+
+
+class Scheduler:
+    """
+    Process-wide registry of budgets. State is guarded by a threading lock so the
+    same budget holds across the private event loops of the sync wrappers.
+    """
+
+    def __init__(self):
+        self.budgets: Dict[str, Budget] = {}
+        self.lock = threading.Lock()
+
+    def _budget(self, key: str) -> Budget:
+        budget = self.budgets.get(key)
+        if budget is None:
+            if len(self.budgets) >= MAX_BUDGETS:
+                self._prune()
+            budget = self.budgets[key] = Budget(key)
+        return budget
+
+    def _prune(self):
+        cutoff = time.monotonic() - IDLE_SECONDS
+        for key in [k for k, b in self.budgets.items() if b.last_used < cutoff and not b.in_flight and not b.tools]:
+            del self.budgets[key]
+
+    def _try(self, key: str) -> Tuple[Budget, float]:
+        with self.lock:
+            budget = self._budget(key)
+            return budget, budget.try_acquire()
+
+    async def acquire(self, target: str) -> Optional[Budget]:
+        if not ENABLED:
+            return None
+        key = target_key(target)
+        started = time.perf_counter()
+        while True:
+            budget, wait = self._try(key)
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        metrics.RATE_LIMIT_WAIT.observe(time.perf_counter() - started)
+        return budget
+
+    def acquire_sync(self, target: str) -> Optional[Budget]:
+        if not ENABLED:
+            return None
+        key = target_key(target)
+        started = time.perf_counter()
+        while True:
+            budget, wait = self._try(key)
+            if not wait:
+                break
+            time.sleep(wait)
+        metrics.RATE_LIMIT_WAIT.observe(time.perf_counter() - started)
+        return budget
+
+    def release(self, budget: Optional[Budget], outcome: Optional[str], retry_after: Optional[float] = None):
+        if budget is None:
+            return
+        with self.lock:
+            budget.in_flight -= 1
+            if outcome is not None:
+                budget.record(outcome, retry_after)
+
+    def record(self, target: str, status: Optional[int] = None, outcome: Optional[str] = None,
+               retry_after: Optional[float] = None):
+        """Feed back a response seen outside request(), e.g. a status line in tool output"""
+        if not ENABLED:
+            return
+        with self.lock:
+            self._budget(target_key(target)).record(outcome or classify_status(status), retry_after)
+
+    @asynccontextmanager
+    async def request(self, target: str):
+        """
+        Hold one request's worth of the target's budget. Waits for a token and a
+        concurrency slot; the outcome (status via ticket.observe, or the exception
+        raised) adjusts the budget on exit.
+        """
+        budget = await self.acquire(target)
+        ticket = Ticket()
+        try:
+            yield ticket
+        except BaseException as e:
+            self.release(budget, classify_error(e))
+            raise
+        self.release(budget, classify_status(ticket.status) if ticket.status else None, ticket.retry_after)
+
+    @contextmanager
+    def request_sync(self, target: str):
+        """request() for blocking callers such as requests.get"""
+        budget = self.acquire_sync(target)
+        ticket = Ticket()
+        try:
+            yield ticket
+        except BaseException as e:
+            self.release(budget, classify_error(e))
+            raise
+        self.release(budget, classify_status(ticket.status) if ticket.status else None, ticket.retry_after)
+
+    def lease_tool(self, command: List[str], targets: Targets) -> Optional[ToolLease]:
+        """
+        Take a share of the budgets a tool run will use and return the command with
+        its rate/concurrency flags set from that share (existing values replaced).
+        A run over several targets is held to the most constrained of them.
+        """
+        spec = TOOL_BUDGETS.get(os.path.basename(command[0]))
+        if not ENABLED or spec is None or (targets is None and spec[0] == "target"):
+            return None
+        scope, flags = spec
+        if scope != "target":
+            keys = [scope]
+        else:
+            keys = sorted({target_key(t) for t in ([targets] if isinstance(targets, str) else targets) if t})
+        if not keys:
+            return None
+
+        with self.lock:
+            budgets = [self._budget(key) for key in keys]
+            for budget in budgets:
+                budget.tools += 1
+                budget.last_used = time.monotonic()
+            # Equal shares between the tools on a budget and in-process traffic
+            rate = min(b.tool_rate() / (b.tools + (1 if b.in_flight else 0)) for b in budgets)
+            workers = min(b.concurrency / (b.tools + (1 if b.in_flight else 0)) for b in budgets)
+
+        if flags is not None:
+            command = apply_flags(command, flags(max(1, int(rate)), max(1, int(workers))))
+        return ToolLease(self, budgets, command)
+
+    def release_tool(self, lease: ToolLease, outcome: Optional[str] = None):
+        with self.lock:
+            for budget in lease.budgets:
+                budget.tools -= 1
+                if outcome is not None:
+                    budget.record(outcome)
+
+    def snapshot(self) -> List[Dict]:
+        with self.lock:
+            budgets = sorted(self.budgets.values(), key=lambda b: b.last_used, reverse=True)
+            return [budget.to_dict() for budget in budgets]
+
+
+def apply_flags(command: List[str], flags: Dict[str, int]) -> List[str]:
+    """
+    Set each flag's value in a command: replaced where the flag is already given,
+    otherwise inserted right after the binary (Go's flag parser stops at the
+    first positional argument).
+    """
+    command = list(command)
+    missing = []
+    for flag, value in flags.items():
+        if flag in command[1:]:
+            index = command.index(flag, 1)
+            if index + 1 < len(command):
+                command[index + 1] = str(value)
+                continue
+        missing += [flag, str(value)]
+    command[1:1] = missing
+    return command
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
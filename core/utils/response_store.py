@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from core.utils.metrics import CACHE_LOOKUPS
+
+# Pages the native prober fetched, kept so tech_stack and capture can skip the refetch
+STORE_TTL = int(os.environ.get("RESPONSE_STORE_TTL", 900))
+STORE_MAX_BYTES = int(os.environ.get("RESPONSE_STORE_BYTES", 256 * 1024 * 1024))
+
+
+class ResponseStore:
+    """
+    In-memory LRU of probe responses keyed by host (with any port). Entries expire after
+    `ttl` seconds and the least recently used are dropped once the stored
+    bodies exceed `max_bytes`.
+    """
+
+    def __init__(self, ttl: int = STORE_TTL, max_bytes: int = STORE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, host: str, response: Dict):
+        """
+        response: {url, final_url, status_code, title, headers, body, response_time_ms},
+        plus max_bytes/truncated when the body was read up to a cap
+        """
+        entry = {**response, "host": host.lower(), "fetched_at": time.time(),
+                 "bytes": len(response.get("body") or "")}
+        with self.lock:
+            old = self.entries.pop(entry["host"], None)
+            if old is not None:
+                self.size -= old["bytes"]
+            self.entries[entry["host"]] = entry
+            self.size += entry["bytes"]
+            while self.size > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted["bytes"]
+
+    def get(self, host: str) -> Optional[Dict]:
+        with self.lock:
+            entry = self.entries.get(host.lower())
+            if entry is None:
+                return None
+            if time.time() - entry["fetched_at"] > self.ttl:
+                del self.entries[entry["host"]]
+                self.size -= entry["bytes"]
+                return None
+            self.entries.move_to_end(entry["host"])
+            return entry
+
+    def lookup(self, target: str, max_bytes: int = 0) -> Optional[Dict]:
+        """
+        The stored page for a bare host or a root URL ('https://host/'). A URL with
+        a path, query or a scheme other than the one that answered the probe misses.
+        With `max_bytes`, a body cut at a smaller cap than that misses too, so the
+        caller refetches and sees the same bytes it would have read itself.
+        """
+        if "://" in target:
+            parsed = urlparse(target)
+            if parsed.path not in ("", "/") or parsed.query or not parsed.netloc:
+                return None
+            entry = self.get(parsed.netloc)
+            if entry is not None and not entry["url"].startswith(f"{parsed.scheme}://"):
+                entry = None
+        else:
+            entry = self.get(target.strip().rstrip("/"))
+        if entry is not None and entry.get("truncated") and entry.get("max_bytes", 0) < max_bytes:
+            entry = None
+        CACHE_LOOKUPS.labels("responses", "hit" if entry else "miss").inc()
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+_store: Optional[ResponseStore] = None
+_store_lock = threading.Lock()
+
+
+def get_response_store() -> ResponseStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResponseStore()
+        return _store
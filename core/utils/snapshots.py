@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Set
+
+SNAPSHOT_DB = os.environ.get(
+    "RECON_SNAPSHOT_DB", os.path.join(tempfile.gettempdir(), "bughunt_snapshots.sqlite3")
+)
+# Hosts confirmed live more recently than this skip the httpx re-probe
+LIVE_WINDOW = int(os.environ.get("SNAPSHOT_LIVE_WINDOW", 24 * 3600))
+# Snapshots kept per (domain, kind); older ones are pruned on save
+KEEP_SNAPSHOTS = int(os.environ.get("SNAPSHOT_KEEP", 30))
+
+KINDS = ("subdomains", "live_hosts", "urls")
+
+
+def _pack(items: Iterable[str]) -> bytes:
+    return zlib.compress("\n".join(sorted(items)).encode(), 6)
+
+
+def _unpack(blob: bytes) -> Set[str]:
+    text = zlib.decompress(blob).decode()
+    return set(text.split("\n")) if text else set()
+
+
+def diff(old: Set[str], new: Set[str]) -> Dict[str, List[str]]:
+    return {"added": sorted(new - old), "removed": sorted(old - new)}
+
+
+class SnapshotStore:
+    """
+    Per-domain snapshots of recon results in SQLite. Each snapshot is the full
+    item set for one kind (subdomains, live_hosts, urls), stored sorted and
+    zlib-compressed. Live hosts also get a last-confirmed timestamp each so
+    recently confirmed hosts can skip probing.
+    """
+
+    def __init__(self, db_path: str = SNAPSHOT_DB, keep: int = KEEP_SNAPSHOTS):
+        self.db_path = db_path
+        self.keep = keep
+        self.local = threading.local()
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, domain TEXT NOT NULL, kind TEXT NOT NULL, "
+                "created_at REAL NOT NULL, count INTEGER NOT NULL, items BLOB NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS snapshots_domain ON snapshots (domain, kind, id)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS live_hosts ("
+                "domain TEXT NOT NULL, host TEXT NOT NULL, last_seen REAL NOT NULL, "
+                "PRIMARY KEY (domain, host))"
+            )
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def _meta(row) -> Dict:
+        return {"id": row[0], "domain": row[1], "kind": row[2], "created_at": row[3], "count": row[4]}
+
+    def save(self, domain: str, kind: str, items: Iterable[str]) -> Dict:
+        items = set(items)
+        created_at = time.time()
+        with self._db() as db:
+            cursor = db.execute(
+                "INSERT INTO snapshots (domain, kind, created_at, count, items) VALUES (?, ?, ?, ?, ?)",
+                (domain, kind, created_at, len(items), _pack(items)),
+            )
+            snapshot_id = cursor.lastrowid
+            db.execute(
+                "DELETE FROM snapshots WHERE domain = ? AND kind = ? AND id NOT IN ("
+                "SELECT id FROM snapshots WHERE domain = ? AND kind = ? ORDER BY id DESC LIMIT ?)",
+                (domain, kind, domain, kind, self.keep),
+            )
+        return {"id": snapshot_id, "domain": domain, "kind": kind,
+                "created_at": created_at, "count": len(items)}
+
+    def list(self, domain: str, kind: Optional[str] = None) -> List[Dict]:
+        query = "SELECT id, domain, kind, created_at, count FROM snapshots WHERE domain = ?"
+        params = [domain]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        rows = self._db().execute(query + " ORDER BY id DESC", params).fetchall()
+        return [self._meta(row) for row in rows]
+
+    def latest(self, domain: str, kind: str) -> Optional[Dict]:
+        row = self._db().execute(
+            "SELECT id, domain, kind, created_at, count FROM snapshots "
+            "WHERE domain = ? AND kind = ? ORDER BY id DESC LIMIT 1",
+            (domain, kind),
+        ).fetchone()
+        return self._meta(row) if row else None
+
+    def items(self, snapshot_id: int, domain: str, kind: str) -> Set[str]:
+        """Items of a snapshot; KeyError if it doesn't exist for this domain and kind"""
+        row = self._db().execute(
+            "SELECT items FROM snapshots WHERE id = ? AND domain = ? AND kind = ?",
+            (snapshot_id, domain, kind),
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No {kind} snapshot {snapshot_id} for {domain}")
+        return _unpack(row[0])
+
+    def mark_live(self, domain: str, hosts: Iterable[str]):
+        now = time.time()
+        with self._db() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO live_hosts (domain, host, last_seen) VALUES (?, ?, ?)",
+                [(domain, host, now) for host in hosts],
+            )
+
+    def recently_live(self, domain: str, window: int = LIVE_WINDOW) -> Dict[str, str]:
+        """host -> live URL for hosts confirmed within `window` seconds"""
+        rows = self._db().execute(
+            "SELECT host FROM live_hosts WHERE domain = ? AND last_seen >= ?",
+            (domain, time.time() - window),
+        ).fetchall()
+        return {host_name(row[0]): row[0] for row in rows}
+
+
+def host_name(live_url: str) -> str:
+    """'https://api.example.com:8443/' -> 'api.example.com'"""
+    host = live_url.split("://", 1)[-1].split("/", 1)[0]
+    return host.rsplit(":", 1)[0].lower()
+
+
+_store: Optional[SnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore()
+        return _store
@@ -0,0 +1,54 @@
+import asyncio
+from typing import AsyncIterator, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+def iter_async(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Drive an async generator from sync code (e.g. a streaming Flask response) on a private loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        try:
+            loop.run_until_complete(agen.aclose())
+        finally:
+            # Like asyncio.run: nested generators a consumer abandoned mid-`async for`
+            # and leftover tasks are closed here, before the loop goes away
+            pending = asyncio.all_tasks(loop)
+            if pending:
+                for task in pending:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+
+def iter_async_on(agen: AsyncIterator[T], loop: asyncio.AbstractEventLoop) -> Iterator[T]:
+    """
+    Drive an async generator from sync code on a long-lived loop running in
+    another thread, for generators that use state bound to that loop (a pool)
+    """
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+async def aiter_sync(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """Consume a blocking iterator from async code, one item per worker-thread hop"""
+    done = object()
+    iterator = iter(iterator)
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
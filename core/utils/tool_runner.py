@@ -0,0 +1,397 @@
+import asyncio
+import os
+import shutil
+import signal
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple, Union
+
+from core.utils import metrics
+from core.utils.jobs import report_progress
+from core.utils.rate_limit import Targets, get_scheduler
+
+# Concurrent processes allowed per binary; override with TOOL_LIMIT_<BINARY>
+DEFAULT_CONCURRENCY = {
+    "nmap": 2,
+    "python3": 2,  # ParamSpider
+    "subfinder": 4,
+    "cero": 4,
+    "shosubgo": 4,
+    "httpx": 4,
+    "gau": 4,
+    "waybackurls": 4,
+    "subjack": 2,
+    "dnsx": 4,
+}
+FALLBACK_CONCURRENCY = 8
+
+# Wall-clock timeouts in seconds; override with TOOL_TIMEOUT_<BINARY>
+DEFAULT_TIMEOUTS = {
+    "nmap": 3600,
+    "python3": 1800,
+    "gau": 1200,
+    "waybackurls": 1200,
+    "subjack": 1800,
+    # One httpx probes everything an enumeration streams into it
+    "httpx": 7200,
+}
+FALLBACK_TIMEOUT = 900
+READ_LIMIT = 1024 * 1024
+# Last stderr lines kept per run for ToolError messages, each cut to STDERR_LINE_BYTES
+STDERR_TAIL_LINES = 20
+STDERR_LINE_BYTES = 512
+
+InputData = Union[None, str, bytes, AsyncIterator[str]]
+
+
+class ToolError(Exception):
+    pass
+
+
+class ToolNotFound(ToolError):
+    pass
+
+
+class ToolTimeout(ToolError):
+    pass
+
+
+class ToolFailed(ToolError):
+    """The tool exited non-zero; carries its exit code and the tail of its stderr"""
+
+    def __init__(self, binary: str, returncode: int, stderr: str):
+        message = f"{binary} exited with code {returncode}"
+        super().__init__(f"{message}: {stderr}" if stderr else message)
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class ToolRun:
+    """Accounting for one tool invocation"""
+
+    def __init__(self, command: List[str]):
+        self.command = command
+        self.binary = os.path.basename(command[0])
+        self.returncode: Optional[int] = None
+        self.stdout_bytes = 0
+        self.stdout_lines = 0
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.timed_out = False
+        self.cancelled = False
+        self.stderr_tail: Deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+
+    @property
+    def stderr(self) -> str:
+        return "\n".join(self.stderr_tail)
+
+    def to_dict(self) -> Dict:
+        return {
+            "binary": self.binary,
+            "returncode": self.returncode,
+            "stdout_bytes": self.stdout_bytes,
+            "stdout_lines": self.stdout_lines,
+            "duration": round(self.duration, 3),
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+        }
+
+
+def _env_int(prefix: str, binary: str, default: int) -> int:
+    key = f"{prefix}_{binary.upper().replace('-', '_')}"
+    return int(os.environ.get(key, default))
+
+
+class Slot:
+    """
+    Counting semaphore for one binary with a FIFO queue of asyncio waiters. The
+    count is guarded by a threading lock and each waiter is woken on its own
+    loop, so one limit holds across the private event loops of the sync
+    wrappers without polling. A released slot is handed to the oldest waiter.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.taken = 0
+        self.waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self.lock = threading.Lock()
+
+    async def acquire(self) -> "Slot":
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.taken < self.limit and not self.waiters:
+                self.taken += 1
+                return self
+            waiter = (loop, loop.create_future())
+            self.waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self.lock:
+                queued = waiter in self.waiters
+                if queued:
+                    self.waiters.remove(waiter)
+            # Already handed over: pass it on (a cancelled future does that in _wake)
+            if not queued and not waiter[1].cancelled():
+                self.release()
+            raise
+        return self
+
+    def release(self):
+        with self.lock:
+            while self.waiters:
+                loop, future = self.waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._wake, future)
+                    return
+                except RuntimeError:
+                    # That waiter's loop has closed; try the next one
+                    continue
+            self.taken -= 1
+
+    def _wake(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class ToolSlots:
+    """Per-binary process limits, shared by every event loop in the process"""
+
+    def __init__(self):
+        self.slots: Dict[str, Slot] = {}
+        self.lock = threading.Lock()
+
+    def get(self, binary: str) -> Slot:
+        with self.lock:
+            slot = self.slots.get(binary)
+            if slot is None:
+                limit = _env_int("TOOL_LIMIT", binary, DEFAULT_CONCURRENCY.get(binary, FALLBACK_CONCURRENCY))
+                slot = self.slots[binary] = Slot(limit)
+            return slot
+
+    async def acquire(self, binary: str) -> Slot:
+        return await self.get(binary).acquire()
+
+
+tool_slots = ToolSlots()
+
+
+def _rlimit_preexec(cpu_seconds: Optional[int], memory_bytes: Optional[int]):
+    if cpu_seconds is None and memory_bytes is None:
+        return None
+
+    def apply():
+        import resource
+        if cpu_seconds is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        if memory_bytes is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+
+    return apply
+
+
+def _kill_group(proc: asyncio.subprocess.Process):
+    if proc.returncode is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def _feed(proc: asyncio.subprocess.Process, input_data: InputData):
+    try:
+        if isinstance(input_data, (str, bytes)):
+            proc.stdin.write(input_data.encode() if isinstance(input_data, str) else input_data)
+            await proc.stdin.drain()
+        else:
+            async for item in input_data:
+                proc.stdin.write(f"{item}\n".encode())
+                await proc.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        if not proc.stdin.is_closing():
+            proc.stdin.close()
+
+
+async def _drain_stderr(proc: asyncio.subprocess.Process, run: ToolRun):
+    """Keep reading stderr so the tool never blocks on it, remembering the last lines"""
+    while True:
+        try:
+            data = await proc.stderr.readline()
+        except ValueError:
+            continue
+        if not data:
+            return
+        line = data[:STDERR_LINE_BYTES].decode(errors="ignore").strip()
+        if line:
+            run.stderr_tail.append(line)
+
+
+async def stream_tool(command: List[str], input_data: InputData = None, *,
+                      timeout: Optional[float] = None, idle_timeout: Optional[float] = None,
+                      cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                      cpu_seconds: Optional[int] = None, memory_bytes: Optional[int] = None,
+                      chunked: bool = False, capture_stdout: bool = True,
+                      run: Optional[ToolRun] = None, target: Targets = None) -> AsyncIterator[Union[str, bytes]]:
+    """
+    Run an external tool and yield its stdout: stripped non-empty lines, or raw
+    byte chunks with chunked=True.
+
+    The process runs in its own process group, holds a per-binary slot for its
+    lifetime, and is killed with its children on wall-clock timeout, idle timeout
+    (no stdout for `idle_timeout` seconds) or when the consumer stops iterating.
+    A non-zero exit raises ToolFailed with the tail of the tool's stderr.
+    `input_data` may be text/bytes or an async iterator of lines fed while the
+    tool runs. Pass a ToolRun to read exit code, byte/line counts and duration.
+
+    `target` (a domain or several) puts the run on those targets' rate budgets:
+    the tool's rate/concurrency flags are set from its share when it starts,
+    and a timeout counts against the target.
+    """
+    run = run or ToolRun(command)
+    if shutil.which(command[0]) is None:
+        print(f"[!] Tool not found: {command[0]}")
+        raise ToolNotFound(command[0])
+
+    timeout = timeout if timeout is not None else _env_int(
+        "TOOL_TIMEOUT", run.binary, DEFAULT_TIMEOUTS.get(run.binary, FALLBACK_TIMEOUT)
+    )
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+
+    slot = lease = proc = feeder = stderr_reader = None
+    tool_span = span_record = None
+    try:
+        waited = time.perf_counter()
+        report_progress(f"waiting for {run.binary} slot")
+        slot = await tool_slots.acquire(run.binary)
+        metrics.TOOL_SLOT_WAIT.labels(run.binary).observe(time.perf_counter() - waited)
+        lease = get_scheduler().lease_tool(command, target)
+        if lease is not None:
+            command = run.command = lease.command
+        tool_span = metrics.span(f"tool:{run.binary}", activate=False, command=" ".join(command))
+        span_record = tool_span.__enter__()
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE if input_data is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE if capture_stdout else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            env=env,
+            limit=READ_LIMIT,
+            start_new_session=True,
+            preexec_fn=_rlimit_preexec(cpu_seconds, memory_bytes),
+        )
+        stderr_reader = asyncio.create_task(_drain_stderr(proc, run))
+        metrics.TOOL_INVOCATIONS.labels(run.binary).inc()
+        metrics.TOOLS_RUNNING.labels(run.binary).inc()
+        report_progress(f"running {run.binary}")
+        if span_record is not None:
+            span_record["attributes"]["pid"] = proc.pid
+        if input_data is not None:
+            feeder = asyncio.create_task(_feed(proc, input_data))
+
+        def wait_budget() -> Optional[float]:
+            budgets = [b for b in (
+                idle_timeout,
+                deadline - loop.time() if deadline is not None else None,
+            ) if b is not None]
+            return max(0.0, min(budgets)) if budgets else None
+
+        if capture_stdout:
+            while True:
+                try:
+                    if chunked:
+                        data = await asyncio.wait_for(proc.stdout.read(65536), wait_budget())
+                    else:
+                        try:
+                            data = await asyncio.wait_for(proc.stdout.readline(), wait_budget())
+                        except ValueError:
+                            # Line longer than READ_LIMIT; the reader has already dropped it
+                            continue
+                except asyncio.TimeoutError:
+                    run.timed_out = True
+                    raise ToolTimeout(f"{run.binary} timed out after {time.time() - run.started_at:.1f}s")
+                if not data:
+                    break
+                run.stdout_bytes += len(data)
+                if chunked:
+                    yield data
+                    continue
+                line = data.decode(errors="ignore").strip()
+                if line:
+                    run.stdout_lines += 1
+                    yield line
+
+        try:
+            await asyncio.wait_for(proc.wait(), wait_budget() if deadline is not None else None)
+        except asyncio.TimeoutError:
+            run.timed_out = True
+            raise ToolTimeout(f"{run.binary} timed out after {time.time() - run.started_at:.1f}s")
+        if feeder is not None:
+            await feeder
+        if proc.returncode != 0:
+            # Let the reader catch the last lines; a lingering child may hold stderr open
+            await asyncio.wait([stderr_reader], timeout=1)
+            raise ToolFailed(run.binary, proc.returncode, run.stderr)
+    except (asyncio.CancelledError, GeneratorExit):
+        run.cancelled = True
+        raise
+    finally:
+        for task in (feeder, stderr_reader):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if proc is not None:
+            _kill_group(proc)
+            await proc.wait()
+            run.returncode = proc.returncode
+            metrics.TOOLS_RUNNING.labels(run.binary).dec()
+        if slot is not None:
+            slot.release()
+        if lease is not None:
+            lease.release("timeout" if run.timed_out else "ok" if run.returncode == 0 else None)
+        run.duration = time.time() - run.started_at
+        if proc is not None:
+            record_run(run)
+            report_progress(f"{run.binary} exited {run.returncode} after {run.duration:.1f}s, {run.stdout_lines} lines")
+        if span_record is not None:
+            span_record["attributes"].update(run.to_dict())
+        if tool_span is not None:
+            tool_span.__exit__(None, None, None)
+        if run.timed_out or (run.returncode not in (0, None) and not run.cancelled):
+            print(f"[!] {' '.join(command)} -> {run.to_dict()}")
+            if run.stderr_tail:
+                print(f"[!] {run.binary} stderr: {run.stderr}")
+
+
+def record_run(run: ToolRun):
+    metrics.TOOL_SECONDS.labels(run.binary).observe(run.duration)
+    metrics.TOOL_STDOUT_LINES.labels(run.binary).inc(run.stdout_lines)
+    metrics.TOOL_STDOUT_BYTES.labels(run.binary).inc(run.stdout_bytes)
+    if run.timed_out:
+        metrics.TOOL_TIMEOUTS.labels(run.binary).inc()
+    if run.returncode is not None:
+        # Negative codes are signals: -9 is our own kill on timeout or cancel
+        metrics.TOOL_EXITS.labels(run.binary, str(run.returncode)).inc()
+
+
+async def run_tool(command: List[str], input_data: InputData = None, **kwargs) -> ToolRun:
+    """Run a tool to completion, discarding stdout; returns its ToolRun"""
+    run = ToolRun(command)
+    async for _ in stream_tool(command, input_data, capture_stdout=False, run=run, **kwargs):
+        pass
+    return run
+
+
+async def collect_tool(command: List[str], input_data: InputData = None, **kwargs) -> List[str]:
+    """Run a tool and return its stdout lines"""
+    return [line async for line in stream_tool(command, input_data, **kwargs)]
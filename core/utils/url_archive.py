@@ -0,0 +1,554 @@
+# core/utils/url_archive.py
+#
+# Persistent per-domain URL archive. URLs are written as immutable segment files
+# while collection runs; a segment is columnar and read through mmap, so a query
+# only touches the blocks and postings it needs:
+#
+#   hosts, paths        sorted string dictionaries in zlib blocks of BLOCK strings
+#   tails               scheme + "?query" per row, in row order (zlib blocks)
+#   host_start          uint32 first row of each host; rows are sorted by (host, path, tail)
+#   row_path, by_path   uint32 path id of each row, and row ids ordered by path
+#   exts, params        sorted term dictionaries with uint32 row postings
+#   fingerprints        sorted uint64 URL digests, for dedupe on write
+#
+# Segments are merged smallest-first once there are more than MAX_SEGMENTS.
+# Results come back in (host, path, tail) order and a cursor is the last key
+# returned, so pages stay stable while segments are added or merged.
+
+import asyncio
+import base64
+import fcntl
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+ARCHIVE_DIR = os.environ.get("URL_ARCHIVE_DIR", os.path.join(tempfile.gettempdir(), "bughunt_url_archive"))
+# URLs buffered before a segment is written
+SEGMENT_ROWS = int(os.environ.get("URL_ARCHIVE_SEGMENT_ROWS", 100_000))
+MAX_SEGMENTS = int(os.environ.get("URL_ARCHIVE_MAX_SEGMENTS", 8))
+# A collection that archived nothing isn't re-run by queries for this long
+RECOLLECT_EMPTY = int(os.environ.get("URL_ARCHIVE_RECOLLECT_EMPTY", 3600))
+MERGE_FANIN = 4
+BLOCK = 256
+BLOCK_CACHE = 64
+OPEN_ARCHIVES = 64
+MAGIC = b"URLARCH1"
+EXTENSION_RE = re.compile(r"^[a-z0-9]{1,10}$")
+LABEL_RE = re.compile(r"^[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?$")
+# Sorts after every path that starts with a given prefix
+PREFIX_END = "\U0010ffff"
+
+Key = Tuple[str, str, str]
+
+
+# --- keys -----------------------------------------------------------------------
+
+def is_hostname(name: str) -> bool:
+    """A DNS name or IPv4 address; rules out '.', '..' and anything with a path separator"""
+    name = name.rstrip(".")
+    return 0 < len(name) <= 253 and all(LABEL_RE.match(label) for label in name.split("."))
+
+
+def split_url(url: str) -> Optional[Key]:
+    """(host, path, tail) for a URL, where tail is the scheme plus any '?query'"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    if not parts.scheme or not parts.netloc:
+        return None
+    tail = f"{parts.scheme}?{parts.query}" if "?" in url else parts.scheme
+    return parts.netloc.lower(), parts.path, tail
+
+
+def join_key(key: Key) -> str:
+    host, path, tail = key
+    scheme, mark, query = tail.partition("?")
+    return f"{scheme}://{host}{path}{mark}{query}"
+
+
+def extension(path: str) -> str:
+    last = path.rsplit("/", 1)[-1]
+    if "." not in last:
+        return ""
+    ext = last.rsplit(".", 1)[1].lower()
+    return ext if EXTENSION_RE.match(ext) else ""
+
+
+def query_params(tail: str) -> List[str]:
+    query = tail.partition("?")[2]
+    return sorted(parse_qs(query, keep_blank_values=True)) if query else []
+
+
+def fingerprint(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "little")
+
+
+def encode_cursor(key: Key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Key:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    if not (isinstance(key, list) and len(key) == 3 and all(isinstance(part, str) for part in key)):
+        raise ValueError("Malformed cursor")
+    return tuple(key)
+
+
+# --- segment files --------------------------------------------------------------
+
+def _pad(length: int) -> int:
+    return (length + 7) & ~7
+
+
+def _string_blocks(items: Sequence[str]) -> Tuple[bytes, array]:
+    offsets = array("Q", [0])
+    blob = bytearray()
+    for start in range(0, len(items), BLOCK):
+        blob += zlib.compress("\n".join(items[start:start + BLOCK]).encode(), 6)
+        offsets.append(len(blob))
+    return bytes(blob), offsets
+
+
+def _postings(terms: Dict[str, array]) -> Tuple[List[str], array, array]:
+    names = sorted(terms)
+    starts, rows = array("I", [0]), array("I")
+    for name in names:
+        rows.extend(terms[name])
+        starts.append(len(rows))
+    return names, starts, rows
+
+
+def write_segment(path: str, keys: List[Key]):
+    """Write sorted, unique keys as one segment file (atomically, via rename)"""
+    hosts: List[str] = []
+    host_start = array("I")
+    paths = sorted({key[1] for key in keys})
+    path_ids = {p: i for i, p in enumerate(paths)}
+    row_path = array("I")
+    tails: List[str] = []
+    exts: Dict[str, array] = {}
+    params: Dict[str, array] = {}
+    fingerprints = array("Q")
+
+    for row, key in enumerate(keys):
+        host, url_path, tail = key
+        if not hosts or hosts[-1] != host:
+            hosts.append(host)
+            host_start.append(row)
+        row_path.append(path_ids[url_path])
+        tails.append(tail)
+        exts.setdefault(extension(url_path), array("I")).append(row)
+        for name in query_params(tail):
+            params.setdefault(name, array("I")).append(row)
+        fingerprints.append(fingerprint(join_key(key)))
+    host_start.append(len(keys))
+
+    ext_names, ext_start, ext_rows = _postings(exts)
+    param_names, param_start, param_rows = _postings(params)
+    regions: Dict[str, bytes] = {
+        "host_start": host_start.tobytes(),
+        "row_path": row_path.tobytes(),
+        "by_path": array("I", sorted(range(len(keys)), key=row_path.__getitem__)).tobytes(),
+        "ext_start": ext_start.tobytes(),
+        "ext_rows": ext_rows.tobytes(),
+        "param_start": param_start.tobytes(),
+        "param_rows": param_rows.tobytes(),
+        "fingerprints": array("Q", sorted(fingerprints)).tobytes(),
+    }
+    strings = {"hosts": hosts, "paths": paths, "tails": tails, "exts": ext_names, "params": param_names}
+    for name, items in strings.items():
+        blob, offsets = _string_blocks(items)
+        regions[f"{name}.blocks"] = blob
+        regions[f"{name}.index"] = offsets.tobytes()
+
+    columns, offset = {}, 0
+    for name, data in regions.items():
+        columns[name] = [offset, len(data)]
+        offset += _pad(len(data))
+    header = json.dumps({
+        "rows": len(keys),
+        "byteorder": sys.byteorder,
+        "block": BLOCK,
+        "created_at": time.time(),
+        "columns": columns,
+        "strings": {name: len(items) for name, items in strings.items()},
+    }).encode()
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little"))
+        f.write(header.ljust(_pad(len(header)), b" "))
+        for data in regions.values():
+            f.write(data.ljust(_pad(len(data)), b"\0"))
+    os.replace(tmp, path)
+
+
+class StringColumn:
+    """Strings in zlib blocks; a block is decompressed on first use and kept in a small LRU"""
+
+    def __init__(self, blob: memoryview, offsets: memoryview, count: int, block: int):
+        self.blob = blob
+        self.offsets = offsets
+        self.count = count
+        self.block_size = block
+        self.cache: "OrderedDict[int, List[str]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def block(self, index: int) -> List[str]:
+        with self.lock:
+            items = self.cache.get(index)
+            if items is not None:
+                self.cache.move_to_end(index)
+                return items
+        items = zlib.decompress(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode().split("\n")
+        with self.lock:
+            self.cache[index] = items
+            if len(self.cache) > BLOCK_CACHE:
+                self.cache.popitem(last=False)
+        return items
+
+    def __getitem__(self, i: int) -> str:
+        return self.block(i // self.block_size)[i % self.block_size]
+
+    def find(self, value: str) -> int:
+        """Index of `value` in a sorted column, or -1"""
+        i = bisect_left(self, value)
+        return i if i < self.count and self[i] == value else -1
+
+
+def _contains(rows, row: int) -> bool:
+    i = bisect_left(rows, row)
+    return i < len(rows) and rows[i] == row
+
+
+def _intersect(lo: int, hi: int, lists: List) -> Iterator[int]:
+    """Row ids in [lo, hi) that are in every sorted list, ascending"""
+    if not lists:
+        yield from range(lo, hi)
+        return
+    lead, *others = sorted(lists, key=len)
+    for i in range(bisect_left(lead, lo), len(lead)):
+        row = lead[i]
+        if row >= hi:
+            return
+        if all(_contains(other, row) for other in others):
+            yield row
+
+
+class Segment:
+    """Read-only view of one segment file through mmap"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:8] != MAGIC:
+            raise ValueError(f"{path} is not a URL archive segment")
+        header_length = int.from_bytes(self.mm[8:16], "little")
+        header = json.loads(self.mm[16:16 + header_length])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+        self.rows: int = header["rows"]
+        self.size = len(self.mm)
+        base = 16 + _pad(header_length)
+        view = memoryview(self.mm)
+
+        def region(name: str, fmt: Optional[str] = None) -> memoryview:
+            offset, length = header["columns"][name]
+            data = view[base + offset:base + offset + length]
+            return data.cast(fmt) if fmt else data
+
+        def strings(name: str) -> StringColumn:
+            return StringColumn(region(f"{name}.blocks"), region(f"{name}.index", "Q"),
+                                header["strings"][name], header["block"])
+
+        self.host_start = region("host_start", "I")
+        self.row_path = region("row_path", "I")
+        self.by_path = region("by_path", "I")
+        self.ext_start = region("ext_start", "I")
+        self.ext_rows = region("ext_rows", "I")
+        self.param_start = region("param_start", "I")
+        self.param_rows = region("param_rows", "I")
+        self.fingerprints = region("fingerprints", "Q")
+        self.hosts = strings("hosts")
+        self.paths = strings("paths")
+        self.tails = strings("tails")
+        self.exts = strings("exts")
+        self.params = strings("params")
+
+    def contains(self, fp: int) -> bool:
+        return _contains(self.fingerprints, fp)
+
+    def key(self, row: int) -> Key:
+        host = self.hosts[bisect_right(self.host_start, row) - 1]
+        return host, self.paths[self.row_path[row]], self.tails[row]
+
+    def keys(self) -> Iterator[Key]:
+        for h in range(len(self.hosts)):
+            host = self.hosts[h]
+            for row in range(self.host_start[h], self.host_start[h + 1]):
+                yield host, self.paths[self.row_path[row]], self.tails[row]
+
+    def _after(self, key: Key, lo: int, hi: int) -> int:
+        """First row in [lo, hi) whose key sorts after `key`"""
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(self, host: Optional[str] = None, path_prefix: Optional[str] = None,
+              ext: Optional[str] = None, param: Optional[str] = None,
+              after: Optional[Key] = None) -> Iterator[Key]:
+        """Matching keys in order; each filter narrows a row range or adds a postings list"""
+        lo, hi = 0, self.rows
+        lists = []
+        if host is not None:
+            h = self.hosts.find(host)
+            if h < 0:
+                return
+            lo, hi = self.host_start[h], self.host_start[h + 1]
+        if path_prefix is not None:
+            plo = bisect_left(self.paths, path_prefix)
+            phi = bisect_left(self.paths, path_prefix + PREFIX_END, plo)
+            if plo == phi:
+                return
+            if host is not None:
+                # Within one host, rows are ordered by path
+                lo = bisect_left(self.row_path, plo, lo, hi)
+                hi = bisect_left(self.row_path, phi, lo, hi)
+            else:
+                start = bisect_left(self.by_path, plo, key=self.row_path.__getitem__)
+                end = bisect_left(self.by_path, phi, start, key=self.row_path.__getitem__)
+                lists.append(array("I", sorted(self.by_path[start:end])))
+        for term, names, starts, rows in ((ext, self.exts, self.ext_start, self.ext_rows),
+                                          (param, self.params, self.param_start, self.param_rows)):
+            if term is None:
+                continue
+            i = names.find(term)
+            if i < 0:
+                return
+            lists.append(rows[starts[i]:starts[i + 1]])
+        if after is not None:
+            lo = self._after(after, lo, hi)
+        for row in _intersect(lo, hi, lists):
+            yield self.key(row)
+
+
+# --- archive --------------------------------------------------------------------
+
+class UrlArchive:
+    """
+    All segments of one domain's archive; new segments are picked up on each query.
+    ValueError if `domain` isn't a hostname, since it names the archive directory.
+    """
+
+    def __init__(self, domain: str, root: str = ARCHIVE_DIR):
+        if not is_hostname(domain.lower()):
+            raise ValueError(f"Invalid domain for URL archive: {domain!r}")
+        self.domain = domain
+        self.path = os.path.join(root, domain.lower().rstrip("."))
+        os.makedirs(self.path, exist_ok=True)
+        self.open: Dict[str, Segment] = {}
+        self.lock = threading.Lock()
+
+    def segments(self) -> List[Segment]:
+        with self.lock:
+            names = sorted(name for name in os.listdir(self.path) if name.endswith(".seg"))
+            for name in set(self.open) - set(names):
+                del self.open[name]
+            for name in names:
+                if name not in self.open:
+                    try:
+                        self.open[name] = Segment(os.path.join(self.path, name))
+                    except (OSError, ValueError) as e:
+                        print(f"[!] Skipping URL archive segment {name}: {e}")
+            return [self.open[name] for name in names if name in self.open]
+
+    def stats(self) -> Dict:
+        segments = self.segments()
+        return {
+            "domain": self.domain,
+            "urls": sum(s.rows for s in segments),
+            "segments": len(segments),
+            "bytes": sum(s.size for s in segments),
+        }
+
+    def mark_collected(self):
+        """Record that a full collection ran, even if it archived nothing"""
+        with open(os.path.join(self.path, ".collected"), "w") as f:
+            f.write(str(time.time()))
+
+    def collected_at(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(os.path.join(self.path, ".collected"))
+        except OSError:
+            return None
+
+    def needs_collection(self, recollect_empty: int = RECOLLECT_EMPTY) -> bool:
+        """True for an empty archive that wasn't (recently) collected into"""
+        if self.segments():
+            return False
+        collected_at = self.collected_at()
+        return collected_at is None or time.time() - collected_at > recollect_empty
+
+    def writer(self, segment_rows: int = SEGMENT_ROWS) -> "ArchiveWriter":
+        return ArchiveWriter(self, segment_rows)
+
+    @contextmanager
+    def _locked(self):
+        # Segment writes and merges are serialized across processes sharing the directory
+        with open(os.path.join(self.path, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _new_path(self) -> str:
+        return os.path.join(self.path, f"{time.time_ns():020d}-{os.getpid()}.seg")
+
+    def add_segment(self, keys: List[Key]):
+        with self._locked():
+            write_segment(self._new_path(), keys)
+            self._compact()
+
+    def _compact(self):
+        while True:
+            segments = self.segments()
+            if len(segments) <= MAX_SEGMENTS:
+                return
+            merging = sorted(segments, key=lambda s: s.rows)[:MERGE_FANIN]
+            keys, last = [], None
+            for key in heapq.merge(*(s.keys() for s in merging)):
+                if key != last:
+                    keys.append(key)
+                    last = key
+            write_segment(self._new_path(), keys)
+            for segment in merging:
+                os.remove(segment.path)
+
+    def query(self, host: Optional[str] = None, path_prefix: Optional[str] = None,
+              ext: Optional[str] = None, param: Optional[str] = None,
+              cursor: Optional[str] = None, limit: int = 1000) -> Dict:
+        """
+        A page of archived URLs matching every given filter, in (host, path) order.
+        Pass the returned next_cursor to continue; it is None on the last page.
+        Raises ValueError for a malformed cursor.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        host = host.lower() if host else None
+        ext = ext.lower().lstrip(".") if ext is not None else None
+        segments = self.segments()
+        streams = [s.query(host, path_prefix, ext, param, after) for s in segments]
+
+        urls, last, more = [], None, False
+        for key in heapq.merge(*streams):
+            if key == last:
+                continue  # the same URL in a segment that hasn't been merged yet
+            if len(urls) == limit:
+                more = True
+                break
+            urls.append(join_key(key))
+            last = key
+        return {
+            "domain": self.domain,
+            "archived": sum(s.rows for s in segments),
+            "count": len(urls),
+            "urls": urls,
+            "next_cursor": encode_cursor(last) if more else None,
+        }
+
+
+class ArchiveWriter:
+    """Buffers URLs not yet archived and writes them out as a segment every `segment_rows`"""
+
+    def __init__(self, archive: UrlArchive, segment_rows: int = SEGMENT_ROWS):
+        self.archive = archive
+        self.segment_rows = segment_rows
+        self.segments = archive.segments()
+        self.buffer: Dict[int, Key] = {}
+        self.pending: Dict[int, Key] = {}
+        self.added = 0
+        # add() runs on the event loop while flush_async() runs in a thread
+        self.lock = threading.Lock()
+
+    def add(self, url: str) -> bool:
+        """Buffer a URL; False if it is already archived or buffered"""
+        key = split_url(url)
+        if key is None:
+            return False
+        fp = fingerprint(join_key(key))
+        with self.lock:
+            if fp in self.buffer or fp in self.pending or any(s.contains(fp) for s in self.segments):
+                return False
+            self.buffer[fp] = key
+            self.added += 1
+        return True
+
+    @property
+    def full(self) -> bool:
+        return len(self.buffer) >= self.segment_rows
+
+    def flush(self):
+        with self.lock:
+            if not self.buffer:
+                return
+            self.pending, self.buffer = self.buffer, {}
+        try:
+            self.archive.add_segment(sorted(self.pending.values()))
+        finally:
+            segments = self.archive.segments()
+            with self.lock:
+                self.segments = segments
+                self.pending = {}
+
+    async def flush_async(self):
+        """flush() off the event loop; sorting and compressing a segment is CPU work"""
+        await asyncio.to_thread(self.flush)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+_archives: "OrderedDict[str, UrlArchive]" = OrderedDict()
+_archives_lock = threading.Lock()
+
+
+def get_url_archive(domain: str) -> UrlArchive:
+    domain = domain.strip().lower()
+    with _archives_lock:
+        archive = _archives.get(domain)
+        if archive is None:
+            archive = _archives[domain] = UrlArchive(domain)
+            if len(_archives) > OPEN_ARCHIVES:
+                _archives.popitem(last=False)
+        else:
+            _archives.move_to_end(domain)
+        return archive
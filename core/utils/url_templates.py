@@ -0,0 +1,38 @@
+# core/utils/url_templates.py
+#
+# Path templates: variable-looking segments (ids, dates, hashes, locales) become
+# placeholders, so /user/42 and /user/43 group together. Shared by URL
+# clustering and the crawl's per-template page budget.
+
+import re
+
+# Path segment classes used to build URL templates
+SEGMENT_PATTERNS = [
+    ("{uuid}", re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE)),
+    ("{date}", re.compile(r"^(?:\d{4}[-_.]\d{1,2}[-_.]\d{1,2}|\d{1,2}[-_.]\d{1,2}[-_.]\d{4})$")),
+    ("{int}", re.compile(r"^-?\d+$")),
+    ("{hash}", re.compile(r"^(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{16,}$", re.IGNORECASE)),
+    ("{locale}", re.compile(r"^[a-z]{2}[-_][a-z]{2}$", re.IGNORECASE)),
+]
+LOCALE_CODES = {
+    "en", "fr", "de", "es", "it", "pt", "ru", "ja", "zh", "ko", "nl", "pl", "tr", "ar",
+    "sv", "da", "fi", "nb", "cs", "hu", "el", "he", "uk", "ro", "vi", "th",
+}
+
+
+def template_segment(segment: str) -> str:
+    """Replace a variable-looking path segment with a placeholder; keeps any file extension"""
+    if not segment:
+        return segment
+    stem, dot, ext = segment.rpartition(".") if "." in segment else (segment, "", "")
+    for placeholder, pattern in SEGMENT_PATTERNS:
+        if pattern.match(stem):
+            return placeholder + dot + ext
+    if dot == "" and stem.lower() in LOCALE_CODES:
+        return "{locale}"
+    return segment
+
+
+def path_template(path: str) -> str:
+    """/user/42/en -> /user/{int}/{locale}"""
+    return "/".join(template_segment(segment) for segment in path.split("/"))
@@ -0,0 +1,187 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Sequence
+
+# CPU-bound post-processing (Wappalyzer, URL clustering, parameter extraction)
+# runs in worker processes so it neither holds the GIL on request threads nor
+# blocks the event loop. CPU_WORKERS=0 keeps everything in-process.
+#
+# A process pool can't be shared between the processes of a multi-worker server
+# (gunicorn, uvicorn --workers), so the server's cores are split between them:
+# WEB_CONCURRENCY web processes get cores // WEB_CONCURRENCY CPU workers each.
+# With a single core (or no cores to spare) everything stays inline, where the
+# pool round trip would only add overhead.
+WEB_WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+
+
+def default_cpu_workers() -> int:
+    cores = os.cpu_count() or 1
+    return cores // WEB_WORKERS if cores > 1 else 0
+
+
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", default_cpu_workers()))
+# URLs per batch sent to a worker, and the list size below which work stays inline.
+# Parsing, clustering or indexing costs ~20us per URL, so the default 3000-URL
+# collection would hold the GIL (or the event loop) for 50-75ms; a pool round
+# trip is ~1ms.
+CHUNK_SIZE = int(os.environ.get("CPU_CHUNK_SIZE", 1000))
+OFFLOAD_MIN_ITEMS = int(os.environ.get("CPU_OFFLOAD_MIN", 1000))
+# Page size from which tech detection goes to the pool: the signature engine
+# takes ~4ms on a 2KB page and ~30ms on 20KB
+OFFLOAD_MIN_BYTES = int(os.environ.get("CPU_OFFLOAD_MIN_BYTES", 4096))
+
+# Imported once in the fork server, so every worker starts with compiled regexes;
+# a module's warm_worker() (e.g. loading the Wappalyzer DB) runs in each worker
+WARM_MODULES = [
+    "core.recon.url_collector",
+    "core.recon.param_discovery",
+    "core.recon.tech_stack",
+]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _warm_worker():
+    for name in WARM_MODULES:
+        warm = getattr(importlib.import_module(name), "warm_worker", None)
+        if warm is not None:
+            warm()
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+def get_cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared process pool, started and warmed on first use; None when disabled"""
+    global _pool
+    if CPU_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            if sys.platform.startswith("linux"):
+                # Forking from a threaded server is unsafe; fork from a clean, preloaded server instead
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(WARM_MODULES)
+            else:
+                context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=context,
+                                        initializer=_warm_worker)
+            # Start every worker now rather than on the first big request
+            for _ in range(CPU_WORKERS):
+                _pool.submit(_ready)
+            print(f"[+] Started {CPU_WORKERS} CPU workers")
+        return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor):
+    """Drop a pool whose worker died (e.g. OOM-killed) so the next call starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_cpu_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def should_offload(count: int, threshold: int = OFFLOAD_MIN_ITEMS) -> bool:
+    """Whether `count` items (or bytes, with threshold=OFFLOAD_MIN_BYTES) are worth a pool round trip"""
+    return CPU_WORKERS > 0 and count >= threshold
+
+
+def run_cpu(func: Callable, *args) -> Any:
+    """Run func(*args) in a worker process and wait; inline if the pool is off or broken"""
+    pool = get_cpu_pool()
+    if pool is None:
+        return func(*args)
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool:
+        print(f"[!] CPU worker died, running {func.__name__} inline")
+        _discard_pool(pool)
+        return func(*args)
+
+
+async def run_cpu_async(func: Callable, *args) -> Any:
+    """Awaitable run_cpu; falls back to a thread so the event loop is never blocked"""
+    pool = get_cpu_pool()
+    if pool is None:
+        return await asyncio.to_thread(func, *args)
+    try:
+        return await asyncio.wrap_future(pool.submit(func, *args))
+    except BrokenProcessPool:
+        print(f"[!] CPU worker died, running {func.__name__} in a thread")
+        _discard_pool(pool)
+        return await asyncio.to_thread(func, *args)
+
+
+def chunk_batches(items: Sequence[str], size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Newline-joined batches: one string pickles far smaller and faster than a list of them"""
+    for i in range(0, len(items), size):
+        yield "\n".join(items[i:i + size])
+
+
+def map_chunks(func: Callable[[str], Any], items: Sequence[str], size: int = CHUNK_SIZE) -> List[Any]:
+    """
+    Apply func to newline-joined batches of `items` across the pool and return the
+    per-batch results in input order, ready for the caller to merge.
+    """
+    pool = get_cpu_pool()
+    if pool is None:
+        return [func(batch) for batch in chunk_batches(items, size)]
+    futures = [pool.submit(func, batch) for batch in chunk_batches(items, size)]
+    try:
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        print("[!] CPU worker died, finishing the batches inline")
+        _discard_pool(pool)
+        return [func(batch) for batch in chunk_batches(items, size)]
+
+
+async def map_chunks_async(func: Callable[[str], Any], lines: AsyncIterator[str],
+                           size: int = CHUNK_SIZE) -> AsyncIterator[Any]:
+    """
+    map_chunks over a stream: lines are batched as they arrive and each full
+    batch goes to the pool while the producer keeps running. Yields per-batch
+    results in input order. A stream that ends before OFFLOAD_MIN_ITEMS lines is
+    processed inline.
+    """
+    pending: "deque[asyncio.Future]" = deque()
+    batch: List[str] = []
+    total = 0
+    try:
+        async for line in lines:
+            batch.append(line)
+            total += 1
+            if len(batch) < size or total < OFFLOAD_MIN_ITEMS:
+                continue
+            pending.append(asyncio.ensure_future(run_cpu_async(func, "\n".join(batch))))
+            batch = []
+            # Keep the pool busy without queueing the whole stream in memory
+            while len(pending) > max(1, CPU_WORKERS) * 2:
+                yield await pending.popleft()
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+    if batch:
+        text = "\n".join(batch)
+        yield await run_cpu_async(func, text) if should_offload(total) else func(text)
@@ -1,81 +1,149 @@
-from flask import Flask, request, jsonify
-from functools import wraps
-from core.recon.subdomain_enum import enumerate_subdomains
-from core.recon.url_collector import collect_urls
-from core.recon.param_discovery import discover_all_parameters
+from flask import Flask, Response, request, jsonify, stream_with_context
+from core.api import (
+    HOME_MESSAGE, ApiError, archive_query, capture_urls, crawl_request, domains_from_body, hosts_from_body,
+    job_result_body, job_submission, load_body, live_window, max_urls, param_page, param_query, port_scan_request,
+    port_scan_result, rate_limit_report, recon_stages, register_jobs, require_domain, require_job,
+    since_base, snapshot_kind, takeover_subdomains, tech_stack_item, tech_stack_result, trace_report, wants_archive,
+    wants_clusters, wants_ndjson, wants_stream
+)
+from core.recon.subdomain_enum import enumerate_subdomains, iter_live_subdomains
+from core.recon.url_collector import collect_urls, query_url_archive
+from core.recon.param_discovery import query_parameters
 from core.recon.subdomain_takeover import check_takeover
-from core.utils.burp_proxy import capture_data as burp_capture
-from core.recon.port_scanner import scan_ports
-from ast import literal_eval
+from core.utils.burp_proxy import HAR_CREATOR, iter_capture_batch, iter_crawl
+from core.recon.port_scanner import scan_ports, scan_hosts
 import logging
 import os
-from core.recon.tech_stack import detect_tech_stack
+from core.recon.tech_stack import detect_tech_stack, iter_tech_stack_batch
+from core.recon.pipeline import iter_recon
+from core.recon.delta import subdomain_delta, url_delta
+from core.recon.batch import iter_collect_urls_batch, iter_subdomains_batch
+from core.utils.snapshots import get_snapshot_store
+from core.utils.jobs import job_manager
+from core.utils.metrics import WSGIMetrics, render_metrics
+from core.utils.workers import get_cpu_pool
+from core.utils.jsonio import (
+    MIN_COMPRESS_BYTES, NDJSON_MIMETYPE, OrjsonProvider, compress_body, compress_chunks,
+    encode_har, encode_json_stream, encode_ndjson, negotiate_encoding
+)
 
 app = Flask(__name__)
+# Times every request until its body is closed, so NDJSON streams are measured in full
+app.wsgi_app = WSGIMetrics(app.wsgi_app, app.url_map)
+app.json = OrjsonProvider(app)
 
+# Long-running scans can also be submitted as background jobs via /jobs
+register_jobs(job_manager)
+
+
+def read_body():
+    """Request body as JSON, or a list of values for NDJSON bodies; None if malformed"""
+    return load_body(request.get_data(cache=False), request.content_type)
+
+
+def stream_response(chunks, mimetype=NDJSON_MIMETYPE):
+    """Stream encoded chunks, gzip/zstd-compressed when the client accepts it"""
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    response = Response(stream_with_context(compress_chunks(chunks, encoding)), mimetype=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def ndjson_response(items, batch=1):
+    return stream_response(encode_ndjson(items, batch))
+
+
+def list_response(head, key, items):
+    """A list-shaped result as NDJSON if asked for, otherwise {**head, key: [...]} streamed in chunks"""
+    if wants_ndjson(request.args, request.headers):
+        return ndjson_response(items, batch=500)
+    return stream_response(encode_json_stream(head, key, items), mimetype="application/json")
+
+
+@app.errorhandler(ApiError)
+def api_error(e):
+    return (jsonify(e.body) if isinstance(e.body, dict) else e.body), e.status
+
+
+@app.after_request
+def compress_response(response):
+    if (response.is_streamed or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers):
+        return response
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    data = response.get_data()
+    if encoding and len(data) >= MIN_COMPRESS_BYTES:
+        response.set_data(compress_body(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+    return response
 
-def async_to_sync(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        return asyncio.run(f(*args, **kwargs))
-    return wrapper
 
 @app.route("/")
 def home():
-    return "BugHunt-GPT API is live!"
+    return HOME_MESSAGE
 
 @app.route("/port_scan", methods=["POST"])
 def port_scan():
+    targets, domain = port_scan_request(read_body())
     try:
-        data = request.get_json(force=True)
-        domain = data.get("domain")
-
-        if not domain:
-            return jsonify({"error": "Missing 'domain' in request body"}), 400
+        if targets is not None:
+            # One nmap run for every target, one NDJSON line per host as it completes
+            return ndjson_response(scan_hosts(targets))
 
-        results = scan_ports(domain)
-        return jsonify({
-            "domain": domain,
-            "open_ports": results,
-            "count": len(results)
-        }), 200
+        return jsonify(port_scan_result(domain, scan_ports(domain))), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-# Add this route above the main block
+
 @app.route("/tech_stack", methods=["GET"])
 def tech_stack():
-    target = request.args.get("domain")
-    if not target:
-        return jsonify({"error": "Missing 'domain' parameter"}), 400
-    
+    target = require_domain(request.args, {"error": "Missing 'domain' parameter"})
     try:
-        results = detect_tech_stack(target)
-        
-        if "error" in results:
-            return jsonify({
-                "domain": target,
-                "error": results["error"]
-            }), 500
-        
-        return jsonify({
-            "domain": target,
-            "final_url": results["url"],
-            "technologies": results["technologies"],
-            "categories": results["categories"],
-            "technology_count": len(results["technologies"])
-        }), 200
-        
+        body, status = tech_stack_result(target, detect_tech_stack(target))
+        return jsonify(body), status
+
     except Exception as e:
         return jsonify({
             "error": f"Unexpected error: {str(e)}"
         }), 500
-        
+
+@app.route("/tech_stack", methods=["POST"])
+def tech_stack_batch():
+    hosts = hosts_from_body(read_body())
+    # One NDJSON line per host, in completion order
+    return ndjson_response(tech_stack_item(result) for result in iter_tech_stack_batch(hosts))
+
+@app.route("/capture", methods=["POST"])
+def capture_batch():
+    return ndjson_response(iter_capture_batch(capture_urls(read_body())))
+
+@app.route("/capture/crawl", methods=["POST"])
+def capture_crawl():
+    url, options, har = crawl_request(read_body(), request.args)
+    # HAR is one JSON document, streamed entry by entry; NDJSON is one entry per line
+    entries = iter_crawl(url, **options)
+    if har:
+        return stream_response(encode_har(entries, HAR_CREATOR), mimetype="application/json")
+    return ndjson_response(entries)
+
 @app.route("/subdomains")
 def get_subdomains():
-    domain = request.args.get("domain")
-    if not domain:
-        return "No domain provided", 400
+    domain = require_domain(request.args, "No domain provided")
+
+    if wants_stream(request.args, request.headers):
+        # NDJSON mode: one live host per line, as soon as httpx confirms it
+        return ndjson_response({"subdomain": host, "domain": domain} for host in iter_live_subdomains(domain))
+
+    if "since" in request.args:
+        # Delta mode: live hosts added/removed since a snapshot ("latest" or an id)
+        base = since_base(domain, "live_hosts", request.args["since"])
+        try:
+            return jsonify(subdomain_delta(domain, live_window=live_window(request.args), base=base))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
 
     try:
         result = enumerate_subdomains(domain)
@@ -87,52 +155,66 @@ def get_subdomains():
     except Exception as e:
         return str(e), 500
 
+@app.route("/subdomains/batch", methods=["POST"])
+def subdomains_batch():
+    # One NDJSON line per domain, as soon as the group it ran in finishes
+    return ndjson_response(iter_subdomains_batch(domains_from_body(read_body())))
+
 @app.route("/takeover", methods=['POST'])
 def run_takeover():
+    subdomains, empty = takeover_subdomains(request.get_data(cache=False), request.content_type)
+    if empty is not None:
+        return jsonify(empty), 200
     try:
-        raw_data = request.data.decode('utf-8')
-        if not raw_data or raw_data=='[]':
-            return jsonify({
-                "subdomains": [],
-                "results": [],
-                "message": "No subdomains provided"
-            }), 200
-        subdomains = literal_eval(raw_data)
-
-        if not isinstance(subdomains, list) or not all(isinstance(i, str) for i in subdomains):
-            return "Input must be a Python-style list of strings", 400
-        if not subdomains:
-            return jsonify({
-                "subdomains": [],
-                "results": [],
-                "message": "Empty subdomain list received"
-            }), 200
-        takeover_results = check_takeover(subdomains)
-        return str(takeover_results), 200
+        takeover_results = check_takeover(subdomains, engine=request.args.get("engine", "subjack"))
+        return list_response({"count": len(takeover_results)}, "results", takeover_results)
 
     except Exception as e:
         return str(e), 500
 
 @app.route("/collect_urls")
 def collect_urls_endpoint():
-    domain = request.args.get("domain")
-    if not domain:
-        return jsonify({"error": "No domain provided"}), 400
+    domain = require_domain(request.args)
+
+    if "since" in request.args:
+        # Delta mode over the full URL set: only URLs added/removed since a snapshot
+        base = since_base(domain, "urls", request.args["since"])
+        try:
+            return jsonify(url_delta(domain, base=base))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    if wants_archive(request.args):
+        # Every URL ever collected for the domain, filtered and paged with next_cursor
+        query = archive_query(domain, request.args)
+        try:
+            return jsonify(query_url_archive(domain, **query))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
 
     try:
-        # Use the safe version that handles async/sync contexts
-        urls = collect_urls(domain)
-        return jsonify({"collected_urls": urls})
+        if wants_clusters(request.args):
+            # Path-template clusters with counts and example URLs
+            return list_response({}, "clusters", collect_urls(domain, clusters=True))
+
+        return list_response({}, "collected_urls", collect_urls(domain))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/collect_urls/batch", methods=["POST"])
+def collect_urls_batch():
+    domains = domains_from_body(read_body())
+    return ndjson_response(iter_collect_urls_batch(domains, max_urls(request.args)))
+
+
 @app.route("/param_discovery")
 def param_discovery():
-    domain = request.args.get("domain")
+    domain = require_domain(request.args, {"status": "error", "message": "No domain provided"})
     try:
-        urls = discover_all_parameters(domain)
-        return jsonify({"status": "ok", "found_urls": (urls)})
+        # Paginated, filterable view over the parameter index
+        query = param_query(request.args)
+        return list_response(*param_page(domain, query, query_parameters(domain, **query)))
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -140,6 +222,64 @@ def param_discovery():
         }), 500
 
 
+@app.route("/recon")
+def recon():
+    domain = require_domain(request.args)
+    # Every stage's results interleaved as NDJSON events
+    return ndjson_response(iter_recon(domain, recon_stages(request.args)))
+
+
+@app.route("/snapshots")
+def list_snapshots():
+    domain = require_domain(request.args)
+    kind = snapshot_kind(request.args)
+    return jsonify({"domain": domain, "snapshots": get_snapshot_store().list(domain, kind)})
+
+
+@app.route("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
+@app.route("/traces")
+def traces():
+    return jsonify(trace_report(request.args))
+
+
+@app.route("/rate_limits")
+def rate_limits():
+    return jsonify(rate_limit_report(request.args))
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    kind, params = job_submission(read_body())
+    try:
+        job = job_manager.submit(kind, params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"job_id": job.id, "status": job.status}), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    return jsonify(require_job(job_manager.get(job_id)).to_dict()), 200
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    body, status = job_result_body(job_manager.get(job_id))
+    return jsonify(body), status
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    return jsonify(require_job(job_manager.cancel(job_id)).to_dict()), 200
+
+
 # @app.route('/sub_json_to_list', methods=['POST'])
 # def json_to_list():
 #     try:
@@ -152,5 +292,7 @@ def param_discovery():
 #         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
+    # One server process: start and warm the CPU pool now, not on the first big request
+    get_cpu_pool()
     port = int(os.environ.get("PORT", 8000))
     app.run(host="0.0.0.0", port=port)
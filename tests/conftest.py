@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Tests import the app's packages (core.*) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stores are configured at import time: keep them out of the real /tmp/bughunt_* ones
+_STATE = tempfile.mkdtemp(prefix="bughunt_tests_")
+os.environ.setdefault("RECON_CACHE_DB", os.path.join(_STATE, "cache.sqlite3"))
+os.environ.setdefault("RECON_SNAPSHOT_DB", os.path.join(_STATE, "snapshots.sqlite3"))
+os.environ.setdefault("URL_ARCHIVE_DIR", os.path.join(_STATE, "url_archive"))
+os.environ.setdefault("RECON_CACHE_DISABLED", "1")
+
+
+@pytest.fixture
+def stub_tools(tmp_path, monkeypatch):
+    """Install shell scripts under recon tool names, ahead of anything real on PATH"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+
+    def install(name: str, script: str) -> str:
+        path = bin_dir / name
+        path.write_text("#!/bin/sh\n" + script)
+        path.chmod(0o755)
+        return str(path)
+
+    return install
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from core.recon import batch
+from core.recon.batch import SharedProbe, collect_urls_batch, enumerate_subdomains_batch, normalize_domains, owners
+
+
+@pytest.fixture
+def subdomain_tools(stub_tools, tmp_path):
+    """Stub enumerators that overlap across roots, and an httpx that logs every name it probes"""
+    probed = tmp_path / "probed.txt"
+    stub_tools("subfinder", 'while [ $# -gt 0 ]; do [ "$1" = -dL ] && file=$2; shift; done\n'
+                            'while read d; do echo "www.$d"; echo shared.api.example.com; done < "$file"\n')
+    stub_tools("cero", 'while read d; do echo "WWW.$d."; done\n')
+    stub_tools("shosubgo", 'echo "dead.$2"\n')
+    stub_tools("httpx", f'while read n; do echo "$n" >> "{probed}"\n'
+                        'case "$n" in dead.*) ;; *) echo "https://$n [200]";; esac; done\n')
+    return probed
+
+
+def run_batch(domains):
+    async def collect():
+        return {result["domain"]: result async for result in enumerate_subdomains_batch(domains)}
+
+    return asyncio.run(collect())
+
+
+def test_shared_probe_first_claim_wins():
+    async def claims():
+        shared = SharedProbe()
+        loop = asyncio.get_running_loop()
+        first, second = loop.create_future(), loop.create_future()
+        assert shared.claim("a.example.com", first) is None
+        assert shared.claim("a.example.com", second) is first
+        assert shared.claim("b.example.com", second) is None
+
+    asyncio.run(claims())
+
+
+def test_domains_group_by_root():
+    assert normalize_domains([" Example.com.", "api.example.com", "example.com", "", "b.org"]) == [
+        "example.com", "api.example.com", "b.org"
+    ]
+    assert owners("a.api.example.com", {"example.com", "api.example.com", "b.org"}) == [
+        "api.example.com", "example.com"
+    ]
+    assert owners("example.org", {"example.com"}) == []
+
+
+def test_names_under_overlapping_groups_are_probed_once(subdomain_tools, monkeypatch):
+    # One group per root, so api.example.com and example.com run side by side
+    monkeypatch.setattr(batch, "GROUP_SIZE", 1)
+    results = run_batch(["example.com", "api.example.com"])
+
+    probed = subdomain_tools.read_text().split()
+    assert len(probed) == len(set(probed))
+    assert probed.count("shared.api.example.com") == 1
+    assert set(probed) == {"www.example.com", "dead.example.com", "shared.api.example.com",
+                           "www.api.example.com", "dead.api.example.com"}
+    # Whichever group probed the shared name, both roots get its result
+    assert results["example.com"]["subdomains"] == ["https://shared.api.example.com", "https://www.example.com"]
+    assert results["api.example.com"]["subdomains"] == [
+        "https://shared.api.example.com", "https://www.api.example.com"
+    ]
+    assert results["example.com"]["count"] == 2
+    assert results["example.com"]["error"] is None
+
+
+def test_one_group_assigns_names_to_every_root(subdomain_tools):
+    results = run_batch(["api.example.com", "example.com", "example.com"])
+    probed = subdomain_tools.read_text().split()
+    assert len(probed) == len(set(probed))
+    assert results["example.com"]["subdomains"] == [
+        "https://shared.api.example.com", "https://www.api.example.com", "https://www.example.com"
+    ]
+    assert results["api.example.com"]["subdomains"] == [
+        "https://shared.api.example.com", "https://www.api.example.com"
+    ]
+
+
+def test_failing_prober_does_not_block_borrowers(subdomain_tools, stub_tools, monkeypatch):
+    monkeypatch.setattr(batch, "GROUP_SIZE", 1)
+    stub_tools("httpx", "cat > /dev/null\necho https://www.example.com [200]\nexit 2\n")
+    results = run_batch(["example.com", "api.example.com"])
+    assert results["example.com"]["subdomains"] == ["https://www.example.com"]
+    assert results["api.example.com"]["subdomains"] == []
+
+
+def test_url_batch_assigns_urls_by_host(stub_tools):
+    stub_tools("gau", "while read d; do echo \"https://$d/a?x=1\"; echo \"https://www.$d/b\"; done\n")
+    stub_tools("waybackurls", "cat > /dev/null\necho https://other.test/c\necho https://example.com/a?x=2\n")
+
+    async def collect():
+        return {r["domain"]: r async for r in collect_urls_batch(["example.com", "api.example.com"], max_urls=10)}
+
+    results = asyncio.run(collect())
+    # A URL under nested roots counts for both
+    assert sorted(results["api.example.com"]["collected_urls"]) == [
+        "https://api.example.com/a?x=1", "https://www.api.example.com/b"
+    ]
+    assert sorted(results["example.com"]["collected_urls"]) == [
+        "https://api.example.com/a?x=1", "https://example.com/a?x={1,2}",
+        "https://www.api.example.com/b", "https://www.example.com/b",
+    ]
@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+import pytest
+
+from core.utils import cache
+from core.utils.cache import TieredCache, cached
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = TieredCache(str(tmp_path / "cache.sqlite3"), max_entries=8)
+    monkeypatch.setattr(cache, "_cache", store)
+    monkeypatch.setattr(cache, "CACHE_DISABLED", False)
+    return store
+
+
+def age(store, seconds):
+    """Pretend every entry was stored `seconds` earlier, in both tiers"""
+    for key, (stored_at, payload, shared) in list(store.memory.items()):
+        store.memory[key] = (stored_at - seconds, payload, shared)
+    with store._db() as db:
+        db.execute("UPDATE cache SET stored_at = stored_at - ?", (seconds,))
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_hits_until_ttl_then_recomputes(store):
+    calls = []
+
+    @cached("square", ttl=60)
+    def square(n):
+        calls.append(n)
+        return {"n": n, "square": n * n}
+
+    assert square(3) == {"n": 3, "square": 9}
+    assert square(3) == square(n=3)
+    assert calls == [3]
+
+    age(store, 61)
+    square(3)
+    assert calls == [3, 3]
+
+
+def test_hits_are_private_copies(store):
+    @cached("hosts", ttl=60)
+    def hosts(domain):
+        return {"hosts": ["a." + domain, "b." + domain]}
+
+    first = hosts("example.com")
+    first["domain"] = "example.com"
+    first["hosts"].pop()
+    # Neither the caller of the miss nor of a hit can change what the next caller sees
+    second = hosts("example.com")
+    assert second == {"hosts": ["a.example.com", "b.example.com"]}
+    second["hosts"].clear()
+    assert hosts("example.com") == {"hosts": ["a.example.com", "b.example.com"]}
+
+
+def test_codec_results_decode_per_hit_unless_shared(store):
+    class Box:
+        def __init__(self, items):
+            self.items = items
+
+    @cached("boxed", ttl=60, encode=lambda box: box.items, decode=Box)
+    def boxed(n):
+        return Box(list(range(n)))
+
+    @cached("shared", ttl=60, encode=lambda box: box.items, decode=Box, share=True)
+    def shared(n):
+        return Box(list(range(n)))
+
+    first = boxed(3)
+    first.items.append(99)
+    assert boxed(3).items == [0, 1, 2]
+    assert boxed(3) is not boxed(3)
+    assert shared(3) is shared(3)
+
+
+def test_stale_value_served_while_refreshing(store):
+    calls = []
+
+    @cached("version", ttl=10, stale_ttl=100)
+    def version(name):
+        calls.append(name)
+        return len(calls)
+
+    assert version("x") == 1
+    age(store, 20)
+    # Stale: the old value comes back at once and a refresh runs in the background
+    assert version("x") == 1
+    assert wait_for(lambda: len(calls) == 2)
+    assert wait_for(lambda: version("x") == 2)
+
+    age(store, 200)
+    assert version("x") == 3
+
+
+def test_stale_async_value_refreshes_on_background_loop(store):
+    calls = []
+
+    @cached("async_version", ttl=10, stale_ttl=100)
+    async def version(name):
+        calls.append(name)
+        return len(calls)
+
+    assert asyncio.run(version("x")) == 1
+    age(store, 20)
+    assert asyncio.run(version("x")) == 1
+    assert wait_for(lambda: len(calls) == 2)
+    assert wait_for(lambda: asyncio.run(version("x")) == 2)
+
+
+def test_sqlite_tier_survives_a_new_memory_tier(store, tmp_path):
+    calls = []
+
+    @cached("persisted", ttl=60)
+    def persisted(n):
+        calls.append(n)
+        return [n, (n, n)]
+
+    assert persisted(2) == [2, [2, 2]]
+    # A restart: same database, empty memory
+    cache._cache = TieredCache(store.db_path, max_entries=8)
+    assert persisted(2) == [2, [2, 2]]
+    assert calls == [2]
+    assert len(cache._cache.memory) == 1
+
+
+def test_lru_evicts_to_sqlite(store):
+    for n in range(20):
+        store.set(f"k{n}", n)
+    assert len(store.memory) == store.max_entries
+    assert "k0" not in store.memory
+    assert store.get("k0")[1] == 0
+
+
+def test_skips_error_and_unserialisable_results(store):
+    calls = []
+
+    @cached("flaky", ttl=60, cache_if=lambda result: "error" not in result)
+    def flaky(n):
+        calls.append(n)
+        return {"error": "boom"} if len(calls) == 1 else {"ok": n}
+
+    @cached("opaque", ttl=60)
+    def opaque():
+        calls.append("opaque")
+        return object()
+
+    assert flaky(1) == {"error": "boom"}
+    assert flaky(1) == {"ok": 1}
+    assert flaky(1) == {"ok": 1}
+    opaque()
+    opaque()
+    assert calls == [1, 1, "opaque", "opaque"]
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from playwright.async_api import async_playwright
+
+from core.utils import burp_proxy
+from core.utils.burp_proxy import BrowserPool, HAR_CREATOR, _har_text, crawl, url_template
+from core.utils.jsonio import encode_har
+from core.utils.url_templates import path_template
+
+PAGES = {
+    "/": '<a href="/item/1">1</a><a href="/item/2">2</a><a href="/item/3">3</a>'
+         '<a href="/item/4">4</a><a href="/item/5">5</a><a href="/spa">spa</a>'
+         '<a href="/logo.png">logo</a><a href="http://elsewhere.invalid/">off-site</a>',
+    "/item/1": "item", "/item/2": "item", "/item/3": "item", "/item/4": "item", "/item/5": "item",
+    # Never goes network-idle (a long poll) and only renders its link from script
+    "/spa": "<div id=app></div><script>fetch('/poll');"
+            "setTimeout(() => { document.getElementById('app').innerHTML = '<a href=\"/late\">late</a>' }, 200)"
+            "</script>",
+    "/late": "late",
+}
+
+
+class Site(BaseHTTPRequestHandler):
+    seen = []
+
+    def do_GET(self):
+        self.seen.append(self.path)
+        if self.path == "/poll":
+            time.sleep(10)
+        body = f"<html><body>{PAGES.get(self.path, 'not found')}</body></html>".encode()
+        self.send_response(200 if self.path in PAGES else 404)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    Site.seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Site)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def chromium_error():
+    """None if a headless Chromium can be launched here, else why not"""
+    async def probe():
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch(headless=True)
+            await browser.close()
+
+    try:
+        asyncio.run(probe())
+    except Exception as e:
+        return str(e).strip().splitlines()[0]
+    return None
+
+
+def test_url_template_groups_ids_and_parameter_names():
+    assert path_template("/user/42/en/2024-01-02/a.php") == "/user/{int}/{locale}/{date}/a.php"
+    assert url_template("HTTPS://Example.com/item/7?b=2&a=1") == "https://example.com/item/{int}?a&b"
+    assert url_template("https://example.com/item/8?a=9&b=") == url_template("https://example.com/item/7?b=2&a=1")
+
+
+def test_har_text_caps_and_encodes_bodies():
+    text = _har_text(b"hello world", "text/html", 5)
+    assert text == {"_truncated": True, "text": "hello"}
+    binary = _har_text(b"\x89PNG", "image/png", 100)
+    assert binary["encoding"] == "base64" and not binary["_truncated"]
+
+
+def test_encode_har_is_one_json_document():
+    entries = [{"request": {"url": "https://example.com/"}}, {"request": {"url": "https://example.com/a"}}]
+    har = json.loads(b"".join(encode_har(iter(entries), HAR_CREATOR)))
+    assert har["log"]["version"] == "1.2"
+    assert har["log"]["creator"] == HAR_CREATOR
+    assert har["log"]["entries"] == entries
+
+
+def test_crawl_follows_links_on_pages_that_never_go_idle(site, monkeypatch):
+    reason = chromium_error()
+    if reason:
+        pytest.skip(f"Chromium unavailable: {reason}")
+    monkeypatch.setattr(burp_proxy, "CRAWL_SETTLE_TIMEOUT", 1000)
+
+    async def run():
+        pool = await BrowserPool(size=1).start()
+        try:
+            return [entry async for entry in crawl(f"{site}/", pool, max_pages=20, max_depth=2)]
+        finally:
+            await pool.close()
+
+    entries = asyncio.run(run())
+    documents = {entry["request"]["url"][len(site):]: entry for entry in entries
+                 if entry["_resourceType"] == "document"}
+
+    assert documents["/"]["response"]["status"] == 200
+    assert "/spa" in documents
+    # The SPA's link only exists after its script ran, and its long poll never let it go idle
+    assert "/late" in Site.seen
+    # Three pages per path template, no static assets, nothing off-site
+    assert len([path for path in set(Site.seen) if path.startswith("/item/")]) == burp_proxy.CRAWL_PER_TEMPLATE
+    assert "/logo.png" not in Site.seen
+    assert all(entry["request"]["url"].startswith(site) for entry in entries)
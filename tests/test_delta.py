@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from core.api import ApiError, since_base
+from core.recon import delta
+from core.recon.delta import _delta, resolve_since, subdomain_delta_async, url_delta_async
+from core.utils.snapshots import SnapshotStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / "snapshots.sqlite3"), keep=3)
+
+
+def test_resolve_since(store):
+    assert resolve_since(store, "example.com", "urls", None) == (None, set())
+    assert resolve_since(store, "example.com", "urls", "") == (None, set())
+    assert resolve_since(store, "example.com", "urls", "latest") == (None, set())
+
+    first = store.save("example.com", "urls", {"https://example.com/a"})
+    second = store.save("example.com", "urls", {"https://example.com/b"})
+    store.save("example.com", "live_hosts", {"https://example.com"})
+    assert resolve_since(store, "example.com", "urls", "latest") == (second["id"], {"https://example.com/b"})
+    assert resolve_since(store, "example.com", "urls", str(first["id"])) == (first["id"], {"https://example.com/a"})
+    assert resolve_since(store, "example.com", "urls", first["id"]) == (first["id"], {"https://example.com/a"})
+
+    # A snapshot id only resolves for its own domain and kind
+    with pytest.raises(KeyError):
+        resolve_since(store, "other.com", "urls", first["id"])
+    with pytest.raises(KeyError):
+        resolve_since(store, "example.com", "live_hosts", first["id"])
+    with pytest.raises(ValueError):
+        resolve_since(store, "example.com", "urls", "yesterday")
+
+
+def test_delta_saves_a_snapshot_and_diffs_against_the_base(store):
+    first = _delta("example.com", "urls", None, set(), {"a", "b"}, store)
+    assert first["since"] is None
+    assert (first["added"], first["removed"], first["count"]) == (["a", "b"], [], 2)
+
+    base_id, base = resolve_since(store, "example.com", "urls", "latest")
+    assert base_id == first["snapshot"]
+    second = _delta("example.com", "urls", base_id, base, {"b", "c"}, store)
+    assert second["since"] == first["snapshot"]
+    assert (second["added"], second["removed"]) == (["c"], ["a"])
+    assert store.items(second["snapshot"], "example.com", "urls") == {"b", "c"}
+
+
+def test_empty_run_keeps_the_previous_snapshot(store):
+    saved = store.save("example.com", "urls", {"a"})
+    result = _delta("example.com", "urls", saved["id"], {"a"}, set(), store)
+    assert result == {"domain": "example.com", "snapshot": None, "since": saved["id"], "count": 0,
+                      "added": [], "removed": []}
+    assert store.latest("example.com", "urls")["id"] == saved["id"]
+    # Nothing to lose on a first run, so an empty result is recorded
+    assert _delta("other.com", "urls", None, set(), set(), store)["snapshot"] is not None
+
+
+def test_old_snapshots_are_pruned(store):
+    ids = [store.save("example.com", "urls", {str(n)})["id"] for n in range(5)]
+    assert [s["id"] for s in store.list("example.com", "urls")] == ids[:1:-1]
+    with pytest.raises(KeyError):
+        store.items(ids[0], "example.com", "urls")
+
+
+def test_url_delta_since_latest(store, monkeypatch):
+    runs = iter([
+        ["https://example.com/a?x=1", "https://example.com/logo.png", "https://example.com/b#top"],
+        ["https://example.com/b", "https://example.com/c"],
+    ])
+
+    async def url_tools(domain):
+        for url in next(runs):
+            yield url
+
+    monkeypatch.setattr(delta, "stream_tools_concurrently", url_tools)
+    first = asyncio.run(url_delta_async("example.com", store=store))
+    assert first["added"] == ["https://example.com/a?x=1", "https://example.com/b"]
+    second = asyncio.run(url_delta_async("example.com", store=store))
+    assert (second["since"], second["added"], second["removed"]) == (
+        first["snapshot"], ["https://example.com/c"], ["https://example.com/a?x=1"]
+    )
+
+
+def test_subdomain_delta_skips_recently_live_hosts(store, monkeypatch):
+    probed = []
+
+    async def names(domain):
+        return {"a.example.com", "b.example.com", "c.example.com"}
+
+    async def probe(subdomains, target=None):
+        async for name in subdomains:
+            probed.append(name)
+            if name != "c.example.com":
+                yield f"https://{name}"
+
+    monkeypatch.setattr(delta, "run_tools_concurrently", names)
+    monkeypatch.setattr(delta, "probe_live", probe)
+    store.mark_live("example.com", ["http://a.example.com"])
+    base = store.save("example.com", "live_hosts", {"http://a.example.com", "https://old.example.com"})
+
+    result = asyncio.run(subdomain_delta_async("example.com", store=store))
+    assert sorted(probed) == ["b.example.com", "c.example.com"]
+    assert (result["names"], result["probed"], result["reused"]) == (3, 2, 1)
+    assert result["since"] == base["id"]
+    assert result["added"] == ["https://b.example.com"]
+    assert result["removed"] == ["https://old.example.com"]
+    assert store.latest("example.com", "subdomains")["count"] == 3
+
+    # With a zero window every name is probed again; a.example.com now answers on https only
+    probed.clear()
+    result = asyncio.run(subdomain_delta_async("example.com", live_window=-1, store=store))
+    assert sorted(probed) == ["a.example.com", "b.example.com", "c.example.com"]
+    assert (result["added"], result["removed"]) == (["https://a.example.com"], ["http://a.example.com"])
+
+
+def test_since_base_maps_bad_references_to_api_errors():
+    with pytest.raises(ApiError) as missing:
+        since_base("example.com", "urls", "999999")
+    assert missing.value.status == 404
+    with pytest.raises(ApiError) as malformed:
+        since_base("example.com", "urls", "last-week")
+    assert malformed.value.status == 400
+    assert since_base("never-scanned.example", "urls", "latest") == (None, set())
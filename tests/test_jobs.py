@@ -0,0 +1,126 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from core.utils.jobs import CANCELLED, DONE, FAILED, RUNNING, JobManager, report_progress
+from core.utils.tool_runner import stream_tool
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child of ours may linger as a zombie until it is reaped
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=4, tool_limits={"stub": 1})
+    yield manager
+    for job in list(manager.jobs.values()):
+        manager.cancel(job.id)
+    manager.executor.shutdown(wait=True)
+
+
+def test_submit_runs_job_and_reports_status(manager):
+    async def add(a, b):
+        report_progress("adding")
+        return a + b
+
+    manager.register("add", add)
+    manager.register("mul", lambda a, b: a * b)
+    added = manager.submit("add", {"a": 2, "b": 3})
+    multiplied = manager.submit("mul", {"a": 2, "b": 3})
+
+    assert wait_for(lambda: added.finished_at and multiplied.finished_at)
+    assert (added.status, added.result) == (DONE, 5)
+    assert (multiplied.status, multiplied.result) == (DONE, 6)
+    assert manager.get(added.id).to_dict()["status"] == DONE
+
+    with pytest.raises(ValueError):
+        manager.submit("missing", {})
+
+
+def test_failed_job_keeps_error(manager):
+    async def boom():
+        raise RuntimeError("no luck")
+
+    manager.register("boom", boom)
+    job = manager.submit("boom", {})
+    assert wait_for(lambda: job.finished_at)
+    assert (job.status, job.error) == (FAILED, "no luck")
+
+
+def test_cancel_running_job_kills_its_tool(manager):
+    pids = []
+
+    async def scan():
+        command = ["sh", "-c", "sleep 60 & echo $!; wait"]
+        async for line in stream_tool(command, timeout=120):
+            pids.append(int(line))
+        return "finished"
+
+    manager.register("scan", scan)
+    job = manager.submit("scan", {})
+    assert wait_for(lambda: pids and job.progress == "running sh")
+    assert job.status == RUNNING and alive(pids[0])
+
+    started = time.time()
+    manager.cancel(job.id)
+    assert wait_for(lambda: job.status == CANCELLED, timeout=5)
+    assert time.time() - started < 5
+    assert job.result is None
+    # The tool's whole process group went with it, grandchildren included
+    assert wait_for(lambda: not alive(pids[0]), timeout=5)
+
+
+def test_tool_limit_queues_jobs(manager):
+    running = []
+    ran = []
+    peak = []
+    release = threading.Event()
+
+    async def hold(n):
+        running.append(n)
+        ran.append(n)
+        peak.append(len(running))
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        running.remove(n)
+        return n
+
+    manager.register("hold", hold, tool="stub")
+    first = manager.submit("hold", {"n": 1})
+    second = manager.submit("hold", {"n": 2})
+    assert wait_for(lambda: first.status == RUNNING)
+    time.sleep(0.2)
+    assert second.status != RUNNING
+    assert second.progress == "waiting for stub slot"
+
+    # A job still waiting for its slot is cancelled without ever running
+    manager.cancel(second.id)
+    assert wait_for(lambda: second.status == CANCELLED)
+    third = manager.submit("hold", {"n": 3})
+    release.set()
+    assert wait_for(lambda: first.finished_at and third.finished_at)
+    assert (first.status, third.status) == (DONE, DONE)
+    assert max(peak) == 1
+    assert ran == [1, 3]
@@ -0,0 +1,126 @@
+import asyncio
+import gzip
+import zlib
+
+import orjson
+import pytest
+import zstandard
+
+import main
+from core.utils.jsonio import (
+    MIN_COMPRESS_BYTES, acompress_chunks, aencode_json_stream, compress_body, compress_chunks, encode_json_stream,
+    negotiate_encoding
+)
+
+ITEMS = [{"url": f"https://example.com/p/{n}?id={n}", "tags": {"a"}} for n in range(2500)]
+
+
+def decoder(encoding):
+    """Incremental decoder for one stream: returns a function from compressed chunk to plain bytes"""
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress
+    return zlib.decompressobj(31).decompress
+
+
+async def aiter(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.parametrize("head", [{}, {"count": 2500, "domain": "example.com"}])
+@pytest.mark.parametrize("items,batch", [(ITEMS, 1000), (ITEMS, 1), (ITEMS[:3], 1000), ([], 1000)])
+def test_json_stream_matches_whole_document(head, items, batch):
+    expected = {**head, "results": [{**item, "tags": ["a"]} for item in items]}
+    chunks = list(encode_json_stream(head, "results", items, batch=batch))
+    assert orjson.loads(b"".join(chunks)) == expected
+    assert len(chunks) == 2 + -(-len(items) // batch)
+
+    async def collect():
+        return [chunk async for chunk in aencode_json_stream(head, "results", aiter(items), batch=batch)]
+
+    assert asyncio.run(collect()) == chunks
+
+
+@pytest.mark.parametrize("header,encoding", [
+    ("gzip, deflate, br", "gzip"),
+    ("zstd, gzip", "zstd"),
+    ("gzip;q=0.5, zstd;q=0", "gzip"),
+    ("ZSTD", "zstd"),
+    ("*", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("", None),
+    (None, None),
+])
+def test_negotiate_encoding(header, encoding):
+    assert negotiate_encoding(header) == encoding
+
+
+def test_zstd_falls_back_to_gzip_when_not_installed(monkeypatch):
+    monkeypatch.setattr("core.utils.jsonio.zstandard", None)
+    assert negotiate_encoding("zstd, gzip") == "gzip"
+    assert negotiate_encoding("zstd") is None
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_streamed_chunks_decode_as_they_arrive(encoding):
+    chunks = list(encode_json_stream({"count": len(ITEMS)}, "results", ITEMS, batch=500))
+    decode = decoder(encoding)
+    received = b""
+    # Every compressed chunk is flushed, so a client can decode each one before the stream ends
+    for plain, compressed in zip(chunks, compress_chunks(iter(chunks), encoding)):
+        received += decode(compressed)
+        assert received.endswith(plain)
+    assert orjson.loads(received)["count"] == len(ITEMS)
+
+    async def collect():
+        return [chunk async for chunk in acompress_chunks(aiter(chunks), encoding)]
+
+    decode = decoder(encoding)
+    assert b"".join(decode(chunk) for chunk in asyncio.run(collect())) == b"".join(chunks)
+
+
+def test_uncompressed_chunks_pass_through():
+    chunks = [b"a", b"b"]
+    assert list(compress_chunks(iter(chunks), None)) == chunks
+
+    async def collect():
+        return [chunk async for chunk in acompress_chunks(aiter(chunks), None)]
+
+    assert asyncio.run(collect()) == chunks
+
+
+def test_compress_body_round_trip():
+    body = orjson.dumps(ITEMS, default=list)
+    assert gzip.decompress(compress_body(body, "gzip")) == body
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(compress_body(body, "zstd")) == body
+    assert len(compress_body(body, "zstd")) < len(body) // 5
+
+
+@pytest.fixture
+def client(monkeypatch):
+    urls = [item["url"] for item in ITEMS]
+    monkeypatch.setattr(main, "collect_urls", lambda domain, **kwargs: iter(urls))
+    return main.app.test_client(), urls
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_list_endpoint_streams_compressed_json(client, encoding):
+    client, urls = client
+    response = client.get("/collect_urls?domain=example.com", headers={"Accept-Encoding": encoding})
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert orjson.loads(decoder(encoding)(response.get_data())) == {"collected_urls": urls}
+
+
+def test_whole_json_responses_compress_above_threshold(client, monkeypatch):
+    client, urls = client
+    response = client.get("/jobs/unknown", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 404
+    assert len(response.get_data()) < MIN_COMPRESS_BYTES
+    assert "Content-Encoding" not in response.headers
+
+    monkeypatch.setattr(main, "rate_limit_report", lambda args: {"urls": urls})
+    response = client.get("/rate_limits", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert orjson.loads(gzip.decompress(response.get_data())) == {"urls": urls}
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from core.api import MAX_PARAM_PAGE, param_query
+from core.recon.param_discovery import ParamIndex, _index_batch
+
+URLS = [
+    "https://example.com/search?q=a&page=1",
+    "https://example.com/search?q=b&page=1",
+    "https://example.com/search?q=a&sort=asc",
+    "https://example.com/api/items?id=1",
+    "https://example.com/api/items?id=2&q=c",
+    "https://example.com/static/app.js",
+]
+
+
+def build():
+    index = ParamIndex()
+    for url in URLS:
+        index.add(url)
+    return index
+
+
+def round_trip(index):
+    return ParamIndex.from_dict(json.loads(json.dumps(index.to_dict())))
+
+
+def test_round_trip_keeps_queries_and_value_counts():
+    index = build()
+    loaded = round_trip(index)
+    assert loaded.query() == index.query()
+    assert loaded.query(param="q", path_prefix="/search") == index.query(param="q", path_prefix="/search")
+    assert loaded.param_map() == index.param_map()
+    assert loaded.param_stats("q") == {"param": "q", "count": 4, "distinct_values": 3}
+
+    # Value sets came back too, so later additions count distinct values the same way
+    for target in (index, loaded):
+        target.add("https://example.com/search?q=a&page=9")
+        target.add("https://example.com/search?q=z")
+    assert loaded.query() == index.query()
+    assert loaded.param_stats("q")["distinct_values"] == 4
+
+
+def test_batches_match_single_adds():
+    batched = ParamIndex()
+    batched.add_batch(_index_batch("\n".join(URLS[:3])))
+    batched.add_batch(_index_batch("\n".join(URLS[2:])))
+    assert batched.query() == build().query()
+    assert batched.param_map() == build().param_map()
+
+
+def test_query_pages():
+    index = build()
+    page = index.query(param="q", offset=1, limit=2)
+    assert page["matched"] == 4
+    assert page["urls"] == [URLS[1], URLS[2]]
+    assert [row["param"] for row in index.query(min_count=2)["params"]] == ["q", "id", "page"]
+
+
+def test_param_query_clamps_paging():
+    args = param_query(MultiDict({"offset": "-5", "limit": "-1"}))
+    assert (args["offset"], args["limit"]) == (0, 1)
+    args = param_query(MultiDict({"limit": str(MAX_PARAM_PAGE * 10)}))
+    assert (args["offset"], args["limit"]) == (0, MAX_PARAM_PAGE)
+
+
+def test_frozen_index_rejects_writes():
+    index = build().freeze()
+    with pytest.raises(RuntimeError):
+        index.add("https://example.com/?x=1")
+    with pytest.raises(RuntimeError):
+        index.add_batch(_index_batch(URLS[0]))
+    assert round_trip(index).add("https://example.com/?x=1")
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from core.recon import pipeline
+from core.recon.pipeline import Artifact, ReconPipeline, iter_recon, resolve_stages
+
+HOSTS = ["a.example.com", "b.example.com", "c.example.com"]
+
+
+def test_artifact_fans_out_every_item_to_every_subscriber():
+    async def run():
+        artifact = Artifact("hosts")
+        seen = {"early": [], "late": []}
+
+        async def consume(name):
+            async for item in artifact.subscribe():
+                seen[name].append(item)
+
+        early = asyncio.create_task(consume("early"))
+        await artifact.put(1)
+        await asyncio.sleep(0)
+        # The early subscriber already has the first item before anything else is put
+        assert seen["early"] == [1]
+        await artifact.put(2)
+        late = asyncio.create_task(consume("late"))
+        await artifact.put(3)
+        await artifact.close()
+        await asyncio.wait_for(asyncio.gather(early, late), 1)
+        after = [item async for item in artifact.subscribe()]
+        return seen, after
+
+    seen, after = asyncio.run(run())
+    assert seen == {"early": [1, 2, 3], "late": [1, 2, 3]}
+    assert after == [1, 2, 3]
+
+
+@pytest.mark.parametrize("requested,stages", [
+    (None, ["subdomains", "takeover", "tech_stack", "collect_urls", "param_discovery"]),
+    (["param_discovery"], ["collect_urls", "param_discovery"]),
+    (["tech_stack", "takeover"], ["subdomains", "takeover", "tech_stack"]),
+    (["subdomains", "subdomains"], ["subdomains"]),
+])
+def test_resolve_stages_adds_dependencies_in_order(requested, stages):
+    assert resolve_stages(requested) == stages
+
+
+def test_resolve_stages_rejects_unknown():
+    with pytest.raises(ValueError):
+        resolve_stages(["ports"])
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Stub every stage's data source; records how often and with what each was called"""
+    calls = {"enumerations": 0, "takeover_batches": [], "analyzed": [], "url_runs": 0, "checked": asyncio.Event()}
+
+    async def live_subdomains(domain):
+        calls["enumerations"] += 1
+        for host in HOSTS:
+            yield host
+            # Downstream stages must get going before enumeration finishes
+            await asyncio.wait_for(calls["checked"].wait(), 2)
+
+    async def detect_takeovers(batch):
+        calls["takeover_batches"].append(list(batch))
+        calls["checked"].set()
+        return [{"subdomain": host, "vulnerable": host == "b.example.com"} for host in batch]
+
+    async def analyze_page(url, html, headers):
+        calls["analyzed"].append(url)
+        return {"technologies": ["nginx"]}
+
+    async def url_tools(domain):
+        calls["url_runs"] += 1
+        for url in ["https://example.com/a?x=1", "https://example.com/a?x=2", "https://example.com/b.css"]:
+            yield url
+
+    monkeypatch.setattr(pipeline, "TAKEOVER_BATCH", 1)
+    monkeypatch.setattr(pipeline, "stream_live_subdomains", live_subdomains)
+    monkeypatch.setattr(pipeline, "detect_takeovers_async", detect_takeovers)
+    monkeypatch.setattr(pipeline, "stored_page", lambda host: (f"https://{host}/", "<html></html>", {}))
+    monkeypatch.setattr(pipeline, "analyze_page_async", analyze_page)
+    monkeypatch.setattr(pipeline, "stream_tools_concurrently", url_tools)
+    return calls
+
+
+def run_pipeline(stages=None):
+    async def collect():
+        return [event async for event in ReconPipeline("example.com", stages).run()]
+
+    return asyncio.run(collect())
+
+
+def items(events, stage):
+    return [event["item"] for event in events if event["stage"] == stage and "item" in event]
+
+
+def test_live_hosts_are_enumerated_once_for_every_consumer(stages):
+    events = run_pipeline()
+    assert stages["enumerations"] == 1
+    assert stages["url_runs"] == 1
+    assert items(events, "subdomains") == HOSTS
+    assert stages["takeover_batches"] == [[host] for host in HOSTS]
+    assert [result["subdomain"] for result in items(events, "takeover")] == HOSTS
+    assert sorted(result["domain"] for result in items(events, "tech_stack")) == HOSTS
+    # Pages come from the response store, not a second fetch
+    assert sorted(stages["analyzed"]) == [f"https://{host}/" for host in HOSTS]
+    assert items(events, "collect_urls") == ["https://example.com/a?x={1,2}"]
+    [params] = items(events, "param_discovery")
+    assert params["total_urls"] == 2
+    assert [row["param"] for row in params["params"]] == ["x"]
+    done = [event["stage"] for event in events if event.get("done")]
+    assert sorted(done) == sorted(pipeline.DEFAULT_STAGES)
+    # The first takeover result streams out before the last live host is found
+    first_takeover = next(i for i, event in enumerate(events) if event["stage"] == "takeover")
+    last_host = max(i for i, event in enumerate(events) if event["stage"] == "subdomains" and "item" in event)
+    assert first_takeover < last_host
+
+
+def test_only_requested_stages_emit_events(stages):
+    events = run_pipeline(["takeover"])
+    # subdomains runs to feed takeover, but its hosts aren't streamed to the client
+    assert {event["stage"] for event in events} == {"takeover"}
+    assert len(items(events, "takeover")) == 3
+    assert stages["url_runs"] == 0
+
+
+def test_failing_stage_reports_error_and_others_finish(stages, monkeypatch):
+    async def broken(batch):
+        stages["checked"].set()
+        raise RuntimeError("resolver down")
+
+    monkeypatch.setattr(pipeline, "detect_takeovers_async", broken)
+    events = run_pipeline(["takeover", "tech_stack"])
+    assert {"stage": "takeover", "done": True, "error": "resolver down"} in events
+    assert sorted(result["domain"] for result in items(events, "tech_stack")) == HOSTS
+    assert {"stage": "tech_stack", "done": True} in events
+
+
+def test_iter_recon_is_a_sync_generator(stages):
+    events = list(iter_recon("example.com", ["collect_urls"]))
+    assert events == [
+        {"stage": "collect_urls", "item": "https://example.com/a?x={1,2}"},
+        {"stage": "collect_urls", "done": True},
+    ]
@@ -0,0 +1,68 @@
+import asyncio
+import xml.etree.ElementTree as ET
+
+from core.recon import port_scanner
+from core.recon.port_scanner import format_port, stream_hosts
+
+HOST = """<host><status state="up" reason="syn-ack"/>
+<address addr="10.0.0.{n}" addrtype="ipv4"/>
+<hostnames><hostname name="h{n}.example.test" type="user"/><hostname name="ptr{n}.example.test" type="PTR"/></hostnames>
+<ports><port protocol="tcp" portid="80"><state state="open" reason="syn-ack"/>
+<service name="http" product="nginx" version="1.18"/></port>
+<port protocol="tcp" portid="22"><state state="closed" reason="reset"/><service name="ssh"/></port></ports>
+</host>
+<taskprogress task="Service scan" percent="{n}"/>
+"""
+
+
+def stub_nmap(tmp_path, monkeypatch, hosts):
+    """An nmap on PATH that prints an XML report for `hosts` hosts in small writes"""
+    report = ('<?xml version="1.0"?><nmaprun scanner="nmap">'
+              + "".join(HOST.format(n=n) for n in range(hosts)) + "<runstats/></nmaprun>\n")
+    (tmp_path / "report.xml").write_text(report)
+    nmap = tmp_path / "nmap"
+    nmap.write_text(f'#!/bin/sh\ncat > /dev/null\ndd if="{tmp_path / "report.xml"}" bs=97 2>/dev/null\n')
+    nmap.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}:/usr/bin:/bin")
+
+
+def test_stream_hosts_parses_records(tmp_path, monkeypatch):
+    stub_nmap(tmp_path, monkeypatch, hosts=3)
+
+    async def collect():
+        return [host async for host in stream_hosts(["h0.example.test"])]
+
+    hosts = asyncio.run(collect())
+    assert [host["target"] for host in hosts] == ["h0.example.test", "h1.example.test", "h2.example.test"]
+    first = hosts[0]
+    assert first["address"] == "10.0.0.0"
+    assert first["hostnames"] == ["h0.example.test", "ptr0.example.test"]
+    assert first["status"] == "up"
+    assert [format_port(port) for port in first["ports"]] == ["80/tcp open http nginx 1.18", "22/tcp closed ssh"]
+
+
+def test_finished_hosts_leave_the_tree(tmp_path, monkeypatch):
+    stub_nmap(tmp_path, monkeypatch, hosts=2000)
+    roots = []
+
+    class Parser(ET.XMLPullParser):
+        def read_events(self):
+            for event, elem in super().read_events():
+                if event == "start" and not roots:
+                    roots.append(elem)
+                yield event, elem
+
+    monkeypatch.setattr(port_scanner.ET, "XMLPullParser", Parser)
+    sizes = []
+
+    async def collect():
+        count = 0
+        async for _ in stream_hosts(["h0.example.test"]):
+            count += 1
+            sizes.append(len(roots[0]))
+        return count
+
+    assert asyncio.run(collect()) == 2000
+    # <nmaprun> only holds what the current 64 KB read parsed, not all 4000 children
+    assert max(sizes) < 400
+    assert len(roots[0]) == 0
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from core.utils import rate_limit
+from core.utils.rate_limit import (
+    BACKOFF, COOLDOWN, MAX_RATE, START_CONCURRENCY, START_RATE, TOOL_BUDGETS, Budget, Scheduler,
+    apply_flags, classify_error, target_key
+)
+
+
+def test_slow_start_grows_until_first_congestion():
+    budget = Budget("example.com")
+    for _ in range(int(START_RATE)):
+        budget.record("ok")
+    # One round of clean responses doubles the rate in slow start
+    assert budget.rate == pytest.approx(START_RATE * 2)
+    assert budget.concurrency > START_CONCURRENCY
+    assert budget.to_dict()["slow_start"]
+
+
+def test_throttle_halves_once_per_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    budget = Budget("example.com")
+    budget.rate, budget.concurrency = 40.0, 16.0
+
+    budget.record("throttled")
+    assert (budget.rate, budget.concurrency) == (40 * BACKOFF, 16 * BACKOFF)
+    assert budget.threshold == budget.rate and not budget.to_dict()["slow_start"]
+
+    # The rest of the same burst doesn't halve again
+    budget.record("timeout")
+    assert budget.rate == 40 * BACKOFF
+
+    now[0] += COOLDOWN + 0.1
+    budget.record("throttled")
+    assert budget.rate == 40 * BACKOFF * BACKOFF
+
+
+def test_congestion_avoidance_grows_additively():
+    budget = Budget("example.com")
+    budget.rate = budget.threshold = 10.0
+    for _ in range(10):
+        budget.record("ok")
+    # About +1 req/s per `rate` clean responses once out of slow start
+    assert budget.rate == pytest.approx(11.0, abs=0.1)
+
+
+def test_errors_only_back_off_above_threshold():
+    budget = Budget("example.com")
+    for _ in range(rate_limit.ERROR_MIN_SAMPLES):
+        budget.record("ok")
+        budget.record("unreachable")
+    rate = budget.rate
+    budget.record("error")
+    assert budget.rate >= rate
+    for _ in range(30):
+        budget.record("error")
+    assert budget.rate < rate
+
+
+def test_share_splits_between_tools_and_requests():
+    budget = Budget("example.com")
+    budget.rate, budget.concurrency = 30.0, 9.0
+    assert budget.share() == (30.0, 9.0)
+    budget.tools = 2
+    assert budget.share() == (10.0, 3.0)
+    budget.concurrency = 2.0
+    assert budget.share()[1] == 1.0
+
+
+def test_tool_rate_is_at_most_one_doubling():
+    budget = Budget("example.com")
+    assert budget.tool_rate() == START_RATE * 2
+    budget.threshold = START_RATE * 1.5
+    assert budget.tool_rate() == START_RATE * 1.5
+    budget.rate = budget.threshold = 12.0
+    assert budget.tool_rate() == 12.0
+    budget.rate, budget.threshold = MAX_RATE - 1, MAX_RATE
+    assert budget.tool_rate() == MAX_RATE
+
+
+@pytest.mark.parametrize("binary", sorted(TOOL_BUDGETS))
+def test_apply_flags_for_each_tool(binary):
+    scope, flags = TOOL_BUDGETS[binary]
+    if flags is None:
+        return
+    wanted = flags(7, 3)
+    command = [binary, "-silent", "example.com"]
+    applied = apply_flags(command, wanted)
+    # New flags go right after the binary, before any positional argument
+    assert applied[0] == binary
+    assert applied[-2:] == ["-silent", "example.com"]
+    for flag, value in wanted.items():
+        assert applied[applied.index(flag) + 1] == str(value)
+
+    # Values the caller already gave are replaced, not duplicated
+    existing = [binary, *[part for flag in wanted for part in (flag, "999")], "example.com"]
+    replaced = apply_flags(existing, wanted)
+    assert len(replaced) == len(existing)
+    for flag, value in wanted.items():
+        assert replaced.count(flag) == 1
+        assert replaced[replaced.index(flag) + 1] == str(value)
+
+
+def test_lease_tool_sizes_from_current_rate():
+    scheduler = Scheduler()
+    first = scheduler.lease_tool(["httpx", "-silent"], "a.example.com")
+    assert first.command[first.command.index("-rl") + 1] == str(int(START_RATE * 2))
+
+    # A second tool on the same target splits the budget with the first
+    second = scheduler.lease_tool(["httpx", "-silent"], ["b.example.com"])
+    assert second.command[second.command.index("-rl") + 1] == str(int(START_RATE * 2 / 2))
+    assert second.command[second.command.index("-t") + 1] == str(int(START_CONCURRENCY / 2))
+
+    first.release("timeout")
+    second.release("ok")
+    budget = scheduler.budgets["example.com"]
+    assert budget.tools == 0
+    assert budget.threshold == START_RATE * BACKOFF
+
+    # Third-party sources share one budget whatever the target
+    lease = scheduler.lease_tool(["subfinder", "-d", "other.org"], "other.org")
+    assert lease.budgets[0].key == "source:subfinder"
+    assert scheduler.lease_tool(["unknown-tool"], "example.com") is None
+
+
+def test_classify_error():
+    class ConnectError(Exception):
+        pass
+
+    # Playwright's TimeoutError lives in playwright._impl._errors
+    PlaywrightTimeout = type("TimeoutError", (Exception,), {"__module__": "playwright._impl._errors"})
+    PlaywrightError = type("Error", (Exception,), {"__module__": "playwright._impl._errors"})
+
+    assert classify_error(asyncio.CancelledError()) is None
+    assert classify_error(ConnectError()) == "unreachable"
+    assert classify_error(asyncio.TimeoutError()) == "timeout"
+    assert classify_error(PlaywrightTimeout()) == "timeout"
+    assert classify_error(PlaywrightError()) == "error"
+    assert classify_error(ValueError()) == "error"
+
+
+def test_target_key():
+    assert target_key("https://a.b.example.co.uk/path") == "example.co.uk"
+    assert target_key("api.example.com:8443") == "example.com"
+    assert target_key("[2001:db8::1]:80") == "2001:db8::1"
+    assert target_key("10.0.0.1") == "10.0.0.1"
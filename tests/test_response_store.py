@@ -0,0 +1,88 @@
+import pytest
+
+from core.recon import tech_stack
+from core.utils import response_store
+from core.utils.response_store import ResponseStore
+
+
+def page(host, body="x" * 100, scheme="https", **extra):
+    return {"url": f"{scheme}://{host}", "final_url": f"{scheme}://{host}/", "status_code": 200, "title": host,
+            "headers": {"server": "nginx"}, "body": body, "response_time_ms": 5, **extra}
+
+
+def test_least_recently_used_bodies_are_evicted_past_the_byte_cap():
+    store = ResponseStore(max_bytes=250)
+    store.put("a.example.com", page("a.example.com"))
+    store.put("b.example.com", page("b.example.com"))
+    assert store.get("a.example.com") is not None  # a is now the most recently used
+    store.put("c.example.com", page("c.example.com"))
+    assert list(store.entries) == ["a.example.com", "c.example.com"]
+    assert store.size == 200
+    assert store.get("b.example.com") is None
+
+
+def test_replacing_an_entry_updates_the_size():
+    store = ResponseStore(max_bytes=1000)
+    store.put("A.example.com", page("a.example.com", body="x" * 300))
+    store.put("a.example.com", page("a.example.com", body="x" * 10))
+    assert store.size == 10
+    assert store.get("a.EXAMPLE.com")["bytes"] == 10
+    store.clear()
+    assert (store.size, store.entries) == (0, {})
+
+
+def test_a_body_larger_than_the_cap_is_not_kept():
+    store = ResponseStore(max_bytes=50)
+    store.put("a.example.com", page("a.example.com", body="x" * 10))
+    store.put("big.example.com", page("big.example.com", body="x" * 51))
+    assert (store.size, list(store.entries)) == (0, [])
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_store.time, "time", lambda: now[0])
+    store = ResponseStore(ttl=60)
+    store.put("a.example.com", page("a.example.com"))
+    now[0] += 60
+    assert store.get("a.example.com") is not None
+    now[0] += 1
+    assert store.get("a.example.com") is None
+    assert (store.size, list(store.entries)) == (0, [])
+
+
+@pytest.mark.parametrize("target,hit", [
+    ("a.example.com", True),
+    ("a.example.com/", True),
+    ("https://a.example.com", True),
+    ("https://a.example.com/", True),
+    ("http://a.example.com/", False),
+    ("https://a.example.com/login", False),
+    ("https://a.example.com/?q=1", False),
+    ("b.example.com", False),
+    ("a.example.com:8443", True),
+])
+def test_lookup_only_serves_the_probed_root(target, hit):
+    store = ResponseStore()
+    store.put("a.example.com", page("a.example.com"))
+    store.put("a.example.com:8443", page("a.example.com:8443"))
+    assert (store.lookup(target) is not None) == hit
+
+
+def test_lookup_misses_bodies_cut_shorter_than_asked_for():
+    store = ResponseStore()
+    store.put("a.example.com", page("a.example.com", truncated=True, max_bytes=1000))
+    store.put("b.example.com", page("b.example.com", truncated=False, max_bytes=1000))
+    assert store.lookup("a.example.com", max_bytes=1000) is not None
+    assert store.lookup("a.example.com", max_bytes=5000) is None
+    # A body that ended before the cap is complete at any size
+    assert store.lookup("b.example.com", max_bytes=5000) is not None
+
+
+def test_tech_stack_reads_pages_from_the_shared_store(monkeypatch):
+    store = ResponseStore()
+    monkeypatch.setattr(tech_stack, "get_response_store", lambda: store)
+    store.put("a.example.com", page("a.example.com", body="<html>hi</html>"))
+    assert tech_stack.stored_page("https://a.example.com/") == (
+        "https://a.example.com/", "<html>hi</html>", {"server": "nginx"}
+    )
+    assert tech_stack.stored_page("https://a.example.com/admin") is None
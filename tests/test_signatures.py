@@ -0,0 +1,129 @@
+import re
+
+import pytest
+from Wappalyzer import Wappalyzer, WebPage
+
+from bench.fake_tool import synthetic_pages
+from bench.signatures import expected_categories, normalized
+from core.recon import tech_stack
+from core.recon.signatures import SignatureEngine, extract_versions, fold, required_literals
+
+# python-Wappalyzer warns about patterns in its own database it can't compile, and its BeautifulSoup calls
+pytestmark = [pytest.mark.filterwarnings("ignore::UserWarning"),
+              pytest.mark.filterwarnings("ignore:Call to deprecated method:DeprecationWarning")]
+
+PAGES = [
+    {
+        "url": "https://blog.example.com/",
+        "html": '<html><head><meta name="generator" content="WordPress 6.4.2">'
+                '<script src="/wp-includes/js/jquery/jquery.min.js?ver=3.7.1"></script></head><body></body></html>',
+        "headers": {"Server": "nginx/1.25.3", "X-Powered-By": "PHP/8.2.1"},
+    },
+    {
+        "url": "https://shop.example.com/",
+        "html": '<html><body><div id="__next"></div><script id="__NEXT_DATA__" type="application/json">{}</script>'
+                '<script src="/_next/static/chunks/main-abc123.js"></script></body></html>',
+        "headers": {"x-powered-by": "Next.js", "via": "1.1 varnish"},
+    },
+    {"url": "https://empty.example.com/", "html": "<html><body>hello</body></html>", "headers": {}},
+]
+
+
+@pytest.fixture(scope="module")
+def wappalyzer():
+    return Wappalyzer.latest()
+
+
+@pytest.fixture(scope="module")
+def engine(wappalyzer):
+    return SignatureEngine(wappalyzer)
+
+
+def all_pages():
+    pages = PAGES + list(synthetic_pages(40, size=3000))
+    for page in pages:
+        yield {**page, "headers": {k.lower(): v for k, v in page["headers"].items()}}
+
+
+def test_matches_wappalyzer_names_categories_and_versions(wappalyzer, engine):
+    for page in all_pages():
+        # python-Wappalyzer keeps versions on its technology table between pages
+        for tech in wappalyzer.technologies.values():
+            tech.pop("versions", None)
+        webpage = WebPage(page["url"], page["html"], page["headers"])
+        technologies = wappalyzer.analyze(webpage)
+        detected = engine.analyze(page["url"], page["html"], page["headers"], webpage.scripts, webpage.meta)
+
+        assert set(detected) == normalized(technologies), page["url"]
+        assert {name: tech["categories"] for name, tech in detected.items()} == \
+            expected_categories(wappalyzer, technologies)
+        for name, tech in detected.items():
+            assert tech["versions"] == wappalyzer.get_versions(name), (page["url"], name)
+
+
+def test_detects_versions_and_implied_technologies(engine):
+    page = PAGES[0]
+    webpage = WebPage(page["url"], page["html"], page["headers"])
+    detected = engine.analyze(page["url"], page["html"], page["headers"], webpage.scripts, webpage.meta)
+    assert detected["WordPress"]["versions"] == ["6.4.2"]
+    assert detected["Nginx"]["versions"] == ["1.25.3"]
+    assert "CMS" in detected["WordPress"]["categories"]
+    # WordPress implies PHP and MySQL; PHP is also seen directly, with a version
+    assert detected["PHP"]["versions"] == ["8.2.1"]
+    assert detected["MySQL"]["versions"] == []
+
+
+def test_header_names_match_in_any_case(engine):
+    lower = engine.analyze("https://e.example/", "", {"server": "nginx/1.2.3"})
+    mixed = engine.analyze("https://e.example/", "", {"Server": "nginx/1.2.3"})
+    assert lower == mixed
+    assert "Nginx" in lower
+
+
+def test_url_patterns_alone_do_not_detect(engine, wappalyzer):
+    url_only = next(name for name, tech in wappalyzer.technologies.items()
+                    if tech["url"] and not (tech["html"] or tech["headers"] or tech["script"] or tech["meta"]))
+    sample = next(m for m in engine.url if m.tech == url_only)
+    assert url_only not in engine.analyze(f"https://{sample.regex.pattern}/", "", {})
+
+
+def test_compiled_engine_and_library_agree_through_analyze_html(monkeypatch):
+    page = next(all_pages())
+    monkeypatch.setattr(tech_stack, "ENGINE", "compiled")
+    compiled = tech_stack.analyze_html(page["url"], page["html"], page["headers"])
+    monkeypatch.setattr(tech_stack, "ENGINE", "wappalyzer")
+    library = tech_stack.analyze_html(page["url"], page["html"], page["headers"])
+    assert set(compiled["technologies"]) == normalized(library["technologies"])
+    assert compiled["versions"]["WordPress"] == ["6.4.2"]
+
+
+@pytest.mark.parametrize("pattern,literals", [
+    (r"jquery[.-]([\d.]+)\.js", ("jquery",)),
+    # The parser factors out "wp-"; the longer branches are the more selective requirement
+    (r"(?:wp-content|wp-includes)/", ("content", "includes")),
+    (r"^nginx(?:/([\d.]+))?$", ("nginx",)),
+    (r"Drupal", ("drupal",)),
+    (r"^ab?c", None),
+    (r"\d+\.\d+", None),
+    (r"(?:foo|x)bar", ("bar",)),
+])
+def test_required_literals(pattern, literals):
+    assert required_literals(pattern) == literals
+    if literals:
+        # Every match contains one of the literals
+        for text in ["jquery-3.1.js", "/wp-content/", "nginx/1.2", "DRUPAL", "foobar", "xbar"]:
+            if re.search(pattern, text, re.I):
+                assert any(lit in fold(text) for lit in literals)
+
+
+def test_fold_keeps_ignorecase_matches():
+    assert fold("ſcript İD") == "script id"
+    assert re.search("script", "ſcript", re.I)
+    assert fold("NGINX") == "nginx"
+
+
+def test_extract_versions_ternaries():
+    regex = re.compile(r"app(?:-(\d+))?", re.I)
+    assert extract_versions(regex, "\\1?\\1:legacy", "app-3 app") == ["3", "legacy"]
+    assert extract_versions(re.compile(r"v(\d+)\.(\d+)"), "\\1.\\2", "v1.2 v1.2 v2.0") == ["1.2", "2.0"]
+    assert extract_versions(re.compile(r"v(\d*)"), "\\1", "v") == []
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.recon.takeover_engine import (
+    DNS_FLAG_TC, DNS_TYPE_A, DNS_TYPE_CNAME, AsyncResolver, detect_takeovers_async, read_name
+)
+
+FINGERPRINTS = [
+    {"service": "stubcloud", "cname": ["stubcloud.test"], "fingerprint": ["NoSuchBucket"], "nxdomain": False},
+    {"service": "deadcloud", "cname": ["deadcloud.test"], "fingerprint": [], "nxdomain": True},
+]
+
+# name -> (rcode, [(owner, type, data)], truncate over UDP)
+ZONE = {
+    "vuln.example.test": (0, [("vuln.example.test", DNS_TYPE_CNAME, "bucket.stubcloud.test")], False),
+    "claimed.example.test": (0, [("claimed.example.test", DNS_TYPE_CNAME, "site.stubcloud.test")], False),
+    "gone.example.test": (3, [("gone.example.test", DNS_TYPE_CNAME, "app.deadcloud.test")], False),
+    "plain.example.test": (0, [("plain.example.test", DNS_TYPE_A, "127.0.0.1")], False),
+    "long.example.test": (0, [
+        ("long.example.test", DNS_TYPE_CNAME, "hop.example.test"),
+        ("hop.example.test", DNS_TYPE_CNAME, "bucket.stubcloud.test"),
+    ], True),
+}
+
+
+def encode_name(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.split(".")) + b"\x00"
+
+
+def answer(query, tcp):
+    qid, _ = struct.unpack(">HH", query[:4])
+    name, end = read_name(query, 12)
+    question = query[12:end + 4]
+    rcode, records, truncated = ZONE.get(name, (3, [], False))
+    if truncated and not tcp:
+        return struct.pack(">HHHHHH", qid, 0x8180 | DNS_FLAG_TC, 1, 0, 0, 0) + question
+    body = b""
+    for owner, rtype, data in records:
+        rdata = encode_name(data) if rtype == DNS_TYPE_CNAME else socket.inet_aton(data)
+        body += encode_name(owner) + struct.pack(">HHIH", rtype, 1, 60, len(rdata)) + rdata
+    return struct.pack(">HHHHHH", qid, 0x8180 | rcode, 1, len(records), 0, 0) + question + body
+
+
+class StubDNS(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.sendto(answer(data, tcp=False), addr)
+
+
+async def serve_tcp(reader, writer):
+    length = struct.unpack(">H", await reader.readexactly(2))[0]
+    response = answer(await reader.readexactly(length), tcp=True)
+    writer.write(struct.pack(">H", len(response)) + response)
+    await writer.drain()
+    writer.close()
+
+
+class StubSite(BaseHTTPRequestHandler):
+    def do_GET(self):
+        host = self.headers.get("Host", "")
+        body = b"<h1>NoSuchBucket</h1>" if host in ("vuln.example.test", "long.example.test") else b"welcome"
+        self.send_response(404 if b"NoSuchBucket" in body else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_port():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fingerprints(tmp_path):
+    path = tmp_path / "fingerprints.json"
+    path.write_text(json.dumps(FINGERPRINTS))
+    return str(path)
+
+
+async def with_dns(coro_factory):
+    loop = asyncio.get_running_loop()
+    udp, _ = await loop.create_datagram_endpoint(StubDNS, local_addr=("127.0.0.1", 0))
+    port = udp.get_extra_info("sockname")[1]
+    tcp = await asyncio.start_server(serve_tcp, "127.0.0.1", port)
+    try:
+        return await coro_factory(port)
+    finally:
+        tcp.close()
+        await tcp.wait_closed()
+        udp.close()
+
+
+def test_truncated_answer_is_retried_over_tcp():
+    async def run(port):
+        async with AsyncResolver("127.0.0.1", port, timeout=2) as resolver:
+            return await resolver.resolve_cname_chain("long.example.test")
+
+    chain, rcode = asyncio.run(with_dns(run))
+    assert rcode == "NOERROR"
+    assert chain == ["hop.example.test", "bucket.stubcloud.test"]
+
+
+def test_detects_takeovers_against_stub_servers(http_port, fingerprints):
+    hosts = ["vuln.example.test", "claimed.example.test", "gone.example.test",
+             "plain.example.test", "long.example.test"]
+    connect_to = {host: f"127.0.0.1:{http_port}" for host in hosts}
+
+    async def run(port):
+        return await detect_takeovers_async(hosts, nameserver="127.0.0.1", dns_port=port,
+                                            fingerprints_path=fingerprints, http_timeout=5,
+                                            connect_to=connect_to)
+
+    results = {r["subdomain"]: r for r in asyncio.run(with_dns(run))}
+
+    assert results["vuln.example.test"]["tool_detected"]
+    assert results["vuln.example.test"]["service"] == "stubcloud"
+    assert results["vuln.example.test"]["status_code"] == 404
+    assert "NoSuchBucket" in results["vuln.example.test"]["response_body"]
+
+    assert not results["claimed.example.test"]["tool_detected"]
+    assert results["claimed.example.test"]["status_code"] == 200
+
+    assert results["gone.example.test"]["tool_detected"]
+    assert results["gone.example.test"]["service"] == "deadcloud"
+    assert results["gone.example.test"]["dns_status"] == "NXDOMAIN"
+
+    assert not results["plain.example.test"]["tool_detected"]
+    assert results["plain.example.test"]["cname"] is None
+
+    assert results["long.example.test"]["tool_detected"]
+    assert results["long.example.test"]["cname"] == "bucket.stubcloud.test"
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from core.utils import tool_runner
+from core.utils.tool_runner import Slot, ToolFailed, ToolRun, ToolTimeout, collect_tool, stream_tool
+
+
+def stub_tool(tmp_path, name, script):
+    """An executable shell script standing in for a recon binary"""
+    path = tmp_path / name
+    path.write_text("#!/bin/sh\n" + script)
+    path.chmod(0o755)
+    return str(path)
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_slot_hands_off_in_fifo_order():
+    async def main():
+        slot = Slot(1)
+        order = []
+        await slot.acquire()
+
+        async def waiter(n):
+            await slot.acquire()
+            order.append(n)
+            await asyncio.sleep(0.01)
+            slot.release()
+
+        tasks = []
+        for n in range(5):
+            tasks.append(asyncio.create_task(waiter(n)))
+            await asyncio.sleep(0)
+        # A cancelled waiter gives up its place in the queue
+        tasks[2].cancel()
+        slot.release()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return order, slot.taken
+
+    assert asyncio.run(main()) == ([0, 1, 3, 4], 0)
+
+
+def test_slot_wakes_waiters_on_other_loops():
+    slot = Slot(1)
+    order = []
+
+    async def hold():
+        await slot.acquire()
+        await asyncio.sleep(0.2)
+        slot.release()
+
+    async def wait(n):
+        await slot.acquire()
+        order.append(n)
+        slot.release()
+
+    holder = threading.Thread(target=asyncio.run, args=(hold(),))
+    holder.start()
+    time.sleep(0.05)
+    waiters = []
+    for n in range(3):
+        waiters.append(threading.Thread(target=asyncio.run, args=(wait(n),)))
+        waiters[-1].start()
+        time.sleep(0.02)
+    for thread in [holder, *waiters]:
+        thread.join(5)
+    assert order == [0, 1, 2]
+    assert slot.taken == 0
+
+
+def test_streams_lines_and_counts(tmp_path):
+    tool = stub_tool(tmp_path, "stub-lines", 'while read line; do echo "got $line"; done\n')
+    run = ToolRun([tool])
+    lines = asyncio.run(collect_tool([tool], "a\n\nb\n", run=run))
+    assert lines == ["got a", "got", "got b"]
+    assert (run.returncode, run.stdout_lines, run.timed_out) == (0, 3, False)
+
+
+def test_non_zero_exit_raises_with_stderr_tail(tmp_path):
+    script = 'i=0; while [ $i -lt 50 ]; do echo "noise $i" >&2; i=$((i+1)); done\necho "bad api key" >&2\nexit 3\n'
+    tool = stub_tool(tmp_path, "stub-fail", script)
+    with pytest.raises(ToolFailed) as raised:
+        asyncio.run(collect_tool([tool]))
+    assert raised.value.returncode == 3
+    tail = raised.value.stderr.splitlines()
+    assert len(tail) == tool_runner.STDERR_TAIL_LINES
+    assert tail[-1] == "bad api key"
+    assert "exited with code 3: " in str(raised.value)
+
+
+def test_wall_clock_timeout_kills_tool(tmp_path):
+    tool = stub_tool(tmp_path, "stub-chatty", "while true; do echo tick; sleep 0.05; done\n")
+    run = ToolRun([tool])
+    started = time.time()
+    with pytest.raises(ToolTimeout):
+        asyncio.run(collect_tool([tool], timeout=0.5, run=run))
+    assert time.time() - started < 3
+    assert run.timed_out and run.stdout_lines > 0
+    assert run.returncode == -9
+
+
+def test_idle_timeout_fires_without_output(tmp_path):
+    tool = stub_tool(tmp_path, "stub-quiet", "echo hello\nsleep 30\n")
+    run = ToolRun([tool])
+    started = time.time()
+    with pytest.raises(ToolTimeout):
+        asyncio.run(collect_tool([tool], timeout=60, idle_timeout=0.3, run=run))
+    assert time.time() - started < 3
+    assert run.stdout_lines == 1 and run.timed_out
+
+
+def test_cancel_kills_process_group(tmp_path):
+    tool = stub_tool(tmp_path, "stub-group", "sleep 60 &\necho $!\nwait\n")
+    pids = []
+
+    async def main():
+        async def consume():
+            async for line in stream_tool([tool]):
+                pids.append(int(line))
+
+        task = asyncio.create_task(consume())
+        while not pids:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    deadline = time.time() + 5
+    while alive(pids[0]) and time.time() < deadline:
+        time.sleep(0.02)
+    assert not alive(pids[0])
+    assert tool_runner.tool_slots.get("stub-group").taken == 0
+
+
+def test_slot_released_when_lease_fails(tmp_path, monkeypatch):
+    tool = stub_tool(tmp_path, "stub-lease", "echo hi\n")
+
+    class BrokenScheduler:
+        def lease_tool(self, command, target):
+            raise RuntimeError("scheduler down")
+
+    monkeypatch.setattr(tool_runner, "get_scheduler", BrokenScheduler)
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect_tool([tool]))
+    assert tool_runner.tool_slots.get("stub-lease").taken == 0
@@ -0,0 +1,199 @@
+import os
+
+import pytest
+
+from core.utils import url_archive
+from core.utils.url_archive import (
+    Segment, UrlArchive, decode_cursor, encode_cursor, extension, join_key, query_params, split_url, write_segment
+)
+
+HOSTS = ["api.example.com", "example.com", "www.example.com"]
+
+
+def fixture_urls(start, stop):
+    """A few hundred URLs spread over hosts, path prefixes, extensions and parameters"""
+    urls = []
+    for n in range(start, stop):
+        host = HOSTS[n % 3]
+        urls.append(f"https://{host}/v{n % 2}/users/{n}")
+        urls.append(f"https://{host}/search?q={n}&page={n % 4}")
+        urls.append(f"http://{host}/static/app{n % 5}.JS")
+        urls.append(f"https://{host}/docs/{n}.pdf?dl=1")
+    return urls
+
+
+def reference(urls, host=None, path_prefix=None, ext=None, param=None):
+    """Brute-force UrlArchive.query: filter every key, then sort"""
+    keys = set()
+    for url in urls:
+        key = split_url(url)
+        if host is not None and key[0] != host:
+            continue
+        if path_prefix is not None and not key[1].startswith(path_prefix):
+            continue
+        if ext is not None and extension(key[1]) != ext:
+            continue
+        if param is not None and param not in query_params(key[2]):
+            continue
+        keys.add(key)
+    return [join_key(key) for key in sorted(keys)]
+
+
+def page_all(archive, limit, cursor=None, **filters):
+    urls = []
+    while True:
+        page = archive.query(cursor=cursor, limit=limit, **filters)
+        urls += page["urls"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return urls
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    """An archive of about 400 URLs in three segments, written in small string blocks"""
+    monkeypatch.setattr(url_archive, "BLOCK", 8)
+    archive = UrlArchive("example.com", root=str(tmp_path))
+    for start, stop in ((0, 40), (40, 70), (70, 100)):
+        with archive.writer() as writer:
+            for url in fixture_urls(start, stop):
+                writer.add(url)
+    return archive
+
+
+def test_split_and_join_round_trip():
+    for url in ["https://Example.com/a/b?x=1&y=", "http://example.com/", "https://example.com/p?"]:
+        host, path, tail = split_url(url)
+        assert host == "example.com"
+        assert join_key((host, path, tail)) == url.replace("Example", "example")
+    assert split_url("not a url") is None
+    assert extension("/static/app.JS") == "js"
+    assert extension("/v1.2/users") == ""
+    assert query_params("https?b=1&a=&b=2") == ["a", "b"]
+
+
+def test_segment_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(url_archive, "BLOCK", 4)
+    keys = sorted({split_url(url) for url in fixture_urls(0, 30)})
+    path = str(tmp_path / "one.seg")
+    write_segment(path, keys)
+    segment = Segment(path)
+    assert segment.rows == len(keys)
+    assert list(segment.keys()) == keys
+    assert [segment.key(row) for row in range(segment.rows)] == keys
+    assert all(segment.contains(url_archive.fingerprint(join_key(key))) for key in keys)
+    assert not segment.contains(url_archive.fingerprint("https://example.com/missing"))
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_segment_rejects_foreign_files(tmp_path):
+    path = tmp_path / "bad.seg"
+    path.write_bytes(b"not a segment at all")
+    with pytest.raises(ValueError):
+        Segment(str(path))
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"host": "api.example.com"},
+    {"host": "API.example.com"},
+    {"path_prefix": "/v1/"},
+    {"host": "www.example.com", "path_prefix": "/v0/users/1"},
+    {"ext": "js"},
+    {"ext": ".PDF", "param": "dl"},
+    {"param": "page", "host": "example.com"},
+    {"path_prefix": "/search", "param": "q"},
+    {"host": "other.example.com"},
+    {"param": "missing"},
+    {"path_prefix": "/nothing"},
+])
+def test_query_matches_reference(archive, filters):
+    expected = reference(
+        fixture_urls(0, 100),
+        host=filters["host"].lower() if "host" in filters else None,
+        path_prefix=filters.get("path_prefix"),
+        ext=filters["ext"].lower().lstrip(".") if "ext" in filters else None,
+        param=filters.get("param"),
+    )
+    assert len(archive.segments()) == 3
+    assert archive.query(limit=10 ** 6, **filters)["urls"] == expected
+    assert page_all(archive, 7, **filters) == expected
+
+
+def test_writer_skips_archived_and_buffered_urls(archive):
+    with archive.writer() as writer:
+        assert not writer.add("https://example.com/search?q=1&page=1")
+        assert writer.add("https://example.com/new")
+        assert not writer.add("https://example.com/new")
+        assert not writer.add("::not a url::")
+        assert writer.added == 1
+    assert len(archive.segments()) == 4
+    assert archive.stats()["urls"] == len(set(fixture_urls(0, 100))) + 1
+
+
+def test_writer_flushes_full_segments(tmp_path):
+    archive = UrlArchive("example.com", root=str(tmp_path))
+    writer = archive.writer(segment_rows=50)
+    for url in fixture_urls(0, 20):
+        writer.add(url)
+        if writer.full:
+            writer.flush()
+    writer.flush()
+    assert [s.rows for s in archive.segments()] == [50, len(set(fixture_urls(0, 20))) - 50]
+
+
+def test_merge_keeps_every_url_once(archive, monkeypatch):
+    # Overlaps what's archived: until the segments merge, queries drop the duplicates
+    archive.add_segment(sorted({split_url(url) for url in fixture_urls(90, 110)}))
+    assert archive.query(limit=10 ** 6)["urls"] == reference(fixture_urls(0, 110))
+
+    monkeypatch.setattr(url_archive, "MERGE_FANIN", 2)
+    monkeypatch.setattr(url_archive, "MAX_SEGMENTS", 2)
+    archive.add_segment([split_url("https://example.com/zzz")])
+    assert len(archive.segments()) == 2
+    assert archive.query(limit=10 ** 6)["urls"] == reference(fixture_urls(0, 110) + ["https://example.com/zzz"])
+
+    monkeypatch.setattr(url_archive, "MAX_SEGMENTS", 1)
+    archive.add_segment([split_url("https://example.com/zzz")])
+    [segment] = archive.segments()
+    assert segment.rows == len(set(fixture_urls(0, 110))) + 1
+    assert archive.query(limit=10 ** 6)["urls"] == reference(fixture_urls(0, 110) + ["https://example.com/zzz"])
+
+
+def test_cursor_is_stable_across_a_merge(archive, monkeypatch):
+    first = archive.query(host="example.com", limit=25)
+    cursor = decode_cursor(first["next_cursor"])
+    assert join_key(cursor) == first["urls"][-1]
+
+    monkeypatch.setattr(url_archive, "MAX_SEGMENTS", 1)
+    added = fixture_urls(100, 130)
+    archive.add_segment(sorted({split_url(url) for url in added}))
+    assert len(archive.segments()) == 1
+
+    rest = page_all(archive, 25, host="example.com", cursor=first["next_cursor"])
+    before = reference(fixture_urls(0, 100), host="example.com")
+    # Nothing seen twice or skipped; new URLs show up only if they sort after the cursor
+    assert first["urls"] + [url for url in rest if url in before] == before
+    assert [url for url in rest if url not in before] == [
+        url for url in reference(added, host="example.com") if split_url(url) > cursor and url not in before
+    ]
+
+
+def test_malformed_cursor_and_domain():
+    assert decode_cursor(encode_cursor(("h", "/p", "https?a=1"))) == ("h", "/p", "https?a=1")
+    for cursor in ["!!!", encode_cursor(("only", "two")), "bnVsbA"]:
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+    for domain in ["..", "a/b", ""]:
+        with pytest.raises(ValueError):
+            UrlArchive(domain)
+
+
+def test_needs_collection(tmp_path):
+    archive = UrlArchive("example.com", root=str(tmp_path))
+    assert archive.needs_collection()
+    archive.mark_collected()
+    assert not archive.needs_collection()
+    assert archive.needs_collection(recollect_empty=-1)
+    archive.add_segment([split_url("https://example.com/a")])
+    assert not archive.needs_collection(recollect_empty=-1)
@@ -0,0 +1,79 @@
+
+import pytest
+
+from core.recon import url_collector
+from core.recon.url_collector import _cluster_batch, _merge_clusters, cluster_urls, group_similar_urls
+from core.utils.url_templates import path_template
+
+URLS = [
+    "https://shop.example/product/1?color=red&size=m",
+    "https://shop.example/product/2?color=blue&size=l",
+    "https://SHOP.example/product/3?size=s&color=red",
+    "https://shop.example/product/4?color=red",
+    "https://shop.example/en/blog/2024-01-02/hello",
+    "https://shop.example/fr/blog/2023-12-31/bonjour",
+    "https://shop.example/u/550e8400-e29b-41d4-a716-446655440000/avatar.png",
+    "https://shop.example/about",
+]
+
+
+@pytest.mark.parametrize("path,template", [
+    ("/user/42/en", "/user/{int}/{locale}"),
+    ("/post/2024-01-02", "/post/{date}"),
+    ("/files/deadbeef0123456789abcdef.js", "/files/{hash}.js"),
+    ("/page/en-us/about", "/page/{locale}/about"),
+    ("/static/about", "/static/about"),
+    ("/", "/"),
+])
+def test_path_template(path, template):
+    assert path_template(path) == template
+
+
+def test_clusters_by_template_and_parameter_names():
+    clusters = {(c["template"], tuple(c["params"])): c for c in cluster_urls(URLS)}
+    both = clusters[("https://shop.example/product/{int}", ("color", "size"))]
+    assert both["count"] == 3
+    assert both["examples"] == URLS[:3]
+    assert both["values"] == {"color": ["blue", "red"], "size": ["l", "m", "s"]}
+    # A different parameter set is a different cluster
+    assert clusters[("https://shop.example/product/{int}", ("color",))]["count"] == 1
+    assert clusters[("https://shop.example/{locale}/blog/{date}/hello", ())]["count"] == 1
+    assert ("https://shop.example/u/{uuid}/avatar.png", ()) in clusters
+    assert len(clusters) == 6
+
+
+def test_examples_and_values_are_capped():
+    urls = [f"https://e.example/item/{n}?id={n}" for n in range(100)]
+    [cluster] = cluster_urls(urls, max_examples=2, max_values=5)
+    assert cluster["count"] == 100
+    assert cluster["examples"] == urls[:2]
+    assert cluster["values"] == {"id": ["0", "1", "2", "3", "4"]}
+
+
+def test_batched_merge_matches_single_pass():
+    urls = [f"https://e.example/{kind}/{n}?{param}={n % 7}"
+            for n in range(300) for kind, param in (("a", "x"), ("b", "y"))]
+    single = url_collector._cluster(urls)
+    merged = {}
+    for start in range(0, len(urls), 64):
+        _merge_clusters(merged, _cluster_batch("\n".join(urls[start:start + 64])), 3, 10)
+    assert merged == single
+
+
+def test_offloaded_clustering_matches_inline(monkeypatch):
+    urls = [f"https://e.example/p/{n}?q={n % 13}&r=1" for n in range(2500)] + URLS
+    inline = cluster_urls(urls)
+    # Pretend a pool is configured; map_chunks runs the batches and cluster_urls merges them
+    monkeypatch.setattr(url_collector, "should_offload", lambda count: True)
+    monkeypatch.setattr(url_collector, "map_chunks",
+                        lambda func, items: [func("\n".join(items[i:i + 1000])) for i in range(0, len(items), 1000)])
+    assert cluster_urls(urls) == inline
+
+
+def test_group_similar_urls_merges_values():
+    grouped = group_similar_urls(URLS)
+    assert grouped[0] == "https://shop.example/product/1?color={blue,red}&size={l,m,s}"
+    assert "https://shop.example/product/4?color=red" in grouped
+    # URLs without parameters come last, one per template
+    assert grouped[-1] == "https://shop.example/about"
+    assert len(grouped) == 6
@@ -0,0 +1,68 @@
+import asyncio
+import random
+
+import pytest
+
+from core.recon.url_collector import TopUrls, clean_urls, collect_urls_async, normalize_url
+
+
+def best(urls, limit):
+    """Reference for TopUrls: unique URLs, parameterised first, then shortest, then earliest"""
+    first_seen = {}
+    for url in urls:
+        first_seen.setdefault(url, len(first_seen))
+    ranked = sorted(first_seen, key=lambda url: ('?' not in url, len(url), first_seen[url]))
+    return ranked[:limit]
+
+
+def sample_urls(count, seed):
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        path = "/".join(rng.choice(["a", "api", "v1", "users", "search", "x" * rng.randint(1, 30)])
+                        for _ in range(rng.randint(1, 4)))
+        query = f"?id={rng.randint(1, 50)}" if rng.random() < 0.3 else ""
+        urls.append(f"https://example.com/{path}{query}")
+    return urls
+
+
+@pytest.mark.parametrize("limit", [0, 1, 10, 500, 5000])
+@pytest.mark.parametrize("dedup", ["fingerprint", "bloom"])
+def test_top_urls_matches_sorted_reference(limit, dedup):
+    urls = sample_urls(3000, seed=limit)
+    top = TopUrls(limit, dedup=dedup)
+    for url in urls:
+        top.add(url)
+    assert top.urls() == best(urls, limit)
+
+
+def test_top_urls_rejects_repeats_of_evicted_urls():
+    top = TopUrls(2)
+    for url in ["https://e.com/long/path", "https://e.com/p?a=1", "https://e.com/q?b=2", "https://e.com/long/path"]:
+        top.add(url)
+    assert top.urls() == ["https://e.com/p?a=1", "https://e.com/q?b=2"]
+    assert len(top.members) == 2
+
+
+def test_clean_urls_filters_static_and_fragments():
+    urls = [
+        "https://e.com/a#top", "https://e.com/a", "ftp://e.com/file", "https://e.com/logo.PNG",
+        "https://e.com/app.js?v=3", " https://e.com/b?x=1 ", "",
+    ]
+    assert clean_urls(urls) == ["https://e.com/a", "https://e.com/b?x=1"]
+    assert normalize_url("https://e.com/style.css#x") is None
+
+
+def test_collect_urls_merges_tools_into_top_k(stub_tools):
+    stub_tools("gau", "for i in $(seq 1 300); do echo \"https://t.example/page/$i\"; done\n"
+                      "echo https://t.example/search?q=1\necho https://t.example/logo.png\n")
+    stub_tools("waybackurls", "cat > /dev/null\necho https://t.example/search?q=1#frag\n"
+                              "echo https://t.example/item?id=7\nexit 1\n")
+
+    urls = asyncio.run(collect_urls_async("t.example", max_urls=50, clusters=True))
+    templates = {(cluster["template"], tuple(cluster["params"])): cluster for cluster in urls}
+    # Both tools' parameterised URLs survive the cap; the failing tool's output still counts
+    assert ("https://t.example/search", ("q",)) in templates
+    assert ("https://t.example/item", ("id",)) in templates
+    assert sum(cluster["count"] for cluster in urls) == 50
+    assert not any("logo.png" in example for cluster in urls for example in cluster["examples"])
@@ -0,0 +1,42 @@
+import asyncio
+
+from core.utils import workers
+
+
+def test_default_workers_split_cores_between_web_processes(monkeypatch):
+    monkeypatch.setattr(workers.os, "cpu_count", lambda: 1)
+    assert workers.default_cpu_workers() == 0
+    monkeypatch.setattr(workers.os, "cpu_count", lambda: 8)
+    assert workers.default_cpu_workers() == 8
+    monkeypatch.setattr(workers, "WEB_WORKERS", 3)
+    assert workers.default_cpu_workers() == 2
+    monkeypatch.setattr(workers, "WEB_WORKERS", 16)
+    assert workers.default_cpu_workers() == 0
+
+
+def test_offload_needs_workers_and_a_large_input(monkeypatch):
+    monkeypatch.setattr(workers, "CPU_WORKERS", 0)
+    assert not workers.should_offload(10 ** 6)
+    monkeypatch.setattr(workers, "CPU_WORKERS", 4)
+    assert not workers.should_offload(workers.OFFLOAD_MIN_ITEMS - 1)
+    assert workers.should_offload(workers.OFFLOAD_MIN_ITEMS)
+    assert workers.should_offload(workers.OFFLOAD_MIN_BYTES, workers.OFFLOAD_MIN_BYTES)
+
+
+def count_lines(batch):
+    return len(batch.split("\n"))
+
+
+def test_map_chunks_inline_without_pool(monkeypatch):
+    monkeypatch.setattr(workers, "CPU_WORKERS", 0)
+    items = [str(n) for n in range(2500)]
+    assert workers.map_chunks(count_lines, items, size=1000) == [1000, 1000, 500]
+
+    async def lines():
+        for item in items:
+            yield item
+
+    async def collect():
+        return [result async for result in workers.map_chunks_async(count_lines, lines(), size=1000)]
+
+    assert sum(asyncio.run(collect())) == 2500